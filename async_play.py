@@ -0,0 +1,271 @@
+import asyncio                  # Game coroutines and the policy batchers
+import random                   # Policies
+import time                     # Inference time
+import numpy as np
+import environment as env
+import core                     # Game backend
+import rollout                  # Policies
+
+# --------------------
+# Policy Batcher
+class PolicyBatcher():
+    """
+    Gathers the decisions of many game coroutines for the same model and answers them with one inference call
+        A game awaits choose(state, actions), the batcher runs the model on the pending states when:
+            max_batch_size decisions are pending
+            every game using the batcher is waiting for a decision of this or another batcher (no game can add one before a batch is answered)
+            max_wait seconds have passed since the first pending decision
+        The action is the highest model value among the available actions (epsilon greedy when epsilon > 0)
+
+    Attributes:
+        model (function) - called with states (ndarray shape (B, 47) int16), returns the values of the actions (shape (B, 97)),
+                           e.g. lambda states: model.predict(states, verbose=0) for a Keras model
+        max_batch_size (int) - largest number of states per model call
+        max_wait (float) - seconds a decision can wait for the batch to fill
+        epsilon (float) - probability of a random available action instead of the model action
+        rng (numpy.random.Generator) - random number generator for epsilon
+        clients (int) - number of games currently using the batcher (see game_play)
+        waiting (int) - number of those games waiting for a decision of any batcher
+        decisions (int) - number of decisions answered
+        batches (int) - number of model calls
+        model_seconds (float) - time spent in model calls
+        error (Exception|None) - exception raised by the model (the pending decisions fail with it, the batcher stops answering)
+
+    Methods:
+        choose - (coroutine) Return (int) the action for a state and available actions
+        start - start the batching task on the running event loop
+        stop - stop the batching task (pending decisions are cancelled), raises the model exception if any
+    """
+
+    def __init__ (self, model, max_batch_size=256, max_wait=0.002, epsilon=0.0, seed=None):
+        """
+        model (function) - states to action values (see Attributes)
+        max_batch_size (int) - largest number of states per model call
+        max_wait (float) - seconds a decision can wait for the batch to fill
+        epsilon (float) - probability of a random available action
+        seed (int|None) - seed for epsilon
+        """
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+
+        self.clients = 0
+        self.waiting = 0
+        self.decisions = 0
+        self.batches = 0
+        self.model_seconds = 0.0
+        self.error = None
+
+        self.pending = []
+        self.wakeup = None
+        self.task = None
+
+    @property
+    def batch_mean(self):
+        return self.decisions / self.batches if self.batches > 0 else 0.0
+
+    async def choose(self, state, actions):
+        """
+        Return (int) the action chosen by the model for the state among actions (waits for the batch)
+        """
+
+        if self.wakeup is None:
+            raise RuntimeError("PolicyBatcher not started (call start on the running event loop, games_play starts its batchers)")
+        if self.error is not None:
+            raise self.error
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((state, actions, future))
+        self.wakeup.set()
+        return await future
+
+    def client_add(self, clients, waiting):
+        """
+        Update the number of games using the batcher and the number of them waiting for a decision (wakes the batching task)
+        """
+
+        self.clients += clients
+        self.waiting += waiting
+        if self.wakeup is not None and self.waiting >= self.clients:
+            self.wakeup.set()
+
+    def start(self):
+        self.error = None
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+        for state, actions, future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.task = None
+        self.wakeup = None
+
+        if self.error is not None:
+            raise self.error
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            while not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+
+            # Wait for the batch to fill (the other games run while this task waits)
+            deadline = loop.time() + self.max_wait
+            while len(self.pending) < self.max_batch_size and self.waiting < self.clients:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            try:
+                actions = self.infer([b[0] for b in batch], [b[1] for b in batch])
+            except Exception as error:
+                # Fail the batch and every pending decision (the games waiting on them raise the error)
+                self.error = error
+                for state, actions, future in batch + self.pending:
+                    if not future.done():
+                        future.set_exception(error)
+                self.pending = []
+                return
+
+            for i in range(len(batch)):
+                if not batch[i][2].done():
+                    batch[i][2].set_result(int(actions[i]))
+
+    def infer(self, states, actions):
+        """
+        Return (ndarray) the action of each state - one model call for all the states
+        """
+
+        count = len(states)
+        states = np.array(states, dtype=np.int16)
+
+        # Available actions mask (one fancy assignment for the batch)
+        mask = np.zeros((count, len(env.Game.action_matrix)), dtype=bool)
+        mask[np.repeat(np.arange(count), [len(a) for a in actions]), np.concatenate(actions)] = True
+
+        start = time.perf_counter()
+        values = np.asarray(self.model(states), dtype=np.float64)
+        self.model_seconds += time.perf_counter() - start
+
+        chosen = np.where(mask, values, -np.inf).argmax(axis=1)
+
+        if self.epsilon > 0:
+            for i in np.flatnonzero(self.rng.random(count) < self.epsilon):
+                chosen[i] = actions[i][self.rng.integers(len(actions[i]))]
+
+        self.decisions += count
+        self.batches += 1
+        return chosen
+
+# --------------------
+# Game driver
+#   Seat policies: PolicyBatcher (decisions batched across games), a policy spec (see rollout.policy_build),
+#   or a function called with (game, rng) returning an action index (called synchronously)
+
+async def game_play(players_names, seat_policies, seed):
+    """
+    Return (Game|core.CoreGame) a game played to the end (coroutine - awaits the decisions of the seats played by a PolicyBatcher)
+
+    players_names ([str]) - names of the players (in game play order)
+    seat_policies ([PolicyBatcher|str|(str, dict)|function]) - policy by seat
+    seed (int) - seed of the deck shuffle (the policies use a stream derived from it, see rollout.policy_seed)
+    """
+
+    rng = random.Random(rollout.policy_seed(seed))
+    policies = [rollout.policy_build(p, rollout.policy_seed(seed)) if isinstance(p, (str, tuple)) else p for p in seat_policies]
+    batchers = set(p for p in policies if isinstance(p, PolicyBatcher))
+
+    # Compiled backend when available (policy functions and MCTS policies get the full Game)
+    game = core.game_build(players_names, seed=seed, full=any(not isinstance(p, (PolicyBatcher, str)) for p in seat_policies))
+
+    for batcher in batchers:
+        batcher.client_add(1, 0)
+    try:
+        while game.play_status < 4:
+            policy = policies[game.scheduler.seat]
+            if isinstance(policy, PolicyBatcher):
+                for batcher in batchers:
+                    batcher.client_add(0, 1)
+                try:
+                    action = await policy.choose(game.player_state, game.player_actions)
+                finally:
+                    for batcher in batchers:
+                        batcher.client_add(0, -1)
+            else:
+                action = policy(game, rng)
+            game.play_action(action)
+    finally:
+        for batcher in batchers:
+            batcher.client_add(-1, 0)
+
+    return game
+
+async def games_play(players_names, seat_policies, seeds, concurrency=256, callback=None):
+    """
+    Return ([Game|core.CoreGame]) the games played (seed order, see core.game_build), up to concurrency games are in play at a time (coroutine)
+
+    players_names ([str]) - names of the players (in game play order)
+    seat_policies ([PolicyBatcher|str|(str, dict)|function]) - policy by seat
+    seeds (range|[int]) - one game per seed
+    concurrency (int) - number of games in play at a time (the largest batch a PolicyBatcher can gather)
+    callback (function|None) - called with each finished game (e.g. to record its transitions and release it)
+    """
+
+    seeds = list(seeds)
+    games = [None] * len(seeds)
+    batchers = set(p for p in seat_policies if isinstance(p, PolicyBatcher))
+    next_game = 0
+
+    async def games_runner():
+        nonlocal next_game
+        while next_game < len(seeds):
+            i = next_game
+            next_game += 1
+            game = await game_play(players_names, seat_policies, seeds[i])
+            if callback is None:
+                games[i] = game
+            else:
+                callback(game)
+
+    for batcher in batchers:
+        batcher.start()
+    try:
+        await asyncio.gather(*[games_runner() for i in range(min(concurrency, len(seeds)))])
+    finally:
+        # Stop every batcher before raising a model exception
+        errors = []
+        for batcher in batchers:
+            try:
+                await batcher.stop()
+            except Exception as error:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+    return games
+
+def play(players_names, seat_policies, seeds, concurrency=256, callback=None):
+    """
+    Return ([Game|core.CoreGame]) the games played (seed order) - runs games_play in a new event loop (see games_play)
+    """
+
+    return asyncio.run(games_play(players_names, seat_policies, seeds, concurrency, callback))
@@ -0,0 +1,441 @@
+import numpy as np          # Game state arrays
+import environment as env   # Card and action lookup tables
+
+# --------------------
+# Lookup tables (NumPy copies of environment.card_lookup and environment.action_lookup)
+
+card_type = env.card_arrays['type']
+card_distance = env.card_arrays['distance']
+card_battle_status = env.card_arrays['battle_status']
+card_safety = env.card_arrays['safety']
+safety_card = env.card_arrays['safety_card']
+action_decode = env.action_arrays['decode']     # shape (97, 3) - [action index, (team, kind, code)]
+
+# --------------------
+# Batch Game
+class BatchGame():
+    """
+    N independent games with the same number of players, played in lockstep
+        Game data is held as NumPy arrays (one row per game) and every game is advanced by a single call to step
+        Rules follow environment.Game (play_action and start_turn), including Coup Fourre checks, Safety bonus turns and Extensions
+        Finished games are reset automatically (new shuffle and deal) so every game always has a current player and available actions
+
+    Attributes:
+        players_count (int) - number of players in each game (2, 3, 4, 6)
+        teams_count (int) - number of teams in each game (seat index % teams_count = team index)
+        games_count (int) - number of games (N)
+        rng (numpy.random.Generator) - shuffles the decks
+
+        deck (ndarray) - shape (N, deck size) card index, cards not yet drawn are deck[:deck_count] (drawn from the end)
+        deck_count (ndarray) - shape (N,) number of cards left in the deck
+        hands (ndarray) - shape (N, players, 7) card index of cards in each player's hand in the order drawn (-1 for n/a)
+        hand_count (ndarray) - shape (N, players) number of cards in each player's hand
+        team_status (ndarray) - shape (N, teams, 8) team status as laid out in the game state (speed, battle, distance, 200's, 4 safeties)
+        battle_pile (ndarray) - shape (N, teams, 64) card index of each team's battle pile (bottom to top)
+        battle_count (ndarray) - shape (N, teams) number of cards in each team's battle pile
+        history (ndarray) - shape (N, players, 11) action index taken by other players since each player's last action (most recent first, -1 for n/a)
+        team_points (ndarray) - shape (N, teams) points earned by each team in the current game
+
+        play_status (ndarray) - shape (N,) see environment.Game
+        player_current (ndarray) - shape (N,) seat index of the current player
+        extension_team (ndarray) - shape (N,) team index who called for an Extension (-1 = not in extension play)
+        coup_fourre_player (ndarray) - shape (N,) seat index of the player who played the hazard (-1 = n/a)
+        coup_fourre_team (ndarray) - shape (N,) team index the hazard was played against (-1 = n/a)
+
+        states (ndarray) - shape (N, 47) state for the current player of each game (see environment.Game.state)
+        masks (ndarray) - shape (N, 97) available actions for the current player of each game
+        final_team_points (ndarray) - shape (N, teams) final points of the most recently finished game in each row
+        games_played (ndarray) - shape (N,) number of games finished in each row
+
+    Methods:
+        reset - start new games (all games or the given rows), optionally from a given deck order
+        step - ("Step") play one action in every game
+    """
+
+    def __init__ (self, players_count, games_count, seed=None):
+        """
+        players_count (int) - number of players in each game (2, 3, 4, 6)
+        games_count (int) - number of games to play in lockstep
+        seed (int|None) - seed for the deck shuffles
+        """
+
+        self.players_count = players_count
+        self.teams_count = players_count if players_count < 4 else players_count // 2
+        self.games_count = games_count
+        self.rng = np.random.default_rng(seed)
+
+        # Unshuffled deck (card index)
+        self.deck_build = np.repeat(np.arange(len(env.card_lookup['type']), dtype=np.int8), env.deck_counts_build(players_count))
+
+        n = games_count
+        self.deck = np.zeros((n, len(self.deck_build)), dtype=np.int8)
+        self.deck_count = np.zeros(n, dtype=np.int16)
+        self.hands = np.full((n, players_count, 7), -1, dtype=np.int8)
+        self.hand_count = np.zeros((n, players_count), dtype=np.int8)
+        self.team_status = np.zeros((n, self.teams_count, 8), dtype=np.int16)
+        self.battle_pile = np.full((n, self.teams_count, 64), -1, dtype=np.int8)
+        self.battle_count = np.zeros((n, self.teams_count), dtype=np.int16)
+        self.history = np.full((n, players_count, 11), -1, dtype=np.int16)
+        self.team_points = np.zeros((n, self.teams_count), dtype=np.int32)
+
+        self.play_status = np.zeros(n, dtype=np.int8)
+        self.player_current = np.zeros(n, dtype=np.int8)
+        self.extension_team = np.full(n, -1, dtype=np.int8)
+        self.coup_fourre_player = np.full(n, -1, dtype=np.int8)
+        self.coup_fourre_team = np.full(n, -1, dtype=np.int8)
+
+        self.states = np.full((n, 47), -1, dtype=np.int16)
+        self.masks = np.zeros((n, len(action_decode)), dtype=bool)
+        self.final_team_points = np.zeros((n, self.teams_count), dtype=np.int32)
+        self.games_played = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def reset(self, rows=None, decks=None):
+        """
+        Start new games: shuffle, deal 6 cards to each player and start the first player's turn
+
+        rows (ndarray|None) - row index of the games to reset (None = all games)
+        decks (ndarray|None) - shape (len(rows), deck size) card index deck order to use instead of a shuffle (cards are drawn from the end)
+
+        Return (states, masks) - see step
+        """
+
+        rows = np.arange(self.games_count) if rows is None else np.asarray(rows)
+        n = len(rows)
+
+        if decks is None:
+            decks = self.rng.permuted(np.tile(self.deck_build, (n, 1)), axis=1)
+
+        self.deck[rows] = decks
+        self.deck_count[rows] = self.deck.shape[1]
+        self.hands[rows] = -1
+        self.hand_count[rows] = 0
+        self.team_status[rows] = 0
+        self.team_status[rows, :, 1] = 3
+        self.battle_pile[rows] = -1
+        self.battle_count[rows] = 0
+        self.history[rows] = -1
+        self.team_points[rows] = 0
+
+        # Deal 6 cards to each player (1 card at a time to each player)
+        for i in range(6):
+            for p in range(self.players_count):
+                self.draw(rows, np.full(n, p))
+
+        # Initalize current player (the first turn advances to the first player)
+        self.play_status[rows] = 0
+        self.player_current[rows] = self.players_count - 1
+        self.extension_team[rows] = -1
+        self.coup_fourre_player[rows] = -1
+        self.coup_fourre_team[rows] = -1
+
+        self.start_turn(rows)
+
+        return self.states.copy(), self.masks.copy()
+
+    def draw(self, rows, seats):
+        """
+        Draw a card for each given player if there are cards remaining
+        """
+
+        has_cards = self.deck_count[rows] > 0
+        rows = rows[has_cards]
+        seats = seats[has_cards]
+
+        self.deck_count[rows] -= 1
+        self.hands[rows, seats, self.hand_count[rows, seats]] = self.deck[rows, self.deck_count[rows]]
+        self.hand_count[rows, seats] += 1
+
+    def hand_remove(self, rows, seats, cards):
+        """
+        Remove the first matching card from each given player's hand (remaining cards keep their order)
+        """
+
+        hand = self.hands[rows, seats]
+        position = np.argmax(hand == cards[:, np.newaxis], axis=1)
+        slots = np.arange(hand.shape[1])
+        shift = np.minimum(slots + (slots >= position[:, np.newaxis]), hand.shape[1] - 1)
+        hand = np.take_along_axis(hand, shift, axis=1)
+        hand[:, -1] = -1
+
+        self.hands[rows, seats] = hand
+        self.hand_count[rows, seats] -= 1
+
+    def next_seat(self, rows, seats, offset_first):
+        """
+        Return (ndarray) the next seat with cards in hand, checking seats from seat + offset_first (0 = include the seat itself)
+        """
+
+        candidates = (seats[:, np.newaxis] + np.arange(offset_first, offset_first + self.players_count)) % self.players_count
+        has_cards = self.hand_count[rows[:, np.newaxis], candidates] > 0
+        return candidates[np.arange(len(rows)), np.argmax(has_cards, axis=1)]
+
+    def start_turn(self, rows):
+        """
+        Begin the next player's turn for the given games (see environment.Game.start_turn)
+            Players without available actions are skipped until every game has a player with available actions
+        """
+
+        while len(rows) > 0:
+            play_status = self.play_status[rows]
+            seats = self.player_current[rows].astype(np.int64)
+
+            # Normal game play - advance to next player (next player with cards when the deck is empty)
+            normal = play_status == 0
+            deck_left = normal & (self.deck_count[rows] > 0)
+            seats[deck_left] = (seats[deck_left] + 1) % self.players_count
+            deck_empty = normal & ~deck_left
+            seats[deck_empty] = self.next_seat(rows[deck_empty], seats[deck_empty], 1)
+            self.draw(rows[deck_left], seats[deck_left])
+
+            # Coup Fourre Check - next player on the hazard team, or back to normal play once the hazard player is reached
+            coup_fourre = play_status == 1
+            if coup_fourre.any():
+                i = rows[coup_fourre]
+                candidates = (seats[coup_fourre, np.newaxis] + np.arange(1, self.players_count + 1)) % self.players_count
+                team_player = (candidates % self.teams_count) == self.coup_fourre_team[i, np.newaxis]
+                hazard_player = candidates == self.coup_fourre_player[i, np.newaxis]
+                first = np.argmax(team_player | hazard_player, axis=1)
+                seats[coup_fourre] = candidates[np.arange(len(i)), first]
+
+                returned = hazard_player[np.arange(len(i)), first]
+                if returned.any():
+                    j = i[returned]
+                    self.play_status[j] = 0
+                    self.coup_fourre_player[j] = -1
+                    self.coup_fourre_team[j] = -1
+
+                    k = np.flatnonzero(coup_fourre)[returned]
+                    seats[k] = self.next_seat(j, seats[k], 1)
+                    self.draw(j, seats[k])
+
+            # Safety Bonus Turn - current player unless they do not have any cards (then next player with cards)
+            bonus = play_status == 3
+            if bonus.any():
+                seats[bonus] = self.next_seat(rows[bonus], seats[bonus], 0)
+                self.draw(rows[bonus], seats[bonus])
+
+            # Note: Extension Check - current player does not change
+            self.player_current[rows] = seats
+
+            # State-Action space: populate current game state and possible actions
+            self.observe(rows)
+
+            # Extension Check and Safety Bonus Turn are resolved by the next action
+            play_status = self.play_status[rows]
+            self.play_status[rows[(play_status == 2) | (play_status == 3)]] = 0
+
+            # No actions possible for current player, start next player's turn
+            rows = rows[~self.masks[rows].any(axis=1)]
+
+    def observe(self, rows):
+        """
+        Populate states and masks for the current player of the given games
+        """
+
+        n = len(rows)
+        seats = self.player_current[rows]
+        states = np.full((n, 47), -1, dtype=np.int16)
+
+        states[:, 0] = self.players_count
+        states[:, 1] = self.play_status[rows]
+        states[:, 2] = self.extension_team[rows]
+        states[:, 3] = seats % self.teams_count
+        states[:, 4] = self.deck_count[rows]
+        states[:, 5:16] = self.history[rows, seats]
+        states[:, 16:16 + 8 * self.teams_count] = self.team_status[rows].reshape(n, -1)
+        states[:, 40:47] = self.hands[rows, seats]
+
+        self.states[rows] = states
+        self.masks[rows] = env.actions_mask_batch(states)
+
+    def trip_complete(self, rows, teams):
+        """
+        Return (ndarray) end of game reward points for the given games' team reaching their trip (Game Over)
+            trip completed (400), Shut-out (500), delayed action (300), safe trip (300)
+        """
+
+        distance = self.team_status[rows, :, 2]
+        shut_out = (distance.sum(axis=1) - distance[np.arange(len(rows)), teams]) == 0
+        delayed_action = self.deck_count[rows] == 0
+        safe_trip = self.team_status[rows, teams, 3] == 0
+
+        self.play_status[rows] = 4
+
+        return 400 + 500 * shut_out + 300 * delayed_action + 300 * safe_trip
+
+    def step(self, actions):
+        """
+        Play the action for the current player of every game and start the next player's turn
+            Finished games are reset (their next state is the first state of a new game)
+
+        actions (ndarray) - shape (N,) action index for each game (must be available, see masks)
+
+        Return (states, masks, rewards, dones)
+            states (ndarray) - shape (N, 47) state for the current player of each game
+            masks (ndarray) - shape (N, 97) available actions for the current player of each game
+            rewards (ndarray) - shape (N, teams) points earned by each team from the action
+            dones (ndarray) - shape (N,) True if the game finished (final points in final_team_points)
+        """
+
+        actions = np.asarray(actions)
+        n = self.games_count
+        rows = np.arange(n)
+        seats = self.player_current.astype(np.int64)
+        teams = seats % self.teams_count
+        action_team, action_kind, action_code = action_decode[actions].T
+        reward = np.zeros(n, dtype=np.int32)
+        rewards = np.zeros((n, self.teams_count), dtype=np.int32)
+
+        # Card played (-1 = n/a: Extension, Coup Fourre "Do not play")
+        card = np.where(action_kind == 0, action_code, -1)
+        coup_fourre_play = (action_kind == 1) & (action_code < 4)
+        card[coup_fourre_play] = safety_card[action_code[coup_fourre_play]]
+        played = card > -1
+        self.hand_remove(rows[played], seats[played], card[played])
+        played_type = np.where(played, card_type[np.maximum(card, 0)], -1)
+
+        # Action history: the action is seen by every other player, the current player's history restarts
+        history = self.history
+        history[:, :, 1:] = history[:, :, :-1]
+        history[:, :, 0] = actions[:, np.newaxis]
+        history[rows, seats] = -1
+
+        table = action_team > -1
+
+        # Distance
+        i = rows[table & (played_type == 0)]
+        if len(i) > 0:
+            t = teams[i]
+            distance = card_distance[card[i]]
+            self.team_status[i, t, 2] += distance
+            self.team_status[i, t, 3] += distance == 200
+            reward[i] += distance
+            team_points = self.team_status[i, t, 2]
+
+            if self.players_count != 4:
+                # Extension play possible
+                extension_call = (self.extension_team[i] == -1) & (team_points == 700)
+                self.play_status[i[extension_call]] = 2
+
+                trip = (self.extension_team[i] > -1) & (team_points == 1000)
+                j = i[trip]
+                t = t[trip]
+
+                # Extension reward (200) to the team completing the trip and to any other team that did not call the Extension
+                reward[j] += 200 + self.trip_complete(j, t)
+                for k in range(self.teams_count):
+                    other = (t != self.extension_team[j]) & (k != t) & (k != self.extension_team[j])
+                    rewards[j[other], k] += 200
+            else:
+                trip = team_points == 1000
+                reward[i[trip]] += self.trip_complete(i[trip], t[trip])
+
+        # Remedy
+        i = rows[table & (played_type == 1)]
+        if len(i) > 0:
+            t = teams[i]
+            status = card_battle_status[card[i]]
+
+            speed = status == -1
+            self.team_status[i[speed], t[speed], 0] = 0
+
+            i = i[~speed]
+            t = t[~speed]
+            self.battle_push(i, t, card[i])
+            self.team_status[i, t, 1] = np.where((status[~speed] == 3) | (self.team_status[i, t, 7] == 1), 4, 3)
+
+        # Hazard
+        i = rows[table & (played_type == 3)]
+        if len(i) > 0:
+            t = action_team[i]
+            status = card_battle_status[card[i]]
+
+            speed = status == -1
+            self.team_status[i[speed], t[speed], 0] = 1
+            self.battle_push(i[~speed], t[~speed], card[i[~speed]])
+            self.team_status[i[~speed], t[~speed], 1] = status[~speed]
+
+            # Coup Fourre check
+            self.play_status[i] = 1
+            self.coup_fourre_player[i] = seats[i]
+            self.coup_fourre_team[i] = t
+
+        # Safety (or Coup Fourre)
+        i = rows[table & (played_type == 2)]
+        if len(i) > 0:
+            t = teams[i]
+            safety_index = card_safety[card[i]]
+            self.team_status[i, t, 4 + safety_index] = 1
+            reward[i] += 100 + 300 * (self.team_status[i, t, 4:8].sum(axis=1) == 4)
+
+            # Right-of-Way removes any Speed Limit
+            self.team_status[i[safety_index == 3], t[safety_index == 3], 0] = 0
+
+            self.battle_process(i, t)
+
+            # Coup Fourre: reward, immediately draw a card and clear the coup fourre check
+            coup_fourre = action_kind[i] == 1
+            j = i[coup_fourre]
+            reward[j] += 300
+            self.draw(j, seats[j])
+            self.coup_fourre_player[j] = -1
+            self.coup_fourre_team[j] = -1
+
+            # Player get's a bonus turn
+            self.play_status[i] = 3
+
+        # Extension
+        extension = action_kind == 2
+        i = rows[extension & (action_code == 0)]
+        self.extension_team[i] = teams[i]
+        i = rows[extension & (action_code == 1)]
+        reward[i] += self.trip_complete(i, teams[i])
+
+        rewards[rows, teams] += reward
+        self.team_points += rewards
+
+        # Move to next player (or End Game when no more plays are possible)
+        no_cards = (self.deck_count == 0) & (self.hand_count.sum(axis=1) == 0)
+        self.play_status[(self.play_status < 4) & no_cards] = 4
+        self.start_turn(rows[self.play_status < 4])
+
+        # Reset finished games
+        dones = self.play_status == 4
+        if dones.any():
+            self.final_team_points[dones] = self.team_points[dones]
+            self.games_played[dones] += 1
+            self.reset(rows[dones])
+
+        return self.states.copy(), self.masks.copy(), rewards, dones
+
+    def battle_push(self, rows, teams, cards):
+        """
+        Add cards to the top of the given teams' battle piles
+        """
+
+        self.battle_pile[rows, teams, self.battle_count[rows, teams]] = cards
+        self.battle_count[rows, teams] += 1
+
+    def battle_process(self, rows, teams):
+        """
+        Update the battle status after a Safety is played (see environment.Game.play_action)
+            Hazards countered by the team's safeties are removed from the top of the battle pile, the top card then sets the battle status
+        """
+
+        while len(rows) > 0:
+            count = self.battle_count[rows, teams]
+            top_card = self.battle_pile[rows, teams, np.maximum(count - 1, 0)]
+            empty = count == 0
+            remedy = card_type[top_card] == 1
+            countered = ~empty & ~remedy & (self.team_status[rows, teams, 4 + np.maximum(card_safety[top_card], 0)] == 1)
+
+            # Team can "Go" (empty pile or remedy on top), otherwise the hazard on top applies
+            done = ~countered
+            self.team_status[rows[done], teams[done], 1] = np.where(empty[done] | remedy[done], 4, card_battle_status[top_card[done]])
+
+            # Remove countered hazards and keep processing
+            self.battle_count[rows[countered], teams[countered]] -= 1
+            rows = rows[countered]
+            teams = teams[countered]
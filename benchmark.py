@@ -0,0 +1,256 @@
+import argparse                 # Command line options
+import json                     # Results file
+import os                       # Git commit of the results
+import platform                 # Environment details
+import random                   # Random policy
+import subprocess               # Git commit of the results
+import sys
+import time                     # Timings
+import tracemalloc              # Peak memory
+import numpy as np
+import environment as env
+import core                     # Compiled backend throughput
+
+# --------------------
+# Helper functions
+#   Every benchmark uses fixed seeds (deck shuffle and random policy) so results are comparable across commits
+
+players_names = {2: ['P1', 'P2'], 3: ['P1', 'P2', 'P3'], 4: ['P1', 'P2', 'P3', 'P4'], 6: ['P1', 'P2', 'P3', 'P4', 'P5', 'P6']}
+
+def latency_summary(latencies):
+    """
+    Return ({str: float}) - calls, total seconds, calls per second and p50/p99/max latency (microseconds) of a list of latencies (nanoseconds, one per call)
+    """
+
+    latencies = np.array(latencies, dtype=np.float64)
+    calls = len(latencies)
+    per_call = latencies / 1000
+    total = latencies.sum() / 1e9
+
+    return {
+        'calls': calls,
+        'seconds': round(total, 6),
+        'per_second': round(calls / total, 1) if total > 0 else None,
+        'p50_us': round(float(np.percentile(per_call, 50)), 3),
+        'p99_us': round(float(np.percentile(per_call, 99)), 3),
+        'max_us': round(float(per_call.max()), 3)
+    }
+
+def random_game(players_count, seed, step_latencies=None, game_build=env.Game):
+    """
+    Return (Game) a game played to the end with a random policy
+
+    players_count (int) - number of players
+    seed (int) - seed of the deck shuffle and the random policy
+    step_latencies ([int]|None) - play_action latencies (nanoseconds) are appended when given
+    game_build (function) - game constructor (environment.Game, or core.game_build for the play loops' backend)
+    """
+
+    rng = random.Random(seed)
+    game = game_build(players_names[players_count], seed=seed)
+
+    if step_latencies is None:
+        while game.play_status < 4:
+            game.play_action(rng.choice(game.player_actions))
+    else:
+        clock = time.perf_counter_ns
+        while game.play_status < 4:
+            action = rng.choice(game.player_actions)
+            start = clock()
+            game.play_action(action)
+            step_latencies.append(clock() - start)
+
+    return game
+
+def positions_build(players_count, games, seed):
+    """
+    Return ([Game], [[int]]) - copies of games at every decision point of random games, and the state at each point
+    """
+
+    positions = []
+    states = []
+
+    for i in range(games):
+        rng = random.Random(seed + i)
+        game = env.Game(players_names[players_count], seed=seed + i)
+        while game.play_status < 4:
+            positions.append(game.clone())
+            states.append(game.player_state)
+            game.play_action(rng.choice(game.player_actions))
+
+    return positions, states
+
+# --------------------
+# Benchmarks
+
+def bench_components(players_count, games, seed, repeat):
+    """
+    Return ({str: dict}) - latency summary of each engine component (see latency_summary)
+        game_init - Game.__init__ (deck build, shuffle, deal, first turn)
+        start_turn - Game.start_turn as called by play_action (includes state and actions_space)
+        state - Game.state
+        actions_space - actions_space
+        play_action - Game.play_action (includes start_turn)
+    """
+
+    clock = time.perf_counter_ns
+    names = players_names[players_count]
+    results = {}
+
+    # Game.__init__
+    latencies = []
+    for i in range(games * repeat):
+        start = clock()
+        env.Game(names, seed=seed + i % games)
+        latencies.append(clock() - start)
+    results['game_init'] = latency_summary(latencies)
+
+    # Game.start_turn - timed through a wrapper on the instance (play_action calls self.start_turn)
+    latencies = []
+    for i in range(games):
+        rng = random.Random(seed + i)
+        game = env.Game(names, seed=seed + i)
+        start_turn = game.start_turn
+
+        def start_turn_timed():
+            start = clock()
+            start_turn()
+            latencies.append(clock() - start)
+
+        game.start_turn = start_turn_timed
+        while game.play_status < 4:
+            game.play_action(rng.choice(game.player_actions))
+    results['start_turn'] = latency_summary(latencies)
+
+    # Game.state and actions_space at every decision point - each call is timed (the percentiles show the tail), repeat passes over the positions
+    positions, states = positions_build(players_count, games, seed)
+
+    latencies = []
+    for r in range(repeat):
+        for game in positions:
+            start = clock()
+            game.state()
+            latencies.append(clock() - start)
+    results['state'] = latency_summary(latencies)
+
+    latencies = []
+    for r in range(repeat):
+        for state in states:
+            start = clock()
+            env.actions_space(state, None, None)
+            latencies.append(clock() - start)
+    results['actions_space'] = latency_summary(latencies)
+
+    # Game.play_action
+    latencies = []
+    for i in range(games):
+        random_game(players_count, seed + i, latencies)
+    results['play_action'] = latency_summary(latencies)
+
+    return results
+
+def bench_games(players_count, games, seed, memory_games):
+    """
+    Return ({str: float}) - full random games: games per second, steps per second, p50/p99 step latency and peak memory
+        peak_memory_kb - highest traced memory while playing one game (measured in a separate pass, tracing slows the engine)
+        core_games_per_second - games per second of the play loops' backend (core.game_build, None = the Python backend, same as games_per_second)
+    """
+
+    # Throughput (no per-step timing)
+    steps = 0
+    start = time.perf_counter()
+    for i in range(games):
+        steps += int((random_game(players_count, seed + i).action_history.actions > -1).sum())
+    seconds = time.perf_counter() - start
+
+    # Play loops' backend (compiled core)
+    core_games_per_second = None
+    if core.backend == 'compiled':
+        start = time.perf_counter()
+        for i in range(games):
+            random_game(players_count, seed + i, game_build=core.game_build)
+        core_games_per_second = round(games / (time.perf_counter() - start), 1)
+
+    # Step latency
+    latencies = []
+    for i in range(games):
+        random_game(players_count, seed + i, latencies)
+    latency = latency_summary(latencies)
+
+    # Peak memory of a game
+    peak = 0
+    for i in range(memory_games):
+        tracemalloc.start()
+        random_game(players_count, seed + i)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        'games': games,
+        'steps': steps,
+        'seconds': round(seconds, 6),
+        'games_per_second': round(games / seconds, 1),
+        'steps_per_second': round(steps / seconds, 1),
+        'step_p50_us': latency['p50_us'],
+        'step_p99_us': latency['p99_us'],
+        'peak_memory_kb': round(peak / 1024, 1),
+        'core_games_per_second': core_games_per_second
+    }
+
+def run(players_counts=(2, 3, 4, 6), games=200, seed=0, repeat=10, memory_games=20):
+    """
+    Return (dict) - benchmark results (JSON serializable)
+
+    players_counts ((int)) - player counts to benchmark
+    games (int) - random games per player count (seeds seed to seed + games - 1)
+    seed (int) - first seed
+    repeat (int) - repetitions of the fast components (Game.__init__, state, actions_space) for more timed calls
+    memory_games (int) - games traced for peak memory
+    """
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    results = {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                        'processor': platform.processor(), 'commit': commit, 'core_backend': core.backend},
+        'settings': {'players_counts': list(players_counts), 'games': games, 'seed': seed, 'repeat': repeat, 'memory_games': memory_games},
+        'components': {},
+        'games': {}
+    }
+
+    for players_count in players_counts:
+        results['components'][str(players_count)] = bench_components(players_count, games, seed, repeat)
+        results['games'][str(players_count)] = bench_games(players_count, games, seed, memory_games)
+
+    return results
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Mille Bornes engine benchmark (fixed seeds, random policy)")
+    parser.add_argument('--players', type=int, nargs='+', default=[2, 3, 4, 6], choices=[2, 3, 4, 6], help="player counts")
+    parser.add_argument('--games', type=int, default=200, help="random games per player count")
+    parser.add_argument('--seed', type=int, default=0, help="first seed")
+    parser.add_argument('--repeat', type=int, default=10, help="repetitions of the fast components")
+    parser.add_argument('--memory-games', type=int, default=20, help="games traced for peak memory")
+    parser.add_argument('--output', help="JSON results file (default: print to stdout)")
+    options = parser.parse_args(arguments)
+
+    results = run(options.players, options.games, options.seed, options.repeat, options.memory_games)
+
+    if options.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+        for players_count, result in results['games'].items():
+            print(f"{players_count} players: {result['games_per_second']} games/s, {result['steps_per_second']} steps/s, "
+                  f"step p50 {result['step_p50_us']} us, p99 {result['step_p99_us']} us, peak {result['peak_memory_kb']} KB, "
+                  f"core {result['core_games_per_second']} games/s")
+
+if __name__ == '__main__':
+    main()
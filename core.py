@@ -0,0 +1,183 @@
+import os                       # Backend selection
+import numpy as np
+import environment as env
+
+# --------------------
+# Game Core - the rules engine behind a small integer interface (state, actions, play_action)
+#   The compiled backend (environment_core.pyx, build with: python core_build.py) is used when it has been built,
+#   otherwise the Python backend (environment.Game, the reference implementation)
+#   Set the environment variable MILLE_BORNES_CORE=python to use the Python backend
+#   Play loops (rollout, tournament, async_play) build their games with game_build: a CoreGame on the compiled backend,
+#   environment.Game otherwise or when the loop needs the full Game (MCTS policies, custom policy functions)
+#   Both backends list the available actions in ascending order, a seeded loop plays the same games on either backend
+
+class GameCorePython():
+    """
+    Python backend - environment.Game with the GameCore interface (see environment_core.GameCore)
+
+    Attributes:
+        game (environment.Game) - the game played
+    """
+
+    def __init__ (self, players_count, seed=None, deck_order=None):
+        """
+        players_count (int) - number of players (2, 3, 4 or 6)
+        seed (int|random.Random|numpy.random.Generator|None) - seed or random number generator for the deck shuffle
+        deck_order ([int]|None) - deck order to play instead of a shuffle
+        """
+
+        self.game = env.Game([f"Player {i + 1}" for i in range(players_count)], seed, deck_order)
+        self.players_count = players_count
+        self.teams_count = len(self.game.teams)
+        self.deck_order = self.game.deck_order
+
+    @property
+    def play_status(self):
+        return self.game.play_status
+
+    @property
+    def seat(self):
+        return self.game.scheduler.seat
+
+    def state(self):
+        return list(self.game.player_state)
+
+    def actions(self):
+        return sorted(self.game.player_actions)
+
+    def play_action(self, action_index):
+        self.game.play_action(action_index)
+
+    def final_team_points(self):
+        return self.game.final_team_points()
+
+    def history(self):
+        history = self.game.action_history
+        return history.seats.tolist(), history.actions.tolist(), history.rewards.tolist()
+
+    def history_states(self):
+        return self.game.action_history.states.tolist()
+
+backend = 'python'
+GameCore = GameCorePython
+
+if os.environ.get('MILLE_BORNES_CORE', '') != 'python':
+    try:
+        from environment_core import GameCore
+        backend = 'compiled'
+    except ImportError:
+        pass
+
+# --------------------
+# Core Game - the part of the environment.Game interface used by play loops, on the selected backend
+
+class CoreScheduler():
+    """
+    Current seat of a CoreGame (game.scheduler.seat, as environment.Game.scheduler)
+    """
+
+    def __init__ (self, game_core):
+        self.game_core = game_core
+
+    @property
+    def seat(self):
+        return self.game_core.seat
+
+class CoreHistory():
+    """
+    Action history columns of a finished CoreGame (the environment.ActionHistory views used by environment.transitions_batch)
+
+    Attributes:
+        seats (ndarray) - shape (T,) int8
+        actions (ndarray) - shape (T,) int16
+        rewards (ndarray) - shape (T,) int32
+        states (ndarray) - shape (T, 47) int16
+    """
+
+    def __init__ (self, game_core):
+        seats, actions, rewards = game_core.history()
+        self.seats = np.array(seats, dtype=np.int8)
+        self.actions = np.array(actions, dtype=np.int16)
+        self.rewards = np.array(rewards, dtype=np.int32)
+        self.states = np.array(game_core.history_states(), dtype=np.int16).reshape(-1, 47)
+
+    def __len__ (self):
+        return len(self.actions)
+
+class CoreGame():
+    """
+    A game played by GameCore with the environment.Game attributes and methods of a play loop
+        play_status, scheduler.seat, player_state, player_actions (ascending, as environment.Game), play_action, team_points, final_team_points,
+        teams and players (only their number), deck_order, action_history, history_actions and transitions (after the game) - enough for
+        game_log.record_encode and environment.transitions_batch
+        No card piles, clone or snapshot - searches (mcts, endgame) and the gym wrappers use environment.Game
+
+    Attributes:
+        game_core (GameCore) - the game played
+    """
+
+    def __init__ (self, player_names, seed=None, deck_order=None):
+        """
+        player_names ([str]) - names of the players (only the number of players is used)
+        seed (int|random.Random|numpy.random.Generator|None) - seed or random number generator for the deck shuffle
+        deck_order ([int]|None) - deck order to play instead of a shuffle
+        """
+
+        self.game_core = GameCore(len(player_names), seed, deck_order)
+        self.teams = range(self.game_core.teams_count)
+        self.players = range(len(player_names))
+        self.deck_order = self.game_core.deck_order
+        self.scheduler = CoreScheduler(self.game_core)
+        self.player_actions = self.game_core.actions()
+        self.history = None
+
+    @property
+    def play_status(self):
+        return self.game_core.play_status
+
+    @property
+    def player_state(self):
+        return self.game_core.state()
+
+    @property
+    def team_points(self):
+        return self.game_core.final_team_points()
+
+    def play_action(self, action_index):
+        self.game_core.play_action(action_index)
+        self.player_actions = self.game_core.actions()
+        self.history = None
+
+    def final_team_points(self):
+        return self.game_core.final_team_points()
+
+    @property
+    def action_history(self):
+        if self.history is None:
+            self.history = CoreHistory(self.game_core)
+        return self.history
+
+    @property
+    def history_actions(self):
+        return self.action_history.actions.tolist()
+
+    def transitions(self, seat, n_step=1, discount=1.0):
+        """
+        Return (states, actions, rewards, next_states, dones, next_masks) the transitions of the player at the seat (see environment.transitions_batch)
+        """
+
+        return env.transitions_batch([self], seat, n_step, discount)
+
+def game_build(player_names, seed=None, deck_order=None, full=False):
+    """
+    Return (CoreGame|environment.Game) a game for a play loop - a CoreGame on the compiled backend, otherwise (or when full is True) environment.Game
+
+    player_names ([str]) - names of the players (in game play order)
+    seed (int|random.Random|numpy.random.Generator|None) - seed or random number generator for the deck shuffle
+    deck_order ([int]|None) - deck order to play instead of a shuffle
+    full (bool) - the loop needs the full environment.Game (e.g. MCTS policies clone the game)
+    """
+
+    if backend == 'compiled' and not full:
+        return CoreGame(player_names, seed, deck_order)
+    return env.Game(player_names, seed, deck_order)
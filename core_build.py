@@ -0,0 +1,9 @@
+from setuptools import setup, Extension     # Build the compiled rules core (requires Cython and a C compiler)
+from Cython.Build import cythonize
+
+# Build environment_core in place (next to environment.py): python core_build.py
+setup(
+    name='environment_core',
+    ext_modules=cythonize([Extension('environment_core', ['environment_core.pyx'])]),
+    script_args=['build_ext', '--inplace']
+)
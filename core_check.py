@@ -0,0 +1,139 @@
+import argparse                 # Command line options
+import random                   # Random policy
+import sys
+import time                     # Speed comparison
+import numpy as np
+import environment as env
+import core
+
+# --------------------
+# Differential check of the compiled rules core against the Python reference (environment.Game)
+#   Both backends play the same games (same seeds, same random policy over the ascending available actions),
+#   every state, available actions, action history entry and final points must be identical
+#   The play loops' path (core.game_build, a CoreGame) is compared with environment.Game the same way, and the transitions of every seat
+#   Usage: python core_check.py [--games 500] [--seed 0]
+
+def play(game_core, seed, record=True):
+    """
+    Return ([([int], [int])]) - state and available actions at each decision of a game played with a random policy (empty if record is False)
+    """
+
+    rng = random.Random(seed)
+    decisions = []
+
+    while game_core.play_status < 4:
+        actions = game_core.actions()
+        if record:
+            decisions.append((game_core.state(), actions))
+        game_core.play_action(rng.choice(actions))
+
+    return decisions
+
+def compare(players_count, seed):
+    """
+    Return (str|None) - description of the first difference between the backends for a game (None = identical)
+    """
+
+    reference = core.GameCorePython(players_count, seed)
+    compiled = core.GameCore(players_count, seed)
+
+    decisions_reference = play(reference, seed)
+    decisions_compiled = play(compiled, seed)
+
+    for step in range(min(len(decisions_reference), len(decisions_compiled))):
+        if decisions_reference[step][0] != decisions_compiled[step][0]:
+            return f"step {step}: state {decisions_reference[step][0]} != {decisions_compiled[step][0]}"
+        if decisions_reference[step][1] != decisions_compiled[step][1]:
+            return f"step {step}: actions {decisions_reference[step][1]} != {decisions_compiled[step][1]}"
+
+    if len(decisions_reference) != len(decisions_compiled):
+        return f"game length {len(decisions_reference)} != {len(decisions_compiled)}"
+    if reference.history() != compiled.history():
+        return "action history (seats, actions, rewards) differs"
+    if reference.history_states() != compiled.history_states():
+        return "action history states differ"
+    if reference.final_team_points() != compiled.final_team_points():
+        return f"final points {reference.final_team_points()} != {compiled.final_team_points()}"
+
+    return None
+
+def compare_game_build(players_count, seed):
+    """
+    Return (str|None) - description of the first difference between a core.game_build game and environment.Game (None = identical)
+    """
+
+    names = [f"Player {i + 1}" for i in range(players_count)]
+    games = [env.Game(names, seed=seed), core.game_build(names, seed=seed)]
+    rng = random.Random(seed)
+    step = 0
+
+    while games[0].play_status < 4:
+        if games[1].play_status != games[0].play_status or games[1].scheduler.seat != games[0].scheduler.seat:
+            return f"step {step}: play status / seat differ"
+        if list(games[1].player_state) != list(games[0].player_state):
+            return f"step {step}: state {games[0].player_state} != {list(games[1].player_state)}"
+        actions = sorted(games[0].player_actions)
+        if sorted(games[1].player_actions) != actions:
+            return f"step {step}: actions {actions} != {sorted(games[1].player_actions)}"
+
+        action = rng.choice(actions)
+        for game in games:
+            game.play_action(action)
+        step += 1
+
+    if games[1].play_status != 4:
+        return f"game length {step} differs"
+    if games[1].final_team_points() != games[0].final_team_points():
+        return f"final points {games[0].final_team_points()} != {games[1].final_team_points()}"
+
+    for seat in range(players_count):
+        for a, b in zip(games[0].transitions(seat), games[1].transitions(seat)):
+            if not np.array_equal(a, b):
+                return f"transitions of seat {seat} differ"
+
+    return None
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Compare the compiled rules core with the Python reference")
+    parser.add_argument('--games', type=int, default=500, help="games per player count")
+    parser.add_argument('--seed', type=int, default=0, help="first seed")
+    options = parser.parse_args(arguments)
+
+    if core.backend != 'compiled':
+        print("Compiled core not available (build with: python core_build.py)")
+        return 1
+
+    failures = 0
+    for players_count in [2, 3, 4, 6]:
+        for seed in range(options.seed, options.seed + options.games):
+            difference = compare(players_count, seed) or compare_game_build(players_count, seed)
+            if difference is not None:
+                failures += 1
+                print(f"{players_count} players, seed {seed}: {difference}")
+
+        # Speed of both backends on the same games
+        seconds = []
+        for backend in [core.GameCorePython, core.GameCore]:
+            start = time.perf_counter()
+            for seed in range(options.seed, options.seed + options.games):
+                play(backend(players_count, seed), seed, record=False)
+            seconds.append(time.perf_counter() - start)
+
+        # Play loop path (core.game_build) with the random policy of the loops
+        names = [f"Player {i + 1}" for i in range(players_count)]
+        start = time.perf_counter()
+        for seed in range(options.seed, options.seed + options.games):
+            rng = random.Random(seed)
+            game = core.game_build(names, seed=seed)
+            while game.play_status < 4:
+                game.play_action(rng.choice(game.player_actions))
+        seconds.append(time.perf_counter() - start)
+
+        print(f"{players_count} players: {options.games} games compared, python {seconds[0]:.3f}s, compiled {seconds[1]:.3f}s ({seconds[0] / seconds[1]:.1f}x), "
+              f"game_build {seconds[2]:.3f}s ({seconds[0] / seconds[2]:.1f}x)")
+
+    print("identical" if failures == 0 else f"{failures} games differ")
+    return 0 if failures == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
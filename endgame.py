@@ -0,0 +1,529 @@
+import math                     # Search window bounds
+import random                   # Determinization
+import time                     # Search time limit
+import environment as env
+import mcts                     # Determinization
+
+# --------------------
+# Endgame Solver - exact play once the deck is empty
+#   With no cards left to draw the rest of the game only depends on the cards in the players' hands, the search plays every
+#   action to the end of the game (Game.play_action on one copy of the game, undone with position_save / position_load)
+#   Values are points gained from the position to the end of the game (the points already scored do not change the best play):
+#       2 teams - the margin (team 0 gains - team 1 gains), alpha-beta search (team 0 maximizes, team 1 minimizes)
+#       3 teams - the gains of each team, max-n search (each team maximizes its gains minus the best other team's gains)
+#   The value of a position for the current player's team is its gains minus the best other team's gains (the mcts.MCTSPlayer
+#   playout value, in points)
+#   A search is limited to time_limit seconds (and optionally max_nodes positions), past the budget it raises SearchBudgetExceeded
+#   (there is no approximate answer), the positions already solved stay in the table
+#   Coverage at deck exhaustion: 2 players are solved in tens of milliseconds; 4 players take from milliseconds to tens of seconds
+#   (about half within the default second)
+#   3 team endgames (3 and 6 players) are not solved at deck exhaustion - max-n search has no cutoffs and takes millions of positions,
+#   they are solved only once few cards are left in the hands
+
+card_type = env.card_lookup['type']
+card_distance = env.card_lookup['distance']
+card_safety = env.card_lookup['safety']
+action_decode = env.action_lookup['decode']
+
+def card_counter_build():
+    """
+    Return ((int)) by card index, the safety index that makes the card dead (see card_dead) - Remedy: a Safety of its own team;
+    Hazard: the Safety of every other team (-1 = n/a)
+        End of Limit and Roll are made dead by Right-of-Way (safety index 3), the other remedies by the Safety countering their hazard
+    """
+
+    card_battle_status = env.card_lookup['battle_status']
+    counter = []
+
+    for c in range(len(card_type)):
+        if card_type[c] == 1:
+            counter.append(3 if card_battle_status[c] == -1 else card_battle_status[c])
+        elif card_type[c] == 3:
+            counter.append(card_safety[c])
+        else:
+            counter.append(-1)
+
+    return tuple(counter)
+
+card_counter = card_counter_build()
+
+def action_order_build():
+    """
+    Return ((int)) search order priority by action index (lower first) - good actions first for alpha-beta cutoffs
+        Safety, Coup Fourre, Distance (highest first), Remedy, Hazard, Extension, Do not play (Coup Fourre), Discard
+    """
+
+    order = []
+
+    for action_team, action_kind, action_code in action_decode:
+        if action_kind == 1:
+            order.append(1 if action_code < 4 else 20)
+        elif action_kind == 2:
+            order.append(10 + action_code)
+        elif action_team == -1:
+            order.append(30 + card_type[action_code])
+        elif card_type[action_code] == 0:
+            # Distance card indices are in ascending distance (200 first)
+            order.append(6 - action_code)
+        else:
+            order.append((0, 7, 0, 8)[card_type[action_code]])
+
+    return tuple(order)
+
+action_order = action_order_build()
+
+def battle_pending(team):
+    """
+    Return ((int)) the hazards of the team's battle pile a safety can still uncover (top first)
+        A safety played removes the covered hazards from the top of the pile, down to a remedy (Go) or a hazard still in effect,
+        the cards under the top remedy and the hazards already covered by a safety are never reached
+    """
+
+    pending = []
+    for card in reversed(team.battle_pile):
+        if card_type[card] == 1:
+            break
+        if card_safety[card] not in team.safety_played:
+            pending.append(card)
+
+    return tuple(pending)
+
+def card_dead(card, team, teams):
+    """
+    Return (bool) True when the card can never be played by a player of the team (it can only be discarded) - stays True for the rest of the game
+        Distance - exceeds 1,000 points or a third 200; Remedy - the team has the Safety (the hazard can no longer apply);
+        Hazard - every other team has the Safety; Safety - never dead
+    """
+
+    kind = card_type[card]
+
+    if kind == 0:
+        distance = card_distance[card]
+        return team.status[2] + distance > 1000 or (distance == 200 and team.status[3] >= 2)
+    elif kind == 1:
+        return team.status[4 + card_counter[card]] == 1
+    elif kind == 3:
+        for t in teams:
+            if t is not team and t.status[4 + card_counter[card]] == 0:
+                return False
+        return True
+
+    return False
+
+def hand_key(player, teams):
+    """
+    Return ((int)) the player's hand sorted with the dead cards as -1 (dead cards are interchangeable, see card_dead)
+    """
+
+    return tuple(sorted(-1 if card_dead(c, player.team, teams) else c for c in player.hand))
+
+def position_key(game):
+    """
+    Return ((int|tuple)) a compact key of an endgame position (the deck is empty) - the game outcome from the position only depends on the key
+        Current player seat, state play status, extension team, coup fourre seat, team and hazard, team status (8 each) and pending battle pile hazards,
+        hands (see hand_key - the card order in a hand does not change the actions)
+    """
+
+    key = [
+        game.scheduler.seat,
+        game.player_state[1],
+        -1 if game.extension_team is None else game.extension_team.index,
+        -1 if game.coup_fourre_player is None else game.coup_fourre_player.seat,
+        -1 if game.coup_fourre_team is None else game.coup_fourre_team.index,
+        -1 if game.coup_fourre_hazard is None else game.coup_fourre_hazard
+    ]
+    for t in game.teams:
+        key += t.status
+        key.append(battle_pending(t))
+    for p in game.players:
+        key.append(hand_key(p, game.teams))
+
+    return tuple(key)
+
+def points_possible(game):
+    """
+    Return (bool) False when no team can score any more points - no Extension Check pending and no Safety or live Distance card is left in a hand
+    """
+
+    if game.player_state[1] == 2:
+        return True
+
+    for p in game.players:
+        for card in p.hand:
+            if card_type[card] == 2 or (card_type[card] == 0 and not card_dead(card, p.team, game.teams)):
+                return True
+
+    return False
+
+def actions_search(game):
+    """
+    Return ([int]) the current player's actions in search order (see action_order), one discard for all the dead cards of the hand
+        2 teams: no discard of a live card when the hand has a dead card - keeping the live card is never worse for the team
+        (any play that discards the dead card later can discard the live card instead, the other players' actions do not depend on the hand)
+    """
+
+    team = game.player_current.team
+    dead = [c for c in game.player_current.hand if card_dead(c, team, game.teams)]
+    actions = []
+
+    for action in sorted(game.player_actions, key=action_order.__getitem__):
+        action_team, action_kind, action_code = action_decode[action]
+        if action_kind == 0 and action_team == -1 and len(dead) > 0:
+            if action_code in dead:
+                if action_code != dead[0]:
+                    continue
+            elif len(game.teams) == 2:
+                continue
+        actions.append(action)
+
+    return actions
+
+def position_save(game):
+    """
+    Return (tuple) the parts of the game that play_action changes once the deck is empty (make/unmake for the search, see position_load)
+        The position can be loaded back after any number of actions (the deck stays empty)
+        Cheaper than Game.clone: no new players, teams or action history - lists that only grow are saved as their length
+    """
+
+    return (
+        game.scheduler.seat, game.player_current, game.play_status, game.player_state, game.player_actions,
+        game.coup_fourre_player, game.coup_fourre_team, game.coup_fourre_hazard, game.extension_team,
+        [p.hand[:] for p in game.players],
+        [(t.status[:], t.battle_pile[:], t.speed_pile[:], len(t.distance_pile), len(t.safety_pile), len(t.safety_played)) for t in game.teams],
+        [(p.history_last, p.points, p.reward_last) for p in game.players],
+        len(game.deck.cards_discard), game.cards_public[:], game.team_points[:], [scores[:] for scores in game.team_scores],
+        len(game.history_actions), game.action_history.count
+    )
+
+def position_load(game, saved):
+    """
+    Return the game to a position saved by position_save (lists are updated in place, the turn scheduler holds the players' hands)
+    """
+
+    (game.scheduler.seat, game.player_current, game.play_status, game.player_state, game.player_actions,
+     game.coup_fourre_player, game.coup_fourre_team, game.coup_fourre_hazard, game.extension_team,
+     hands, teams, players, discard_count, cards_public, team_points, team_scores, history_count, action_history_count) = saved
+
+    for t, (status, battle_pile, speed_pile, distance_count, safety_count, safety_played_count) in zip(game.teams, teams):
+        t.status[:] = status
+        t.battle_pile[:] = battle_pile
+        t.speed_pile[:] = speed_pile
+        del t.distance_pile[distance_count:]
+        del t.safety_pile[safety_count:]
+        del t.safety_played[safety_played_count:]
+    for p, hand, (history_last, points, reward_last) in zip(game.players, hands, players):
+        p.hand[:] = hand
+        p.history_last, p.points, p.reward_last = history_last, points, reward_last
+
+    del game.deck.cards_discard[discard_count:]
+    game.cards_public[:] = cards_public
+    game.team_points[:] = team_points
+    for scores, saved_scores in zip(game.team_scores, team_scores):
+        scores[:] = saved_scores
+    del game.history_actions[history_count:]
+    game.action_history.count = action_history_count
+
+class SearchBudgetExceeded(Exception):
+    """
+    The search reached its time or node budget before the position was solved (see EndgameSolver time_limit and max_nodes)
+        The positions solved before the budget ran out stay in the transposition table (a later search continues from them)
+    """
+
+# --------------------
+# Endgame Solver
+class EndgameSolver():
+    """
+    Exact endgame search with a transposition table (positions are keyed by position_key, entries are kept across searches)
+        Every search returns exact values, or raises SearchBudgetExceeded when it reaches time_limit or max_nodes
+
+    Attributes:
+        table ({tuple: (int, int, int)|(int)}) - transposition table: 2 teams - (lower bound, upper bound) of the margin and the best action; 3 teams - gains by team
+        max_entries (int) - the table is cleared before a search when it holds more entries
+        time_limit (float|None) - seconds a search (solve, action_values, value) can run (None = no limit)
+        max_nodes (int|None) - positions a search can visit (None = no limit, a reproducible budget unlike time_limit)
+        nodes (int) - positions searched (all searches)
+        hits (int) - positions answered by the table (all searches)
+
+    Methods:
+        solve - Return (int, int) the best action and its value for the current player's team
+        action_values - Return ({int: int}) the value of each available action for the current player's team
+        value - Return (int) the value of the position for the current player's team
+        clear - empty the transposition table
+    """
+
+    # Nodes between two checks of the clock
+    time_check_nodes = 256
+
+    def __init__ (self, max_entries=2000000, time_limit=1.0, max_nodes=None):
+        """
+        max_entries (int) - transposition table entries kept between searches
+        time_limit (float|None) - seconds a search can run before it raises SearchBudgetExceeded (None = no limit)
+        max_nodes (int|None) - positions a search can visit before it raises SearchBudgetExceeded (None = no limit)
+        """
+
+        self.table = {}
+        self.max_entries = max_entries
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.hits = 0
+        self.nodes_limit = math.inf
+        self.time_check = math.inf
+        self.deadline = math.inf
+
+    def clear(self):
+        self.table = {}
+
+    def check(self, game):
+        """
+        Return (Game) a copy of the game searched in place (the caller's game is not modified), starts the search budget
+        """
+
+        if len(game.deck.cards) > 0:
+            raise ValueError("The endgame solver needs a game with an empty deck")
+        if len(self.table) > self.max_entries:
+            self.table = {}
+
+        self.nodes_limit = math.inf if self.max_nodes is None else self.nodes + self.max_nodes
+        self.deadline = math.inf if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.time_check = self.nodes + self.time_check_nodes
+
+        return game.clone()
+
+    def node(self):
+        """
+        Count a node of the search - raises SearchBudgetExceeded past max_nodes or time_limit
+        """
+
+        self.nodes += 1
+        if self.nodes > self.nodes_limit:
+            raise SearchBudgetExceeded(f"Endgame search stopped after {self.max_nodes} nodes")
+        if self.nodes >= self.time_check:
+            self.time_check = self.nodes + self.time_check_nodes
+            if time.perf_counter() > self.deadline:
+                raise SearchBudgetExceeded(f"Endgame search stopped after {self.time_limit} seconds")
+
+    def solve(self, game):
+        """
+        Return (int, int) the best action (None if the game is over) and its value: the points the current player's team gains
+        minus the best other team's gains with best play by all teams (raises SearchBudgetExceeded past the budget)
+
+        game (environment.Game) - game with an empty deck and perfect information (all hands known, see solve_determinized) - not modified
+        """
+
+        game = self.check(game)
+        if game.play_status == 4:
+            return None, 0
+
+        team = game.player_current.team.index
+        actions = sorted(game.player_actions, key=action_order.__getitem__)
+
+        if len(game.teams) == 2:
+            # Margin by alpha-beta - an action is searched against the best value so far (a value outside the window is not better)
+            best_action = None
+            alpha, beta = -math.inf, math.inf
+            saved = position_save(game)
+            for action in actions:
+                reward = self.play(game, action)
+                value = reward + self.search_margin(game, alpha - reward, beta - reward)
+                position_load(game, saved)
+                if team == 0 and value > alpha:
+                    best_action, alpha = action, value
+                elif team == 1 and value < beta:
+                    best_action, beta = action, value
+            return best_action, alpha if team == 0 else -beta
+
+        values = self.values_search(game)
+        best_action = max(actions, key=values.__getitem__)
+        return best_action, values[best_action]
+
+    def action_values(self, game):
+        """
+        Return ({int: int}) by available action: the points the current player's team gains minus the best other team's gains
+        (the action is played, then best play by all teams - raises SearchBudgetExceeded past the budget)
+
+        game (environment.Game) - game with an empty deck and perfect information - not modified
+        """
+
+        return self.values_search(self.check(game))
+
+    def values_search(self, game):
+        team = game.player_current.team.index
+        saved = position_save(game)
+        values = {}
+
+        for action in game.player_actions:
+            reward = self.play(game, action)
+            if len(game.teams) == 2:
+                margin = reward + self.search_margin(game, -math.inf, math.inf)
+                values[action] = margin if team == 0 else -margin
+            else:
+                gains = [r + g for r, g in zip(reward, self.search_gains(game))]
+                values[action] = gains[team] - max(gains[t] for t in range(len(gains)) if t != team)
+            position_load(game, saved)
+
+        return values
+
+    def value(self, game):
+        """
+        Return (int) the points the current player's team gains minus the best other team's gains from the position with best play by all teams
+        (raises SearchBudgetExceeded past the budget)
+        """
+
+        game = self.check(game)
+        if game.play_status == 4:
+            return 0
+
+        team = game.player_current.team.index
+        if len(game.teams) == 2:
+            margin = self.search_margin(game, -math.inf, math.inf)
+            return margin if team == 0 else -margin
+
+        gains = self.search_gains(game)
+        return gains[team] - max(gains[t] for t in range(len(gains)) if t != team)
+
+    def play(self, game, action):
+        """
+        Return (int|(int)) the points gained by playing the action on the game (in place, see position_load): 2 teams - margin; 3 teams - gains by team
+        """
+
+        points = game.team_points[:]
+        game.play_action(action)
+        if len(points) == 2:
+            return (game.team_points[0] - points[0]) - (game.team_points[1] - points[1])
+        return tuple(p - q for p, q in zip(game.team_points, points))
+
+    def search_margin(self, game, alpha, beta):
+        """
+        Return (int) the margin (team 0 gains - team 1 gains) from the position with best play - exact when the margin is inside (alpha, beta),
+        otherwise a bound on the side of the window it falls (fail-soft alpha-beta)
+            The game is returned to the position before returning
+        """
+
+        self.node()
+        if game.play_status == 4 or not points_possible(game):
+            return 0
+
+        key = position_key(game)
+        entry = self.table.get(key)
+        if entry is not None:
+            lower, upper, best_action = entry
+            if lower == upper or lower >= beta or upper <= alpha:
+                self.hits += 1
+                return lower if lower >= beta or lower == upper else upper
+        else:
+            lower, upper, best_action = -math.inf, math.inf, None
+
+        actions = actions_search(game)
+        if best_action in actions:
+            # Best action of an earlier search of the position first
+            actions.remove(best_action)
+            actions.insert(0, best_action)
+
+        maximize = game.player_current.team.index == 0
+        best = -math.inf if maximize else math.inf
+        window_alpha, window_beta = alpha, beta
+        saved = position_save(game)
+
+        for i in range(len(actions)):
+            action = actions[i]
+            reward = self.play(game, action)
+
+            # Principal variation search: after the first action a null window shows whether an action is better, searched again if it is
+            if i > 0 and maximize and alpha > -math.inf:
+                value = reward + self.search_margin(game, alpha - reward, alpha - reward + 1)
+                if alpha < value < beta:
+                    value = reward + self.search_margin(game, alpha - reward, beta - reward)
+            elif i > 0 and not maximize and beta < math.inf:
+                value = reward + self.search_margin(game, beta - reward - 1, beta - reward)
+                if alpha < value < beta:
+                    value = reward + self.search_margin(game, alpha - reward, beta - reward)
+            else:
+                value = reward + self.search_margin(game, alpha - reward, beta - reward)
+            position_load(game, saved)
+
+            if maximize:
+                if value > best:
+                    best = value
+                    best_action = action
+                    if best > alpha:
+                        alpha = best
+            else:
+                if value < best:
+                    best = value
+                    best_action = action
+                    if best < beta:
+                        beta = best
+            if alpha >= beta:
+                break
+
+        # Store the result as bounds (a cutoff only bounds the margin from one side)
+        if best <= window_alpha:
+            upper = min(upper, best)
+        elif best >= window_beta:
+            lower = max(lower, best)
+        else:
+            lower = upper = best
+        self.table[key] = (lower, upper, best_action)
+
+        return best
+
+    def search_gains(self, game):
+        """
+        Return ((int)) the points gained by each team from the position with best play (max-n, 3 teams)
+            The game is returned to the position before returning
+        """
+
+        self.node()
+        if game.play_status == 4 or not points_possible(game):
+            return (0,) * len(game.teams)
+
+        key = position_key(game)
+        gains = self.table.get(key)
+        if gains is not None:
+            self.hits += 1
+            return gains
+
+        team = game.player_current.team.index
+        others = [t for t in range(len(game.teams)) if t != team]
+        best_value = -math.inf
+        saved = position_save(game)
+
+        for action in actions_search(game):
+            reward = self.play(game, action)
+            child_gains = tuple(r + g for r, g in zip(reward, self.search_gains(game)))
+            position_load(game, saved)
+            value = child_gains[team] - max(child_gains[t] for t in others)
+            if value > best_value:
+                best_value = value
+                gains = child_gains
+
+        self.table[key] = gains
+        return gains
+
+# --------------------
+# Imperfect information
+
+def solve_determinized(game, samples=20, seed=None, solver=None):
+    """
+    Return (int, {int: float}) the best action for the current player and the mean value of each available action over determinizations
+        The hidden hands are sampled from the current player's point of view (see mcts.determinize) and each sample is solved exactly
+        (the solver budget applies to each sample, a sample past it raises SearchBudgetExceeded)
+
+    game (environment.Game) - game with an empty deck (not modified)
+    samples (int) - number of determinizations
+    seed (int|None) - seed of the determinizations
+    solver (EndgameSolver|None) - solver (its transposition table is shared by the samples), None = new solver
+    """
+
+    rng = random.Random(seed)
+    solver = EndgameSolver() if solver is None else solver
+
+    totals = {a: 0 for a in game.player_actions}
+    for i in range(samples):
+        for action, value in solver.action_values(mcts.determinize(game, rng)).items():
+            totals[action] += value
+
+    values = {a: v / samples for a, v in totals.items()}
+    best_action = max(sorted(game.player_actions, key=action_order.__getitem__), key=values.__getitem__)
+    return best_action, values
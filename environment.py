@@ -1,4 +1,10 @@
 import random   # Shuffle (Deck - cards)
+import array   # Action history columns
+import collections   # Actions cache
+import json   # Instruments dump
+import time   # Instruments timers
+import struct   # Action history states and actions cache keys
+import numpy as np   # Action masks and action history views
 
 # --------------------
 # Helper functions
@@ -72,6 +78,129 @@ def safety_counter(hazard_value):
     hazard_index = ['Out of Gas', 'Flat Tire', 'Accident', 'Speed Limit', 'Stop'].index(hazard_value)
     return safety_choices[hazard_index]
 
+def deck_counts_build(players_count):
+    """
+    players_count (int) - number of game players
+    
+    Return ([int]) - number of cards in the deck by card index (1 of each Hazard type is removed for 2 or 3 players)
+    """
+    
+    num_of_cards = [10, 10, 10, 12, 4, 6, 6, 6, 6, 14, 1, 1, 1, 1]
+    
+    if players_count < 4:
+        num_of_cards.extend([2, 2, 2, 3, 4])
+    else:
+        num_of_cards.extend([3, 3, 3, 4, 5])
+    
+    return num_of_cards
+
+def card_lookup_build(card_matrix):
+    """
+    card_matrix (list) - list of unique card options
+    
+    Return (dict) - integer lookup tables for the card matrix, each table is a tuple indexed by card index
+        index ({(Card Type, Card Value): int}) - card index for a card type and value
+        type (int) - 0 = Distance; 1 = Remedy; 2 = Safety; 3 = Hazard
+        distance (int) - distance points (0 for non-distance cards)
+        battle_status (int) - battle status a Hazard sets or a Remedy counters (0 = Out of Gas; 1 = Flat Tire; 2 = Accident; 3 = Stop; -1 = Speed Pile card)
+        safety (int) - safety index of a Safety card or of the Safety countering a Hazard (0 = Extra Tank; 1 = Puncture-Proof; 2 = Driving Ace; 3 = Right-of-Way; -1 = n/a)
+        safety_card (int) - card index by safety index (indexed by safety index, not card index)
+    """
+    
+    card_types = ['Distance', 'Remedy', 'Safety', 'Hazard']
+    safety_values = ['Extra Tank', 'Puncture-Proof', 'Driving Ace', 'Right-of-Way']
+    remedy_values = ['Gasoline', 'Spare Tire', 'Repairs', 'Roll']
+    hazard_values = ['Out of Gas', 'Flat Tire', 'Accident', 'Stop']
+    
+    card_type = []
+    distance = []
+    battle_status = []
+    safety = []
+    
+    for c in card_matrix:
+        card_type.append(card_types.index(c[0]))
+        distance.append(c[1] if c[0] == 'Distance' else 0)
+        
+        if c[0] == 'Remedy':
+            battle_status.append(remedy_values.index(c[1]) if c[1] in remedy_values else -1)
+        elif c[0] == 'Hazard':
+            battle_status.append(hazard_values.index(c[1]) if c[1] in hazard_values else -1)
+        else:
+            battle_status.append(-1)
+        
+        if c[0] == 'Safety':
+            safety.append(safety_values.index(c[1]))
+        elif c[0] == 'Hazard':
+            safety.append(safety_values.index(safety_counter(c[1])))
+        else:
+            safety.append(-1)
+    
+    return {
+        'index': {(c[0], c[1]): i for i, c in enumerate(card_matrix)},
+        'type': tuple(card_type),
+        'distance': tuple(distance),
+        'battle_status': tuple(battle_status),
+        'safety': tuple(safety),
+        'safety_card': tuple(card_matrix.index(['Safety', v]) for v in safety_values)
+    }
+
+def action_lookup_build(card_matrix, action_matrix):
+    """
+    card_matrix (list) - list of unique card options
+    action_matrix (list) - list of all possible actions
+    
+    Return (dict) - integer lookup tables for the action matrix
+        play (((int),)) - play[team index + 1][card index] = action index (team index -1 = Discard)
+        coup_fourre (((int),)) - coup_fourre[team index][safety index | 4 (Do not play)] = action index
+        extension (((int),)) - extension[team index][0 (Yes) | 1 (No)] = action index
+        decode (((int, int, int),)) - decode[action index] = (Team index | -1 (Discard), Action kind, Code)
+            Action kind: 0 = Play a card (Code = card index); 1 = Coup Fourre (Code = safety index | 4 (Do not play)); 2 = Extension (Code = 0 (Yes) | 1 (No))
+    """
+    
+    card_index = {(c[0], c[1]): i for i, c in enumerate(card_matrix)}
+    coup_fourre_values = ['Extra Tank', 'Puncture-Proof', 'Driving Ace', 'Right-of-Way', 'Do not play']
+    extension_values = ['Yes', 'No']
+    
+    play = [[-1] * len(card_matrix) for i in range(4)]
+    coup_fourre = [[-1] * len(coup_fourre_values) for i in range(3)]
+    extension = [[-1] * len(extension_values) for i in range(3)]
+    decode = []
+    
+    for i in range(len(action_matrix)):
+        team, action_type, action_value = action_matrix[i]
+        
+        if action_type == 'Coup Fourre':
+            code = coup_fourre_values.index(action_value)
+            coup_fourre[team][code] = i
+            decode.append((team, 1, code))
+        elif action_type == 'Extension':
+            code = extension_values.index(action_value)
+            extension[team][code] = i
+            decode.append((team, 2, code))
+        else:
+            code = card_index[(action_type, action_value)]
+            play[team + 1][code] = i
+            decode.append((team, 0, code))
+    
+    return {
+        'play': tuple(tuple(t) for t in play),
+        'coup_fourre': tuple(tuple(t) for t in coup_fourre),
+        'extension': tuple(tuple(t) for t in extension),
+        'decode': tuple(decode)
+    }
+
+# Lookup tables for the standard card and action matrices (read-only, built once)
+card_lookup = card_lookup_build(card_matrix_build())
+action_lookup = action_lookup_build(card_matrix_build(), action_matrix_build(card_matrix_build()))
+
+# NumPy copies of the lookup tables (used by batch functions, e.g. actions_mask_batch)
+card_arrays = {k: np.array(v, dtype=np.int16) for k, v in card_lookup.items() if k != 'index'}
+action_arrays = {k: np.array(v, dtype=np.int16) for k, v in action_lookup.items()}
+
+# Score categories of the team score breakdown (Game.team_scores), index by name in score_index
+score_categories = ('distance', 'safety', 'coup_fourre', 'all_safeties', 'trip_completed', 'extension', 'shut_out', 'delayed_action', 'safe_trip')
+score_index = {score_categories[i]: i for i in range(len(score_categories))}
+
 def actions_space(state, card_matrix, action_matrix):
     """
     Return all available actions given the current game state
@@ -79,10 +208,18 @@ def actions_space(state, card_matrix, action_matrix):
     state ([int]) - current game state
     card_matrix (list) - lookup card info by index
     action_matrix (list) - lookup action info by index
+        Note: rules are evaluated with the precomputed card_lookup and action_lookup tables (built from the standard card and action matrices)
     
-    Return ([int]) - action indicies
+    Return ([int]) - action indicies in ascending order (the same order on any Python version and on the compiled core)
     """
     
+    # Lookup tables
+    card_type = card_lookup['type']
+    card_distance = card_lookup['distance']
+    card_battle_status = card_lookup['battle_status']
+    card_safety = card_lookup['safety']
+    action_decode = action_lookup['decode']
+    
     # Break state list into variables for easier legibility of code
     number_of_players = state[0]
     play_status = state[1]
@@ -96,112 +233,653 @@ def actions_space(state, card_matrix, action_matrix):
     team_status.append(state[24:32])  # Team 2
     if state[32] > -1:
         team_status.append(state[32:40])  # Team 3
-    player_hand = [Card(card_matrix[c][0], card_matrix[c][1]) for c in state[40:47] if c > -1]
+    player_hand = [c for c in state[40:47] if c > -1]
     
     # Variable to hold valid actions - use set to prevent duplicate action potentials (e.g. player has 2 cards of the same value)
     player_actions = set()
     
     if play_status == 0 or play_status == 3:
         # Normal game play
+        team_current = team_status[team_current_index]
+        action_team = action_lookup['play'][team_current_index + 1]
+        action_discard = action_lookup['play'][0]
+        
+        # Team will not exceed 700/1,000 if played
+        if (number_of_players == 4):
+            max_points = 1000
+        else:
+            max_points = 700 if extension_team == -1 else 1000
 
         for card in player_hand:
+            kind = card_type[card]
 
             # Play options - cards that can be played on the "table" (not discarded)
-            if card.type == "Safety":
+            if kind == 2:
                 # Safeties can be played on own team at any point
-                player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
-            elif card.type == "Distance":
+                player_actions.add(action_team[card])
+            elif kind == 0:
                 # Distance can be played on own team:
                 #   Team cannot exceed 1,000 distance points (or 700 if Extension has not yet been called for 2, 3, or 6 player games)
                 #   Top card in Battle Pile is Roll OR Right-of-Way Safety has been played and no other Hazard card is top of battle pile
                 #   Distance = 200 - Team cannot play more than 2 200 distance cards
                 #   Distance > 50 = Top card in Speed Pile is End of Limit or null OR Right-of-Way Safety has been played
+                distance = card_distance[card]
 
-                # Team will not exceed 700/1,000 if played
-                if (number_of_players == 4):
-                    max_points = 1000
-                else:
-                    max_points = 700 if extension_team == -1 else 1000
-
-                if (team_status[team_current_index][2] + card.value) <= max_points:
+                if (team_current[2] + distance) <= max_points:
 
-                    if team_status[team_current_index][1] == 4:
+                    if team_current[1] == 4:
                         # Battle Status: Team can go
 
-                        if card.value <= 50:
+                        if distance <= 50:
                             # Status of Speed Pile is irrelevant
-                            player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
+                            player_actions.add(action_team[card])
                         else:
-                            if team_status[team_current_index][0] == 0:
+                            if team_current[0] == 0:
                                 # No speed limit, ensure distance of 200 can be played
-                                if card.value < 200 or team_status[team_current_index][3] < 2:
-                                    player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
+                                if distance < 200 or team_current[3] < 2:
+                                    player_actions.add(action_team[card])
 
-            elif card.type == "Remedy":
+            elif kind == 1:
                 # Remedies can be played on own team to counter a hazard unless own team has appropriate safety already played
+                status = card_battle_status[card]
 
-                if card.value == "Roll" and team_status[team_current_index][1] == 3:
-                    player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))                    
-                elif card.value == "End of Limit":
-                    # Speed Pile
-                    if team_status[team_current_index][0] == 1:
-                        player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
+                if status == -1:
+                    # Speed Pile (End of Limit)
+                    if team_current[0] == 1:
+                        player_actions.add(action_team[card])
                 
-                # Battle Pile
-                elif card.value == 'Gasoline' and team_status[team_current_index][1] == 0:
-                    player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
-                elif card.value == 'Spare Tire' and team_status[team_current_index][1] == 1:
-                    player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
-                elif card.value == 'Repairs' and team_status[team_current_index][1] == 2:
-                    player_actions.add(action_matrix.index([team_current_index, card.type, card.value]))
+                # Battle Pile (Gasoline, Spare Tire, Repairs counter 0 - 2; Roll counters a Stop)
+                elif team_current[1] == status:
+                    player_actions.add(action_team[card])
 
             else:
                 # Card Type: Hazard - can only be played on oponents
 
                 # Can always play on oponents unless they have a safety in place (can be played on top of other hazards)
-                safety_value = safety_counter(card.value)
-                safety_index = ["Extra Tank", "Puncture-Proof", "Driving Ace", "Right-of-Way"].index(safety_value) + 4
+                safety_index = card_safety[card] + 4
 
                 for i in range(len(team_status)):
                     if i == team_current_index:
                         continue
 
                     if team_status[i][safety_index] == 0:
-                        player_actions.add(action_matrix.index([i, card.type, card.value]))
+                        player_actions.add(action_lookup['play'][i + 1][card])
 
             # Discard - all cards can be discarded
-            player_actions.add(action_matrix.index([-1, card.type, card.value]))
+            player_actions.add(action_discard[card])
 
     elif play_status == 1:
         # Coup Fourre Check (hazard played) - Evaluate possible actions
-        hazard_value = action_matrix[last_action_index][2]
-        safety_value = safety_counter(hazard_value)
+        #   The most recent action is the hazard, unless a team player before the current player declined the Coup Fourre (then it is the prior action)
+        if action_decode[last_action_index][1] == 1:
+            last_action_index = state[6]
+        safety_index = card_safety[action_decode[last_action_index][2]]
         has_safety = False
         
         for card in player_hand:
-            if card.type == "Safety" and card.value == safety_value:
+            if card_type[card] == 2 and card_safety[card] == safety_index:
                 has_safety = True
         
         if has_safety == True:
             # Player has the safety, give them the option to play it or not
-            player_actions.add(action_matrix.index([team_current_index, "Coup Fourre", safety_value]))
-            player_actions.add(action_matrix.index([team_current_index, "Coup Fourre", "Do not play"]))
+            player_actions.add(action_lookup['coup_fourre'][team_current_index][safety_index])
+            player_actions.add(action_lookup['coup_fourre'][team_current_index][4])
 
         # (else:) Player does not have safety, start the next player's turn (return an empty list)
 
     elif play_status == 2:
         # Extension Check - Current player reached 700 points, provide options to go into Extended play
-        player_actions.add(action_matrix.index([team_current_index, "Extension", "Yes"]))
-        player_actions.add(action_matrix.index([team_current_index, "Extension", "No"]))
+        player_actions.add(action_lookup['extension'][team_current_index][0])
+        player_actions.add(action_lookup['extension'][team_current_index][1])
+
+    # Convert player actions to a sorted list (Set cannot be used with certain functions like random.choice, and its order is not stable)
+    return sorted(player_actions)
+
+def actions_mask(state):
+    """
+    Return all available actions given the current game state as a mask
+    
+    state ([int]) - current game state
+    
+    Return (ndarray) - shape (97,) bool, True for each available action index
+    """
+    
+    mask = np.zeros(len(action_lookup['decode']), dtype=bool)
+    mask[actions_space(state, None, None)] = True
+    return mask
+
+def actions_packed(state):
+    """
+    Return all available actions given the current game state as a packed integer
+    
+    state ([int]) - current game state
+    
+    Return (int) - bit i is set when action index i is available
+    """
+    
+    packed = 0
+    for action in actions_space(state, None, None):
+        packed |= 1 << action
+    return packed
+
+def actions_mask_batch(states):
+    """
+    Return all available actions for a batch of game states
+    
+    states (ndarray) - shape (N, 47) game states (see Game.state)
+    
+    Return (ndarray) - shape (N, 97) bool, True for each available action (same rules as actions_space)
+    """
+    
+    # Lookup tables
+    card_type = card_arrays['type']
+    card_distance = card_arrays['distance']
+    card_battle_status = card_arrays['battle_status']
+    card_safety = card_arrays['safety']
+    safety_card = card_arrays['safety_card']
+    action_play = action_arrays['play']
+    action_coup_fourre = action_arrays['coup_fourre']
+    action_extension = action_arrays['extension']
+    action_decode = action_arrays['decode']
+    
+    states = np.asarray(states)
+    n = len(states)
+    rows = np.arange(n)
+    mask = np.zeros((n, len(action_decode)), dtype=bool)
+    
+    # Small batches (e.g. one game's transitions) - the per-state rules are faster than the fixed cost of the array operations
+    if n < 128:
+        for i, state in enumerate(states.tolist()):
+            mask[i, actions_space(state, None, None)] = True
+        return mask
+    
+    number_of_players = states[:, 0]
+    play_status = states[:, 1]
+    extension_team = states[:, 2]
+    team_current_index = states[:, 3]
+    team_status = states[:, 16:40].reshape(n, 3, 8)
+    team_exists = team_status[:, :, 0] > -1
+    team_current = team_status[rows, team_current_index]
+    player_hand = states[:, 40:47]
+    
+    # Normal game play
+    normal = (play_status == 0) | (play_status == 3)
+    max_points = np.where((number_of_players == 4) | (extension_team > -1), 1000, 700)
+    
+    for j in range(player_hand.shape[1]):
+        card = player_hand[:, j]
+        play = normal & (card > -1)
+        card = np.maximum(card, 0)
+        kind = card_type[card]
+        action_team = action_play[team_current_index + 1, card]
+    
+        # Safeties can be played on own team at any point
+        mask[rows, action_team] |= play & (kind == 2)
+    
+        # Distance (see actions_space for the rules)
+        distance = card_distance[card]
+        distance_ok = ((team_current[:, 2] + distance) <= max_points) & (team_current[:, 1] == 4)
+        distance_ok &= (distance <= 50) | ((team_current[:, 0] == 0) & ((distance < 200) | (team_current[:, 3] < 2)))
+        mask[rows, action_team] |= play & (kind == 0) & distance_ok
+    
+        # Remedies (End of Limit counters a Speed Limit, other remedies counter the battle status)
+        status = card_battle_status[card]
+        remedy_ok = np.where(status == -1, team_current[:, 0] == 1, team_current[:, 1] == status)
+        mask[rows, action_team] |= play & (kind == 1) & remedy_ok
+    
+        # Hazards can be played on any other team without the countering safety
+        safety_index = card_safety[card]
+        for t in range(3):
+            hazard_ok = play & (kind == 3) & team_exists[:, t] & (team_current_index != t)
+            hazard_ok &= team_status[rows, t, 4 + np.maximum(safety_index, 0)] == 0
+            mask[rows, action_play[t + 1, card]] |= hazard_ok
+    
+        # Discard - all cards can be discarded
+        mask[rows, action_play[0, card]] |= play
+    
+    # Coup Fourre Check - the hazard is the most recent action (or the prior action if a team player declined the Coup Fourre)
+    coup_fourre = play_status == 1
+    if coup_fourre.any():
+        i = rows[coup_fourre]
+        last_action = states[i, 5]
+        last_action = np.where(action_decode[last_action, 1] == 1, states[i, 6], last_action)
+        safety_index = card_safety[action_decode[last_action, 2]]
+        has_safety = (player_hand[i] == safety_card[safety_index][:, np.newaxis]).any(axis=1)
+        i = i[has_safety]
+        mask[i, action_coup_fourre[team_current_index[i], safety_index[has_safety]]] = True
+        mask[i, action_coup_fourre[team_current_index[i], 4]] = True
+    
+    # Extension Check
+    extension = play_status == 2
+    if extension.any():
+        i = rows[extension]
+        mask[i, action_extension[team_current_index[i], 0]] = True
+        mask[i, action_extension[team_current_index[i], 1]] = True
+    
+    return mask
+
+# Encoded state layout (see states_encode): name - (first column, number of columns)
+encoding_layout = {
+    'players': (0, 4),          # Number of players one-hot (2, 3, 4, 6)
+    'play_status': (4, 4),      # Play status one-hot (0-3, all 0 for Game Over)
+    'extension': (8, 4),        # Extension team one-hot (not in extension play, team 1-3)
+    'team': (12, 3),            # Current player team one-hot
+    'deck': (15, 1),            # Cards left in deck / 106
+    'history': (16, 11 * 97),   # Action history, one-hot action index for each of the 11 actions (all 0 for n/a)
+    'teams': (1083, 3 * 13),    # Each team: exists, speed limit, battle status one-hot (5), distance / 1000, 200's / 2, safeties (4)
+    'hand': (1122, 19)          # Number of cards of each card index in the player's hand
+}
+encoding_size = 1141
+
+def states_encode(states, out=None):
+    """
+    Return a batch of game states with the categorical fields one-hot encoded and the counts normalized (see encoding_layout)
+    
+    states (ndarray) - shape (N, 47) game states (see Game.state, e.g. a batch filled by Game.state_into)
+    out (ndarray|None) - shape (N, 1141) float32 array to write the encoded states into (None = new array)
+    
+    Return (ndarray) - shape (N, 1141) float32 (out when given)
+    """
+    
+    states = np.asarray(states)[:, :47]
+    n = len(states)
+    rows = np.arange(n)
+    
+    if out is None:
+        out = np.zeros((n, encoding_size), dtype=np.float32)
+    else:
+        out[:n] = 0
+    
+    players_column = np.array([-1, -1, 0, 1, 2, -1, 3])
+    out[rows, players_column[states[:, 0]]] = 1
+    
+    play_status = states[:, 1]
+    playing = play_status < 4
+    out[rows[playing], 4 + play_status[playing]] = 1
+    
+    out[rows, 9 + states[:, 2]] = 1
+    out[rows, 12 + states[:, 3]] = 1
+    out[:, 15] = states[:, 4] / 106
+    
+    # Action history (11 x 97)
+    r, k = np.nonzero(states[:, 5:16] > -1)
+    out[r, 16 + k * 97 + states[r, 5 + k]] = 1
+    
+    # Teams (13 columns each, a missing team is all 0)
+    for t in range(3):
+        team = states[:, 16 + 8 * t:24 + 8 * t]
+        column = 1083 + 13 * t
+        exists = team[:, 0] > -1
+        i = rows[exists]
+        out[i, column] = 1
+        out[i, column + 1] = team[exists, 0]
+        out[i, column + 2 + team[exists, 1]] = 1
+        out[i, column + 7] = team[exists, 2] / 1000
+        out[i, column + 8] = team[exists, 3] / 2
+        out[i, column + 9:column + 13] = team[exists, 4:8]
+    
+    # Hand card counts
+    r, k = np.nonzero(states[:, 40:47] > -1)
+    np.add.at(out, (r, 1122 + states[r, 40 + k]), 1)
+    
+    return out
+
+def states_into(games, out, extended=False):
+    """
+    Write the current player state of each game into the rows of a batch array (see Game.state_into)
+    
+    games ([Game]) - games, game i is written to row i
+    out (ndarray) - shape (N, 47) int16 (N, 85 extended), C-contiguous
+    extended (bool) - write the extended states (see Game.state_extended)
+    
+    Return (ndarray) - out
+    """
+    
+    for i in range(len(games)):
+        games[i].state_into(out, i, extended=extended)
+    return out
+
+def transitions_batch(games, seats, n_step=1, discount=1.0):
+    """
+    Return the transitions (experiences) of one player in each of many games, built from the games' action histories in one pass
+        reward - the player's action points + team player action points - opponent players action points until the player's next action (same as Player.reward_last_action)
+        n-step reward - discounted sum of the rewards of the next n_step actions of the player
+        next state - state at the player's n_step-th next action, for the last actions of a game the state of the player's last action (done = True)
+        Only entries where the player selected an action are included (e.g. not the 200 bonus points during extension)
+    
+    games ([Game]) - games (usually finished), a game may appear more than once (e.g. one entry per seat)
+    seats (int|[int]) - seat of the player for all games, or seat by game
+    n_step (int) - number of the player's actions summed in each reward
+    discount (float) - discount factor of the n-step rewards (1.0 keeps integer rewards)
+    
+    Return (states, actions, rewards, next_states, dones, next_masks) in game order then play order:
+        states (ndarray) - shape (T, 47) int16
+        actions (ndarray) - shape (T,) int16
+        rewards (ndarray) - shape (T,) int32 (float32 if discount is not 1.0)
+        next_states (ndarray) - shape (T, 47) int16
+        dones (ndarray) - shape (T,) bool
+        next_masks (ndarray) - shape (T, 97) bool, available actions for the next state (see actions_mask_batch)
+    """
+    
+    seats = [seats] * len(games) if isinstance(seats, int) else seats
+    histories = [g.action_history for g in games]
+    counts = np.array([len(h) for h in histories], dtype=np.int64)
+    
+    # All histories as one set of columns (entry_game = position of the entry's game in games)
+    entry_game = np.repeat(np.arange(len(games)), counts)
+    entry_seats = np.concatenate([h.seats for h in histories] + [np.zeros(0, dtype=np.int8)])
+    entry_actions = np.concatenate([h.actions for h in histories] + [np.zeros(0, dtype=np.int16)])
+    entry_rewards = np.concatenate([h.rewards for h in histories] + [np.zeros(0, dtype=np.int32)]).astype(np.int64)
+    entry_states = np.concatenate([h.states for h in histories] + [np.zeros((0, 47), dtype=np.int16)])
+    game_end = np.cumsum(counts)
+    
+    # Rewards are team relative (team index = seat % number of teams)
+    teams_count = np.array([len(g.teams) for g in games], dtype=np.int64)[entry_game]
+    player_seat = np.array(seats, dtype=np.int64)[entry_game]
+    same_team = entry_seats % teams_count == player_seat % teams_count
+    rewards_total = np.concatenate([[0], np.cumsum(np.where(same_team, entry_rewards, -entry_rewards))])
+    
+    # The player's actions, each reward runs until the player's next action (or the end of the game)
+    decisions = np.flatnonzero((entry_seats == player_seat) & (entry_actions > -1))
+    decision_game = entry_game[decisions]
+    last = np.ones(len(decisions), dtype=bool)
+    last[:-1] = decision_game[1:] != decision_game[:-1]
+    reward_end = np.where(last, game_end[decision_game], np.append(decisions[1:], 0))
+    rewards_step = rewards_total[reward_end] - rewards_total[decisions]
+    
+    # Number of the player's actions after each action in the same game
+    remaining = np.searchsorted(decision_game, decision_game, side='right') - np.arange(len(decisions)) - 1
+    
+    if n_step == 1 and discount == 1.0:
+        rewards = rewards_step.astype(np.int32)
+    else:
+        rewards = rewards_step.astype(np.float64)
+        for j in range(1, n_step):
+            later = np.flatnonzero(remaining >= j)
+            rewards[later] += discount ** j * rewards_step[later + j]
+        rewards = rewards.astype(np.int32 if discount == 1.0 else np.float32)
+    
+    states = entry_states[decisions]
+    next_states = states[np.arange(len(decisions)) + np.minimum(remaining, n_step)]
+    dones = remaining < n_step
+    
+    return states, entry_actions[decisions], rewards, next_states, dones, actions_mask_batch(next_states)
 
-    # Convert player actions to a list (Set cannot be used with certain functions like random.choice)
-    return list(player_actions)
+# --------------------
+# Actions Cache
+class ActionsCache():
+    """
+    Bounded least recently used cache of available actions (see actions_space) by actions key
+        The key packs only the parts of the state the actions depend on, the hand is sorted (multiset):
+            Normal play / Bonus turn: number of players, extension team, current team, team status (3 x 8), hand
+            Coup Fourre check: current team, hazard action (the last action, or the prior action after a declined Coup Fourre), hand
+            Extension check: current team
+    
+    Attributes:
+        capacity (int) - maximum number of keys (least recently used keys are removed first)
+        hits (int) - number of lookups found in the cache
+        misses (int) - number of lookups computed with actions_space
+    
+    Methods:
+        actions - Return the available actions for a state
+        mask - Return the available actions for a state as a mask
+        mask_batch - Return the available actions for a batch of states as masks
+        clear - remove all keys and reset the counters
+    """
+    
+    # Key structures (big-endian with the play status + 1 first, so keys of different structures never collide)
+    key_normal = struct.Struct('>b3b24h7b')
+    key_coup_fourre = struct.Struct('>bbh7b')
+    
+    def __init__ (self, capacity=65536):
+        self.capacity = capacity
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__ (self):
+        return len(self.cache)
+    
+    def key(self, state):
+        """
+        Return (int) the actions key of a state
+        """
+        
+        play_status = state[1]
+        
+        if play_status == 0 or play_status == 3:
+            return int.from_bytes(self.key_normal.pack(1, state[0], state[2], state[3], *state[16:40], *sorted(state[40:47])), 'big')
+        
+        if play_status == 1:
+            hazard = state[6] if action_lookup['decode'][state[5]][1] == 1 else state[5]
+            return int.from_bytes(self.key_coup_fourre.pack(2, state[3], hazard, *sorted(state[40:47])), 'big')
+        
+        return (play_status + 1) << 8 | state[3]
+    
+    def lookup(self, state):
+        """
+        Return ((int)) the available actions for a state (from the cache when possible)
+        """
+        
+        key = self.key(state)
+        cache = self.cache
+        actions = cache.get(key)
+        
+        if actions is None:
+            self.misses += 1
+            actions = tuple(actions_space(state, None, None))
+            cache[key] = actions
+            if len(cache) > self.capacity:
+                cache.popitem(last=False)
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+        
+        return actions
+    
+    def actions(self, state):
+        """
+        Return ([int]) the available actions for a state (same as actions_space)
+        """
+        
+        return list(self.lookup(state))
+    
+    def mask(self, state):
+        """
+        Return (ndarray) - shape (97,) bool, True for each available action index (same as actions_mask)
+        """
+        
+        mask = np.zeros(len(action_lookup['decode']), dtype=bool)
+        mask[list(self.lookup(state))] = True
+        return mask
+    
+    def mask_batch(self, states):
+        """
+        Return (ndarray) - shape (N, 97) bool, True for each available action (same as actions_mask_batch)
+        """
+        
+        states = np.asarray(states)
+        mask = np.zeros((len(states), len(action_lookup['decode'])), dtype=bool)
+        
+        # Set all available actions with one assignment
+        rows = []
+        columns = []
+        for i, state in enumerate(states.tolist()):
+            actions = self.lookup(state)
+            rows += [i] * len(actions)
+            columns += actions
+        mask[rows, columns] = True
+        
+        return mask
+    
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+# --------------------
+# Instruments
+#   Opt-in instrumentation of Game (see Game.instruments), every Instruments object is kept in instruments_registry by name
+
+instruments_registry = {}
+
+def instruments_dump(path=None):
+    """
+    Return ({str: dict}) the statistics of every registered Instruments object by name (see Instruments.stats)
+    
+    path (str|None) - JSON file to write the statistics to
+    """
+    
+    data = {name: instruments.stats() for name, instruments in instruments_registry.items()}
+    
+    if path is not None:
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=2)
+    
+    return data
+
+class Instruments():
+    """
+    Counters, phase timers and event callbacks for the games using it (set Game.instruments for all games or per game)
+        Disabled (Game.instruments = None) the engine only checks the attribute, there is no timing or counting
+    
+    Phases (nanoseconds, per call):
+        turn_setup - start_turn: turn scheduling and the draw
+        state - start_turn: Game.state
+        actions - start_turn: available actions (actions_space or the actions cache)
+        start_turn - start_turn: whole call (all players evaluated until one has actions)
+        rules - play_action: applying the action (without starting the next turn)
+    
+    Counters:
+        games, steps (play_action calls), start_turn (calls), turns (players evaluated by start_turn), states (turns with available actions), actions_total (available actions of those states)
+        coup_fourre_checks (Coup Fourre opportunities), coup_fourre_played, coup_fourre_declined, hazards_played, extension_checks, extension_yes, extension_no
+        start_turn_iterations_max (most players evaluated by one start_turn call - start_turn used to recurse once per player)
+    
+    Events (callbacks with arguments):
+        play_action - (game, action_index) after the action and the start of the next turn
+        start_turn - (game) after the next player's actions are set
+        game_over - (game) when the game ends
+    
+    Attributes:
+        name (str) - registry name
+        counters ({str: int})
+        phases ({str: [int, int]}) - number of calls and total nanoseconds by phase
+        callbacks ({str: [function]}) - callbacks by event
+        clock (function) - time function in nanoseconds
+    
+    Methods:
+        on - add an event callback
+        stats - Return the counters, phase timings and aggregate statistics
+        reset - set counters and timers to zero (callbacks are kept)
+    """
+    
+    counter_names = ['games', 'steps', 'start_turn', 'turns', 'states', 'actions_total', 'coup_fourre_checks', 'coup_fourre_played', 'coup_fourre_declined',
+                     'hazards_played', 'extension_checks', 'extension_yes', 'extension_no', 'start_turn_iterations_max']
+    phase_names = ['turn_setup', 'state', 'actions', 'start_turn', 'rules']
+    
+    def __init__ (self, name='default'):
+        self.name = name
+        self.callbacks = {'play_action': [], 'start_turn': [], 'game_over': []}
+        self.clock = time.perf_counter_ns
+        self.reset()
+        instruments_registry[name] = self
+    
+    def reset(self):
+        self.counters = {c: 0 for c in self.counter_names}
+        self.phases = {p: [0, 0] for p in self.phase_names}
+    
+    def on(self, event, callback):
+        """
+        Add a callback for an event ('play_action', 'start_turn' or 'game_over')
+        """
+        
+        self.callbacks[event].append(callback)
+    
+    def phase(self, name, nanoseconds):
+        timer = self.phases[name]
+        timer[0] += 1
+        timer[1] += nanoseconds
+    
+    def turn(self, game):
+        """
+        Count a player evaluated by start_turn (called before a pending Extension Check or Bonus Turn status is cleared)
+        """
+        
+        counters = self.counters
+        counters['turns'] += 1
+        
+        actions_count = len(game.player_actions)
+        if actions_count > 0:
+            counters['states'] += 1
+            counters['actions_total'] += actions_count
+            if game.play_status == 1:
+                counters['coup_fourre_checks'] += 1
+            elif game.play_status == 2:
+                counters['extension_checks'] += 1
+    
+    def start_turn_end(self, game, iterations, nanoseconds):
+        counters = self.counters
+        counters['start_turn'] += 1
+        counters['start_turn_iterations_max'] = max(counters['start_turn_iterations_max'], iterations)
+        self.phase('start_turn', nanoseconds)
+        
+        for callback in self.callbacks['start_turn']:
+            callback(game)
+    
+    def action_played(self, game, action_index, action_kind, action_code, played_type):
+        """
+        Count the action played (called at the end of play_action) and call the play_action and game_over callbacks
+        """
+        
+        counters = self.counters
+        counters['steps'] += 1
+        
+        if action_kind == 1:
+            counters['coup_fourre_declined' if action_code == 4 else 'coup_fourre_played'] += 1
+        elif action_kind == 2:
+            counters['extension_yes' if action_code == 0 else 'extension_no'] += 1
+        elif played_type == 3 and action_lookup['decode'][action_index][0] > -1:
+            counters['hazards_played'] += 1
+        
+        for callback in self.callbacks['play_action']:
+            callback(game, action_index)
+        
+        if game.play_status == 4:
+            counters['games'] += 1
+            for callback in self.callbacks['game_over']:
+                callback(game)
+    
+    def stats(self):
+        """
+        Return (dict) - counters, phases (calls, total_ms, mean_us) and aggregates:
+            mean_actions - mean available actions per state
+            mean_start_turn_iterations - mean players evaluated per start_turn call
+            coup_fourre_rate - Coup Fourres played per hazard played
+            coup_fourre_check_rate - Coup Fourre opportunities per hazard played
+            mean_steps - mean play_action calls per finished game
+        """
+        
+        counters = self.counters
+        
+        def ratio(a, b):
+            return a / b if b > 0 else None
+        
+        return {
+            'counters': dict(counters),
+            'phases': {p: {'calls': t[0], 'total_ms': t[1] / 1e6, 'mean_us': ratio(t[1] / 1e3, t[0])} for p, t in self.phases.items()},
+            'mean_actions': ratio(counters['actions_total'], counters['states']),
+            'mean_start_turn_iterations': ratio(counters['turns'], counters['start_turn']),
+            'coup_fourre_rate': ratio(counters['coup_fourre_played'], counters['hazards_played']),
+            'coup_fourre_check_rate': ratio(counters['coup_fourre_checks'], counters['hazards_played']),
+            'mean_steps': ratio(counters['steps'], counters['games'])
+        }
 
 # --------------------
 # Card
 class Card():
     """
     Representation of a single card in the deck
+        Game play uses the card index (card_matrix) for every card, Card objects are only used to display a card (see card_object)
     """
     
     def __init__ (self, card_type, card_value):
@@ -209,6 +887,16 @@ class Card():
         self.type = card_type
         # Value: Either the name of the card or point value
         self.value = card_value
+
+# Display objects, one shared Card per unique card (index matches card_matrix)
+card_objects = tuple(Card(c[0], c[1]) for c in card_matrix_build())
+
+def card_object(card_index):
+    """
+    Return (Card) the display object for the given card index
+    """
+    
+    return card_objects[card_index]
     
 # --------------------
 # Deck
@@ -217,8 +905,8 @@ class Deck():
     Represents the full deck of cards
     
     Attributes
-        cards ([Card]) - all cards not yet in play (i.e. face-down deck on the table)
-        cards_discard ([Card]) - cards that have been discarded
+        cards ([int]) - card index of all cards not yet in play (i.e. face-down deck on the table)
+        cards_discard ([int]) - card index of cards that have been discarded
     
     Expected Card Counts:
         106 - full deck for 4 or 6 players
@@ -235,10 +923,12 @@ class Deck():
             6 players - 70
     """
     
-    def __init__ (self, card_matrix, players_count):
+    def __init__ (self, card_matrix, players_count, rng=None, order=None):
         """
         card_matrix (int) - reference of unique cards in the deck
         players_count (int) - number of game players
+        rng (random.Random|numpy.random.Generator|None) - random number generator used to shuffle (None = the random module)
+        order ([int]|None) - card index of a deck order to use instead of a shuffle (cards are drawn from the end)
         """
         
         # All cards not yet in play (i.e. the deck, face-down on the table)
@@ -250,20 +940,22 @@ class Deck():
         # Setup the playable deck
         self.build(card_matrix, players_count)
         
-        # Shuffle the deck
-        random.shuffle(self.cards)
+        if order is not None:
+            # Use the given deck order (must be the same cards)
+            if sorted(order) != self.cards:
+                raise ValueError("Deck order does not match the cards in the deck")
+            self.cards = list(order)
+        
+        else:
+            # Shuffle the deck
+            (random if rng is None else rng).shuffle(self.cards)
     
     def build(self, card_matrix, players_count):
         # Initialize the cards in the deck (assumes the deck has been cleared)
-        num_of_cards = [10, 10, 10, 12, 4, 6, 6, 6, 6, 14, 1, 1, 1, 1]
-    
-        if players_count < 4:
-            num_of_cards.extend([2, 2, 2, 3, 4])
-        else:
-            num_of_cards.extend([3, 3, 3, 4, 5])
+        num_of_cards = deck_counts_build(players_count)
         
         for i in range(len(card_matrix)):
-            self.cards += num_of_cards[i] * [Card(card_matrix[i][0], card_matrix[i][1])]
+            self.cards += num_of_cards[i] * [i]
     
     def draw(self):
         return self.cards.pop()
@@ -280,32 +972,66 @@ class Team():
     
     General
         name (str) - team name (e.g. "Team 1")
+        index (int) - team index (0, 1, 2)
     
-    Card lists: full history of cards played
-        safety_area ([Card]) - safety cards played (including coup fourre)
-        speed_pile ([Card]) - speed limit and end-of-limit hazard cards played
-        battle_pile ([Card]) - hazards, remedies, and go cards
-        distance_pile ([Card]) - distance cards played
+    Card lists: full history of cards played (card index)
+        safety_pile ([int]) - safety cards played (including coup fourre)
+        speed_pile ([int]) - speed limit and end-of-limit hazard cards played
+        battle_pile ([int]) - hazards, remedies, and go cards
+        distance_pile ([int]) - distance cards played
     
     State: current state of the team (these are applied after all logic - e.g. Flat Tire may be last battle_pile card but with a safety the status may indicate otherwise)
-        safety_played ([str]) - card value of any safeties played (convenience function to easily identify safety cards)
+        safety_played ([int]) - safety index of any safeties played (0 = Extra Tank; 1 = Puncture-Proof; 2 = Driving Ace; 3 = Right-of-Way)
         speed_status (int) - 0 = No speed limit; 1 = Speed limit
         battle_status (int) - 0 = Out of Gas; 1 = Flat Tire; 2 = Accident; 3 = Stop; 4 = Go
         distance_points (int) - total distance traveled by the team
         distance_200 (int) - number of 200 Distance cards played (max 2 per team)
+        status ([int]) - the team's block of the game state, kept current as the values above change (see Game.state, index 16 - 23)
+            speed_status, battle_status, distance_points and distance_200 are stored in this list
+            The safety flags (index 4 - 7) are set by Game.play_action when a safety is added to safety_played
     """
     
     def __init__ (self, team_number):
         self.name = "Team {0}".format(team_number)
+        self.index = team_number - 1
         self.safety_pile = []
         self.speed_pile = []
         self.battle_pile = []
         self.distance_pile = []
         self.safety_played = []
-        self.speed_status = 0
-        self.battle_status = 3
-        self.distance_points = 0
-        self.distance_200 = 0
+        self.status = [0, 3, 0, 0, 0, 0, 0, 0]
+    
+    @property
+    def speed_status(self):
+        return self.status[0]
+    
+    @speed_status.setter
+    def speed_status(self, value):
+        self.status[0] = value
+    
+    @property
+    def battle_status(self):
+        return self.status[1]
+    
+    @battle_status.setter
+    def battle_status(self, value):
+        self.status[1] = value
+    
+    @property
+    def distance_points(self):
+        return self.status[2]
+    
+    @distance_points.setter
+    def distance_points(self, value):
+        self.status[2] = value
+    
+    @property
+    def distance_200(self):
+        return self.status[3]
+    
+    @distance_200.setter
+    def distance_200(self, value):
+        self.status[3] = value
         
 # --------------------
 # Player
@@ -316,13 +1042,21 @@ class Player():
     Attributes:
     name (str) - name of the player
     team (Team) - team the player is on (to share played cards)
-    hand ([Card]) - cards the player is holding
+    hand ([int]) - card index of the cards the player is holding
+    seat (int) - index of the player in game play order
+    history_last (int) - index of the player's last entry in the game's history_actions (-1 = no action taken yet)
+    points (int) - running total of the rewards of the player's own action history entries
+    reward_last (int|None) - running reward since the player's last action history entry (see reward_last_action) None = no action taken yet
     """
     
-    def __init__ (self, name, team):
+    def __init__ (self, name, team, seat=0):
         self.name = name
         self.team = team
         self.hand = []
+        self.seat = seat
+        self.history_last = -1
+        self.points = 0
+        self.reward_last = None
         
     
     def draw(self, deck):
@@ -333,37 +1067,223 @@ class Player():
         if len(deck.cards) > 0:
             self.hand.append(deck.draw())
     
-    def find_card(self, card_type, card_value):
+    def find_card(self, card_index):
         """
-        Return (Card) the first card matching the card type and value (returns None if no matching card - should be impossible and represents programmatic error)
+        Return (int) the first card matching the card index, removed from the hand (returns None if no matching card - should be impossible and represents programmatic error)
         """
         
-        for i in range(len(self.hand)):
-            if self.hand[i].type == card_type and self.hand[i].value == card_value:
-                return self.hand.pop(i)
+        if card_index in self.hand:
+            self.hand.remove(card_index)
+            return card_index
         
         return None
     
-    def reward_last_action(self, action_history):
+    def reward_last_action(self, action_history=None):
         """
-        Return the reward for the last action taken by the player
+        Return the reward for the last action taken by the player: the action's reward + team player rewards - opponent player rewards since that action
             If player has not yet taken an action, 0 is returned
+            The reward is kept up to date by Game.play_action (reward_last), action_history is not read (kept for existing callers)
         """
-        # Start from the end of the Action History and add/subtract rewards until first occurrance of current player
-        total_reward = 0
-        last_action_found = False
-        for act in reversed(action_history):
-            if act[0] == self:
-                total_reward += act[3]
-                last_action_found = True
-                break
-            else:
-                if act[0].team == self.team:
-                    total_reward += act[3]
-                else:
-                    total_reward -= act[3]
         
-        return total_reward if last_action_found else 0
+        return 0 if self.reward_last is None else self.reward_last
+
+# --------------------
+# Action History
+class ActionHistory():
+    """
+    History/log of all actions taken in a game, stored by column in preallocated buffers (capacity doubled when full)
+        Entries can still be read as [Player, State, Action Index, Reward] lists (index, iterate, reversed), see Game.action_history
+        Bonus entries (e.g. the 200 points for a trip without 200's during extension) have action index -1 and an empty state
+    
+    Attributes:
+        players ([Player]) - players of the game by seat
+        count (int) - number of entries
+        seats (ndarray) - shape (T,) int8 seat of the player of each entry
+        actions (ndarray) - shape (T,) int16 action index of each entry
+        rewards (ndarray) - shape (T,) int32 reward of each entry
+        states (ndarray) - shape (T, 47) int16 state of each entry (-1 for bonus entries)
+            Note: these are NumPy views of the buffers (no copy), a view taken before the history grows does not see later entries
+    
+    Methods:
+        append - add an entry
+    """
+    
+    capacity_start = 128
+    
+    # States are packed straight into the buffer (faster than NumPy item assignment from a list)
+    state_pack = struct.Struct('47h').pack_into
+    
+    def __init__ (self, players, capacity=None):
+        """
+        players ([Player]) - players of the game by seat
+        capacity (int|None) - number of entries to preallocate (None = capacity_start, enough for nearly all games)
+        """
+        
+        self.players = players
+        self.count = 0
+        self.allocate(self.capacity_start if capacity is None else capacity)
+    
+    def allocate(self, capacity):
+        """
+        Create the column buffers with room for capacity entries (existing entries are copied)
+        """
+        
+        count = self.count
+        seat_column = array.array('b', bytes(capacity))
+        action_column = array.array('h', bytes(capacity * 2))
+        reward_column = array.array('i', bytes(capacity * 4))
+        state_column = array.array('h', b'\xff' * (capacity * 94))
+        
+        if count > 0:
+            seat_column[:count] = self.seat_column[:count]
+            action_column[:count] = self.action_column[:count]
+            reward_column[:count] = self.reward_column[:count]
+            state_column[:count * 47] = self.state_column[:count * 47]
+        
+        # Buffers are replaced (never resized) so views handed out earlier stay valid
+        self.seat_column = seat_column
+        self.action_column = action_column
+        self.reward_column = reward_column
+        self.state_column = state_column
+        self.capacity = capacity
+    
+    @property
+    def seats(self):
+        return np.frombuffer(self.seat_column, dtype=np.int8, count=self.count)
+    
+    @property
+    def actions(self):
+        return np.frombuffer(self.action_column, dtype=np.int16, count=self.count)
+    
+    @property
+    def rewards(self):
+        return np.frombuffer(self.reward_column, dtype=np.int32, count=self.count)
+    
+    @property
+    def states(self):
+        return np.frombuffer(self.state_column, dtype=np.int16, count=self.count * 47).reshape(self.count, 47)
+    
+    def append(self, seat, state, action_index, reward):
+        """
+        Add an entry (state is an empty list for bonus entries)
+        """
+        
+        i = self.count
+        if i == self.capacity:
+            self.allocate(self.capacity * 2)
+        
+        self.seat_column[i] = seat
+        self.action_column[i] = action_index
+        self.reward_column[i] = reward
+        if len(state) > 0:
+            self.state_pack(self.state_column, i * 94, *state)
+        self.count = i + 1
+    
+    def __len__ (self):
+        return self.count
+    
+    def __getitem__ (self, i):
+        """
+        Return ([Player, [int], int, int]) the entry as a list (Player, State, Action Index, Reward)
+        """
+        
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError("action history index out of range")
+        
+        action_index = self.action_column[i]
+        state = self.state_column[i * 47:i * 47 + 47].tolist() if action_index > -1 else []
+        return [self.players[self.seat_column[i]], state, action_index, self.reward_column[i]]
+    
+    def __iter__ (self):
+        for i in range(self.count):
+            yield self[i]
+    
+    def __reversed__ (self):
+        for i in range(self.count - 1, -1, -1):
+            yield self[i]
+    
+# --------------------
+# Turn Scheduler
+class TurnScheduler():
+    """
+    Determines the seat of the next player based on the play status (turn order only, no game rules)
+    
+    Attributes:
+        seat_teams ([int]) - team index by seat
+        hands ([[int]]) - hand of each player by seat (the players' hand lists, only the number of cards is used)
+        seat (int) - seat index of the current player
+    
+    Methods:
+        advance - moves to the next player's seat
+        next_seat_with_cards - Return the next seat with cards remaining in the player's hand
+    """
+    
+    def __init__ (self, seat_teams, hands):
+        self.seat_teams = seat_teams
+        self.hands = hands
+        self.players_count = len(seat_teams)
+        
+        # The first turn advances to the first seat
+        self.seat = self.players_count - 1
+    
+    def next_seat_with_cards(self, seat):
+        """
+        Return (int) the first seat, starting from the given seat, with cards remaining in the player's hand (-1 if no player has cards)
+        """
+        
+        for i in range(self.players_count):
+            if len(self.hands[seat]) > 0:
+                return seat
+            seat = seat + 1 if seat < self.players_count - 1 else 0
+        
+        return -1
+    
+    def advance(self, play_status, deck_count, coup_fourre_team, coup_fourre_seat):
+        """
+        Move to the seat of the next player
+        
+        play_status (int) - see Game.play_status
+        deck_count (int) - number of cards left in the deck
+        coup_fourre_team (int) - Coup Fourre Check: team index the hazard was played against
+        coup_fourre_seat (int) - Coup Fourre Check: seat index of the player who played the hazard
+        
+        Return (int) - how the turn starts:
+            0 = no card drawn (Coup Fourre Check of a team player; Extension Check - current player does not change)
+            1 = player draws a card (Normal; Safety Bonus Turn)
+            2 = Coup Fourre Check ended at the player who played the hazard, the next player with cards draws a card (return to normal play)
+        """
+        
+        seat = self.seat
+        next_seat = seat + 1 if seat < self.players_count - 1 else 0
+        
+        if play_status == 0:
+            # Normal game play - advance to next player (the player draws if there are cards left in the deck, otherwise next player with cards remaining in their hand)
+            self.seat = next_seat if deck_count > 0 else self.next_seat_with_cards(next_seat)
+            return 1
+        
+        elif play_status == 1:
+            # Coup Fourre Check - next player on the team, unless the player that played the hazard is reached first
+            seat = next_seat
+            while self.seat_teams[seat] != coup_fourre_team and seat != coup_fourre_seat:
+                seat = seat + 1 if seat < self.players_count - 1 else 0
+            
+            if seat != coup_fourre_seat:
+                self.seat = seat
+                return 0
+            
+            # Play returns to next player with cards in their hand
+            self.seat = self.next_seat_with_cards(seat + 1 if seat < self.players_count - 1 else 0)
+            return 2
+        
+        elif play_status == 3:
+            # Extra turn - current player unless they do not have any cards (then next player with cards)
+            self.seat = self.next_seat_with_cards(seat)
+            return 1
+        
+        # Extension Check - current player does not change
+        return 0
     
 # --------------------
 # Game
@@ -402,27 +1322,47 @@ class Game():
         Coup Fourre Check Handling - used when a hazard is played against a team, to check if the team wishes to call coup fourre (if possible)
             coup_fourre_player (Player|None) - player who played the hazard card (started the coup fourre check)
             coup_fourre_team (Team|None) - team who had the hazard played against (these players are checked for coup fourre status)
-            coup_fourre_hazard (str) - card value of the hazard played against the team (e.g. "Out of Gas", "Stop", "Speed Limit", etc.)
+            coup_fourre_hazard (int|None) - card index of the hazard played against the team (e.g. "Out of Gas", "Stop", "Speed Limit", etc.)
         
         deck (Deck) - deck of cards
-            deck.cards ([Card]) - cards not yet drawn ("face-down on table")
-            deck.cards_discard ([Card]) - cards discarded by players ("face-up, out-of-play")
+            deck.cards ([int]) - card index of cards not yet drawn ("face-down on table")
+            deck.cards_discard ([int]) - card index of cards discarded by players ("face-up, out-of-play")
+        
+        deck_order ((int)) - card index of the shuffled deck before the deal (cards are drawn from the end), the same deck_order and actions replay the game exactly
         
-        player_actions ([int]) - index list of actions the current player can take
+        player_actions ([int]) - index list of actions the current player can take (ascending)
         
         player_state ([int]) - list of current state of game for the current player
         
-        action_history ([[Player, [int], int, int]]) - history/log of all actions taken in the game in order they were played, each list element contains:
+        action_history (ActionHistory) - history/log of all actions taken in the game in order they were played, each entry (read as a list) contains:
             Player - the Player who took the action
             State - the state of the game when the player selected the action
             Action Index - the index of the actions class variable that was taken
             Reward - point value reward from the action (Distance card, Safety, Coup Fourre, playing all 4 safeties, etc.)
+            The columns are also available as NumPy arrays: action_history.seats, .states, .actions, .rewards
+        
+        history_actions ([int]) - action index of each action_history entry (used to build the state without walking the action history)
+            Note: a Game created by clone or restore starts its action_history and history_actions from that point (history_actions keeps the last 11 actions)
+        
+        team_points ([int]) - running total of the action history rewards by team
+        
+        cards_public ([int]) - number of cards of each card index publicly out of play (discard pile and team piles), counted as cards are played
+        
+        team_scores ([[int]]) - running total of the action history rewards by team and score category (see score_categories):
+            distance, safety, coup_fourre, all_safeties, trip_completed, extension, shut_out, delayed_action, safe_trip
+            team_scores, team_points, Player.points and Player.reward_last are kept by clone and restore (see snapshot)
         
         extension_team (Team|None) - (2, 3, or 6 players) None = extended play has not been called; Team = the team who reached 700 and called for Extension
+        
+        actions_cache (ActionsCache|None) - cache used for the player actions (class variable, can be set for all games or per game) None = no cache
+        
+        instruments (Instruments|None) - counters, timers and event callbacks (class variable, can be set for all games or per game) None = disabled
     
     Methods:
         __init__ - creates a new Game object, initalizes all variables, deals 6 cards to each player, starts first player (calls start_turn)
             player_names ([str]) - list of strings, names of the players (in game play and team selection order)
+            seed (int|random.Random|numpy.random.Generator|None) - seed or random number generator for the deck shuffle (None = the random module)
+            deck_order ([int]|None) - deck order to play instead of a shuffle (e.g. deck_order of another game to replay it)
         
         start_turn - sets current player based on play status, draws a card (if applicable), determines allowed actions for the current player
                         Note: this method is called internally, there should not be a need during normal game play to call this method explicitly
@@ -432,16 +1372,52 @@ class Game():
             
         final_team_points - Return a list of final points by team in team order
             Return ([int])
+        
+        score_breakdown - Return the points of each team by score category
+            Return ([{str: int}])
             
         state - Return the state for the current player
+            player (Player|None) - the state as seen by another player (None = current player)
             Return ([int])
+        
+        state_extended - Return the state with card counting features (state + public and unseen counts by card index)
+            player (Player|None) - the state as seen by another player (None = current player)
+            Return ([int]) - 85 integers
+        
+        state_into - Write the state into a NumPy int16 array (a single state or a row of a batch, see states_into and states_encode)
+            out (ndarray) - shape (47,) or (N, 47) int16
+            row (int) - row of a batch array
+            player (Player|None) - the state as seen by another player (None = current player)
+            extended (bool) - write the extended state (85 integers)
+            Return (ndarray) - out
+        
+        player_actions_mask - Return the player actions as a mask
+            Return (ndarray) shape (97,) bool
+        
+        transitions - Return the transitions (experiences) of a player from the action history (see transitions_batch)
+            seat (int) - seat of the player
+            Return (states, actions, rewards, next_states, dones, next_masks)
+        
+        clone - Return a copy of the game that can be played independently (e.g. tree search, rollouts)
+            Return (Game)
+        
+        snapshot - Return the game position in a compact fixed-size form
+            Return ((int))
+        
+        restore - Return the game to a position from snapshot (same players)
+            snapshot ((int))
     """
     
     # Class variables
     card_matrix = card_matrix_build()
     action_matrix = action_matrix_build(card_matrix)
+    actions_cache = None
+    instruments = None
+    
+    # Snapshot layout: maximum number of cards of each card list (each list is stored as its length followed by the padded card indices)
+    snapshot_capacity = {'deck': 106, 'discard': 106, 'hand': 7, 'safety_pile': 4, 'speed_pile': 16, 'battle_pile': 64, 'distance_pile': 48}
     
-    def __init__ (self, player_names):
+    def __init__ (self, player_names, seed=None, deck_order=None):
         players_count = len(player_names)
         
         # Setup the players
@@ -450,17 +1426,20 @@ class Game():
             self.players = []
             for i in range(players_count):
                 self.teams.append(Team(i + 1))
-                self.players.append(Player(player_names[i], self.teams[i]))
+                self.players.append(Player(player_names[i], self.teams[i], i))
                 self.teams[i].name = f"Team {i + 1} ({player_names[i]})"
         else:
             teams_count = players_count // 2
             self.teams = [Team(i + 1) for i in range(teams_count)]
-            self.players = [Player(player_names[i], self.teams[i % teams_count]) for i in range(players_count)]
+            self.players = [Player(player_names[i], self.teams[i % teams_count], i) for i in range(players_count)]
             for i in range(teams_count):
                 self.teams[i].name = "Team {0} ({1})".format(i + 1, ', '.join(player_names[i::teams_count]))
         
-        # Setup the playing deck
-        self.deck = Deck(self.card_matrix, players_count)
+        # Setup the playing deck (seeded games have their own random number generator)
+        rng = random.Random(seed) if isinstance(seed, int) else seed
+        self.deck = Deck(self.card_matrix, players_count, rng, deck_order)
+        self.deck_order = tuple(self.deck.cards)
+        self.cards_public = [0] * len(self.card_matrix)
         
         # Deal 6 cards to each player (1 card at a time to each player)
         for i in range(6):
@@ -468,6 +1447,7 @@ class Game():
                 p.draw(self.deck)
         
         # Initalize current player
+        self.scheduler = TurnScheduler([p.team.index for p in self.players], [p.hand for p in self.players])
         self.player_current = self.players[-1]
         self.play_status = 0
         
@@ -479,7 +1459,10 @@ class Game():
         # Initalize player actions (int list corresponding to the index for the actions class variable)
         self.player_actions = []
         self.player_state = []
-        self.action_history = []
+        self.action_history = ActionHistory(self.players)
+        self.history_actions = []
+        self.team_points = [0] * len(self.teams)
+        self.team_scores = [[0] * len(score_categories) for t in self.teams]
         
         # Extension variables
         self.extension_check = False
@@ -499,104 +1482,101 @@ class Game():
             3 Safety Bonus Turn - current player played a safety and gets a bonus turn
         """
         
-        # Setup current player
-        if self.play_status == 0:
-            # Normal game play - advance to next player
+        scheduler = self.scheduler
+        instruments = self.instruments
+        if instruments is not None:
+            clock = instruments.clock
+            start_turn_start = clock()
+            iterations = 0
+        
+        while True:
+            if instruments is not None:
+                iterations += 1
+                phase_start = clock()
             
-            if len(self.deck.cards) > 0:
-                player_current_index = self.players.index(self.player_current)
-                player_next_index = player_current_index + 1 if player_current_index < len(self.players) - 1 else 0
-                self.player_current = self.players[player_next_index]
+            # Setup current player
+            if self.play_status == 1:
+                turn = scheduler.advance(1, len(self.deck.cards), self.coup_fourre_team.index, self.coup_fourre_player.seat)
+            else:
+                turn = scheduler.advance(self.play_status, len(self.deck.cards), -1, -1)
+            
+            if turn == 2:
+                # Coup Fourre Check reached the player that played the hazard - turn off the coup fourre check variables (return to normal play)
+                self.play_status = 0
+                self.coup_fourre_player = None
+                self.coup_fourre_team = None
+                self.coup_fourre_hazard = None
+            
+            self.player_current = self.players[scheduler.seat]
+            
+            if turn > 0:
+                # Draw to start the turn (if there are cards left in the deck)
                 self.player_current.draw(self.deck)
             
+            if instruments is not None:
+                phase_end = clock()
+                instruments.phase('turn_setup', phase_end - phase_start)
+                phase_start = phase_end
+            
+            # State-Action space: populate current game state and possible actions
+            self.player_state = self.state()
+            
+            if instruments is not None:
+                phase_end = clock()
+                instruments.phase('state', phase_end - phase_start)
+                phase_start = phase_end
+            
+            if self.actions_cache is None:
+                self.player_actions = actions_space(self.player_state, self.card_matrix, self.action_matrix)
             else:
-                # No cards left in the deck, advance to the next player with cards remaining in their hand
-                player_index = self.players.index(self.player_current)
-                player_next_index = -1
-                
-                while player_next_index == -1:
-                    player_index = player_index + 1 if player_index < len(self.players) - 1 else 0
-                    if len(self.players[player_index].hand) > 0:
-                        player_next_index = player_index
-                
-                self.player_current = self.players[player_next_index]
+                self.player_actions = self.actions_cache.actions(self.player_state)
             
-        elif self.play_status == 1:
-            # Coup Fourre Check - Hazard has been played
-            player_index = self.players.index(self.player_current)
-            player_next_index = -1
-
-            while player_next_index == -1:
-                player_index = player_index + 1 if player_index < len(self.players) - 1 else 0
-
-                if self.players[player_index].team == self.coup_fourre_team:
-                    # Found next player on the team
-                    player_next_index = player_index
-                    self.player_current = self.players[player_next_index]
-                    
-                    # Evaluating action will determine if this player has the safety (this will take care of instance where person has no cards as well)
-                    
-                elif self.players[player_index] == self.coup_fourre_player:
-                    # This is the player that played the hazard to begin with
-                    
-                    # Turn off the coup fourre check variables to exit the coup fourre check (return to normal play)
-                    self.play_status = 0
-                    self.coup_fourre_player = None
-                    self.coup_fourre_team = None
-                    self.coup_fourre_hazard = None
-                    
-                    # Play returns to next player with cards in their hand
-                    while player_next_index == -1:
-                        player_index = player_index + 1 if player_index < len(self.players) - 1 else 0
-                        if len(self.players[player_index].hand) > 0:
-                            player_next_index = player_index
-                    
-                    self.player_current = self.players[player_next_index]
-                    
-                    # Draw to start new turn (normal play)
-                    self.player_current.draw(self.deck)
+            if instruments is not None:
+                instruments.phase('actions', clock() - phase_start)
+                instruments.turn(self)
             
-        elif self.play_status == 3:
-            # Extra turn - set to current player unless they do not have any cards (then next player with cards)
-            player_index = self.players.index(self.player_current)
-            player_next_index = -1
-                
-            while player_next_index == -1:
-                if len(self.players[player_index].hand) > 0:
-                    player_next_index = player_index
-                else:
-                    player_index = player_index + 1 if player_index < len(self.players) - 1 else 0
-                
-            self.player_current = self.players[player_next_index]
-            self.player_current.draw(self.deck)
+            # If the game state was a 2 (Extension check) or 3 (extra turn), set game play status to 0 (normal) as the next action will resolve these
+            if self.play_status == 2 or self.play_status == 3:
+                self.play_status = 0
             
-        # Note: Extension Check and Safety Bonus Turn - current player does not change
-        
-        # State-Action space: populate current game state and possible actions
-        self.player_state = self.state()
-        self.player_actions = actions_space(self.player_state, self.card_matrix, self.action_matrix)
-        
-        # If the game state was a 2 (Extension check) or 3 (extra turn), set game play status to 0 (normal) as the next action will resolve these
-        if self.play_status == 2 or self.play_status == 3:
-            self.play_status = 0
+            if len(self.player_actions) > 0:
+                break
             
-        if len(self.player_actions) == 0:
             # No actions possible for current player, start next player's turn
-            self.start_turn()
+        
+        if instruments is not None:
+            instruments.start_turn_end(self, iterations, clock() - start_turn_start)
     
     def play_action(self, action_index):
         """
         Plays selected action and ends the player's turn
         """
         
-        # Retrieve information about the action to take
-        action = self.action_matrix[action_index]
-        if action[1] == "Coup Fourre":
-            played_card = None if action[2] == "Do not play" else self.player_current.find_card("Safety", action[2])
-        elif action[1] == "Extension":
+        # Retrieve information about the action to take: (Team index | -1 (Discard), Action kind, Code)
+        #   Action kind: 0 = Play a card (Code = card index); 1 = Coup Fourre (Code = safety index | 4 (Do not play)); 2 = Extension (Code = 0 (Yes) | 1 (No))
+        action_team, action_kind, action_code = action_lookup['decode'][action_index]
+        instruments = self.instruments
+        if instruments is not None:
+            rules_start = instruments.clock()
+        card_type = card_lookup['type']
+        card_safety = card_lookup['safety']
+        team_current = self.player_current.team
+        team_scores = self.team_scores[team_current.index]
+        
+        if action_kind == 1:
+            played_card = None if action_code == 4 else self.player_current.find_card(card_lookup['safety_card'][action_code])
+        elif action_kind == 2:
             played_card = None
         else:
-            played_card = self.player_current.find_card(action[1], action[2])
+            played_card = self.player_current.find_card(action_code)
+        
+        # Type of the card played (0 = Distance; 1 = Remedy; 2 = Safety (including Coup Fourre); 3 = Hazard; -1 = n/a)
+        #   A played card stays public (discard pile or team piles) for the rest of the game
+        if played_card is None:
+            played_type = -1
+        else:
+            played_type = card_type[played_card]
+            self.cards_public[played_card] += 1
             
         # Action history
         #  Initalize reward to 0
@@ -605,26 +1585,28 @@ class Game():
         #    Reference to current play is not altered and represents the true current player
         action_history_add = [[self.player_current, self.player_state, action_index, 0]]
         
-        if action[0] == -1:
+        if action_team == -1:
             # Discard the selected card
             self.deck.cards_discard.append(played_card)
             
-        elif action[1] == "Distance":
+        elif played_type == 0:
             # Add card to team's Distance Pile
-            self.player_current.team.distance_pile.append(played_card)
+            team_current.distance_pile.append(played_card)
             
             # Increment team's distance points
-            self.player_current.team.distance_points += action[2]
+            distance = card_lookup['distance'][played_card]
+            team_current.distance_points += distance
             
             # If 200, increment team's 200 card counter
-            if action[2] == 200:
-                self.player_current.team.distance_200 += 1
+            if distance == 200:
+                team_current.distance_200 += 1
             
             # Increment action reward for point value
-            action_history_add[0][3] += action[2]
+            action_history_add[0][3] += distance
+            team_scores[score_index['distance']] += distance
             
             # Check End of Game and Extension
-            team_points = self.player_current.team.distance_points
+            team_points = team_current.distance_points
             
             if len(self.players) != 4:
                 # Extension play possible
@@ -637,34 +1619,40 @@ class Game():
                     
                     # Add reward points for: trip completed (400)
                     action_history_add[0][3] += 400
+                    team_scores[score_index['trip_completed']] += 400
                     
                     # Add reward points for extension
                     action_history_add[0][3] += 200
+                    team_scores[score_index['extension']] += 200
                     
                     # If player's team is not the team that called the extension, give 200 points to other team (if applicable) as well
-                    if self.extension_team != self.player_current.team:
+                    if self.extension_team != team_current:
                         for t in self.teams:
-                            if t != self.player_current.team and t != self.extension_team:
+                            if t != team_current and t != self.extension_team:
                                 player_representative = [p for p in self.players if p.team == t][0]
                                 action_history_add.append([player_representative, [], -1, 200])
+                                self.team_scores[t.index][score_index['extension']] += 200
                     
                     # Add reward points if Shut-out (500)
                     shut_out_achieved = True
                     for t in self.teams:
-                        if t != self.player_current.team and t.distance_points > 0:
+                        if t != team_current and t.distance_points > 0:
                             shut_out_achieved = False
                             break
                     
                     if shut_out_achieved == True:
                         action_history_add[0][3] += 500
+                        team_scores[score_index['shut_out']] += 500
                     
                     # Add reward points if delayed action (300)
                     if len(self.deck.cards) == 0:
                         action_history_add[0][3] += 300
+                        team_scores[score_index['delayed_action']] += 300
                     
                     # Add reward points if safe trip (no 200's) (300)
-                    if self.player_current.team.distance_200 == 0:
+                    if team_current.distance_200 == 0:
                         action_history_add[0][3] += 300
+                        team_scores[score_index['safe_trip']] += 300
                     
                     # Set the Game Over variable
                     self.play_status = 4
@@ -674,53 +1662,60 @@ class Game():
                 
                 # Add reward points for: trip completed (400)
                 action_history_add[0][3] += 400
+                team_scores[score_index['trip_completed']] += 400
 
                 # Add reward points if Shut-out (500)
                 shut_out_achieved = True
                 for t in self.teams:
-                    if t != self.player_current.team and t.distance_points > 0:
+                    if t != team_current and t.distance_points > 0:
                         shut_out_achieved = False
                         break
 
                 if shut_out_achieved == True:
                     action_history_add[0][3] += 500
+                    team_scores[score_index['shut_out']] += 500
 
                 # Add reward points if delayed action (300)
                 if len(self.deck.cards) == 0:
                     action_history_add[0][3] += 300
+                    team_scores[score_index['delayed_action']] += 300
 
                 # Add reward points if safe trip (no 200's) (300)
-                if self.player_current.team.distance_200 == 0:
+                if team_current.distance_200 == 0:
                     action_history_add[0][3] += 300
+                    team_scores[score_index['safe_trip']] += 300
 
                 # Set the Game Over variable
                 self.play_status = 4
         
-        elif action[1] == "Remedy":
-            # Remedy type: Speed or Battle
-            if action[2] == "End of Limit":
+        elif played_type == 1:
+            # Remedy type: Speed or Battle (battle status the remedy counters, -1 = End of Limit)
+            remedy_status = card_lookup['battle_status'][played_card]
+            
+            if remedy_status == -1:
                 # Add card to team's Speed Pile
-                self.player_current.team.speed_pile.append(played_card)
+                team_current.speed_pile.append(played_card)
                 
                 # Update team's Speed status
-                self.player_current.team.speed_status = 0
+                team_current.speed_status = 0
             
             else:
                 # Add card to team's Battle Pile
-                self.player_current.team.battle_pile.append(played_card)
+                team_current.battle_pile.append(played_card)
                 
-                # Update team's Battle status
-                if action[2] == "Roll" or 'Right-of-Way' in self.player_current.team.safety_played:
-                    self.player_current.team.battle_status = 4
+                # Update team's Battle status (Roll counters a Stop, 3 = Right-of-Way safety index)
+                if remedy_status == 3 or 3 in team_current.safety_played:
+                    team_current.battle_status = 4
                 else:
-                    self.player_current.team.battle_status = 3
+                    team_current.battle_status = 3
         
-        elif action[1] == "Hazard":
+        elif played_type == 3:
             # Team receiving hazard
-            team_hazard = self.teams[action[0]]
+            team_hazard = self.teams[action_team]
+            hazard_status = card_lookup['battle_status'][played_card]
             
-            if action[2] == "Speed Limit":
-                # Add card to team's Speed Pile
+            if hazard_status == -1:
+                # Speed Limit - add card to team's Speed Pile
                 team_hazard.speed_pile.append(played_card)
                 
                 # Update team's Speed status
@@ -731,74 +1726,78 @@ class Game():
                 team_hazard.battle_pile.append(played_card)
                 
                 # Update team's Battle status
-                team_hazard.battle_status = ["Out of Gas", "Flat Tire", "Accident", "Stop"].index(action[2])
+                team_hazard.battle_status = hazard_status
             
             # Coup Fourre check - setup variable to begin the process of checking for coup fourre
             self.play_status = 1
             self.coup_fourre_player = self.player_current
             self.coup_fourre_team = team_hazard
-            self.coup_fourre_hazard = action[2]
+            self.coup_fourre_hazard = played_card
         
-        elif action[1] == "Safety" or action[1] == "Coup Fourre":
+        elif action_kind == 1 or played_type == 2:
             # Safety played (Coup Fourre logic is similar, using same code block to reduce redundant code)
             
-            if action[2] != "Do not play":
+            if played_card is not None:
                 # A Safety or Coup Fourre has been played
+                safety_index = card_safety[played_card]
             
                 # Add card to team's safety pile
-                self.player_current.team.safety_pile.append(played_card)
+                team_current.safety_pile.append(played_card)
                 
-                # Add the card's value to the team's safety played
-                self.player_current.team.safety_played.append(action[2])
+                # Add the safety index to the team's safety played (and the team's state)
+                team_current.safety_played.append(safety_index)
+                team_current.status[4 + safety_index] = 1
                 
                 # Add reward points for safety played (100)
                 action_history_add[0][3] += 100
+                team_scores[score_index['safety']] += 100
                 
                 # Add reward points if all 4 safeties played by this team (300)
-                if len(self.player_current.team.safety_played) == 4:
+                if len(team_current.safety_played) == 4:
                     action_history_add[0][3] += 300
+                    team_scores[score_index['all_safeties']] += 300
                 
-                # Process the Speed Pile/Status (only for "Right-of-Way")
-                if action[2] == "Right-of-Way" and self.player_current.team.speed_status == 1:
+                # Process the Speed Pile/Status (only for "Right-of-Way" - safety index 3)
+                if safety_index == 3 and team_current.speed_status == 1:
                     # Top card of speed pile is a Speed Limit, it is possible, however, there are multiple Speed Limit card's stacked
-                    while len(self.player_current.team.speed_pile) > 0 and self.player_current.team.speed_pile[-1].value == "Speed Limit":
-                        self.deck.cards_discard.append(self.player_current.team.speed_pile.pop())
+                    while len(team_current.speed_pile) > 0 and card_type[team_current.speed_pile[-1]] == 3:
+                        self.deck.cards_discard.append(team_current.speed_pile.pop())
 
                     # Team should no longer have a Speed Limit applied
-                    self.player_current.team.speed_status = 0
+                    team_current.speed_status = 0
 
                 # Process the Battle Pile/Status
                 battle_pile_process = True
 
                 while battle_pile_process:
                     # Are there cards left?
-                    if len(self.player_current.team.battle_pile) > 0:
-                        top_card = self.player_current.team.battle_pile[-1]
+                    if len(team_current.battle_pile) > 0:
+                        top_card = team_current.battle_pile[-1]
                         
                         # Is the top card a Remedy?
-                        if top_card.type == "Remedy":
+                        if card_type[top_card] == 1:
                             # Team can "Go" (whatever last issue was, it was fixed)
-                            self.player_current.team.battle_status = 4
+                            team_current.battle_status = 4
                             battle_pile_process = False
                         else:
                             # Top Card is a Hazard, Does the team have the corresponding Safety
-                            safety_value = safety_counter(top_card.value)
-                            if safety_value in self.player_current.team.safety_played:
+                            if card_safety[top_card] in team_current.safety_played:
                                 # Remove the card and keep processing
-                                self.deck.cards_discard.append(self.player_current.team.battle_pile.pop())
+                                self.deck.cards_discard.append(team_current.battle_pile.pop())
                             else:
                                 # Team does not have a Safety, the hazard applies
-                                self.player_current.team.battle_status = ["Out of Gas", "Flat Tire", "Accident", "Stop"].index(top_card.value)
+                                team_current.battle_status = card_lookup['battle_status'][top_card]
                                 battle_pile_process = False
                     else:
                         # No more cards left to process, team can "Go"
-                        self.player_current.team.battle_status = 4
+                        team_current.battle_status = 4
                         battle_pile_process = False
                 
                 # Was the Safety played as a Coup Fourre?
-                if action[1] == "Coup Fourre":
+                if action_kind == 1:
                     # Add reward points for Coup Fourre
                     action_history_add[0][3] += 300
+                    team_scores[score_index['coup_fourre']] += 300
                     
                     # Player now has one less card, immediately draw a card
                     self.player_current.draw(self.deck)
@@ -811,68 +1810,292 @@ class Game():
                 # Player get's a bonus turn
                 self.play_status = 3
         
-        elif action[1] == "Extension":
+        elif action_kind == 2:
             # Player has responded to Extension option
             
-            if action[2] == "Yes":
+            if action_code == 0:
                 # Extension mode should be enabled
-                self.extension_team = self.player_current.team
+                self.extension_team = team_current
             
             else:
                 # End Game: Player does not want to enter extension, end of game has been reached
                 
                 # Add reward points for: trip completed (400)
                 action_history_add[0][3] += 400
+                team_scores[score_index['trip_completed']] += 400
 
                 # Add reward points if Shut-out (500)
                 shut_out_achieved = True
                 for t in self.teams:
-                    if t != self.player_current.team and t.distance_points > 0:
+                    if t != team_current and t.distance_points > 0:
                         shut_out_achieved = False
                         break
 
                 if shut_out_achieved == True:
                     action_history_add[0][3] += 500
+                    team_scores[score_index['shut_out']] += 500
 
                 # Add reward points if delayed action (300)
                 if len(self.deck.cards) == 0:
                     action_history_add[0][3] += 300
+                    team_scores[score_index['delayed_action']] += 300
 
                 # Add reward points if safe trip (no 200's) (300)
-                if self.player_current.team.distance_200 == 0:
+                if team_current.distance_200 == 0:
                     action_history_add[0][3] += 300
+                    team_scores[score_index['safe_trip']] += 300
 
                 # Set the Game Over variable
                 self.play_status = 4
         
-        # Store action history
-        self.action_history.extend(action_history_add)
+        # Store action history and the running scores
+        for act in action_history_add:
+            player = act[0]
+            reward = act[3]
+            player.history_last = len(self.history_actions)
+            self.action_history.append(player.seat, act[1], act[2], reward)
+            self.history_actions.append(act[2])
+            self.team_points[player.team.index] += reward
+            player.points += reward
+            
+            # Reward since each player's last action (team relative, see Player.reward_last_action)
+            if reward != 0:
+                for p in self.players:
+                    if p.reward_last is not None:
+                        p.reward_last += reward if p.team is player.team else -reward
+            player.reward_last = reward
+        
+        if instruments is not None:
+            instruments.phase('rules', instruments.clock() - rules_start)
         
         # Move to next player (or End Game)
         if self.play_status < 4:
             # Ensure there are either cards left in the deck or at least one player has a card left in their hand
-            if len(self.deck.cards) > 0 or sum([len(p.hand) for p in self.players]) > 0:
+            if len(self.deck.cards) > 0 or any(self.scheduler.hands):
                 self.start_turn()
             else:
                 # Game Over (no more plays possible)
                 self.play_status = 4
+        
+        if instruments is not None:
+            instruments.action_played(self, action_index, action_kind, action_code, played_type)
+    
+    def player_actions_mask(self):
+        """
+        Return (ndarray) shape (97,) bool - True for each action index the current player can take (see player_actions)
+        """
+        
+        mask = np.zeros(len(self.action_matrix), dtype=bool)
+        mask[self.player_actions] = True
+        return mask
+    
+    def transitions(self, seat, n_step=1, discount=1.0):
+        """
+        Return (states, actions, rewards, next_states, dones, next_masks) the transitions of the player at the seat as NumPy arrays (see transitions_batch)
+            Note: a Game created by clone or restore only has the transitions played after that point
+        """
+        
+        return transitions_batch([self], seat, n_step, discount)
     
     def final_team_points(self):
         """
         Return a list of final points by team
         """
         
-        team_points = [0 for i in range(len(self.teams))]
+        return list(self.team_points)
+    
+    def score_breakdown(self):
+        """
+        Return ([{str: int}]) the points of each team by score category (see score_categories)
+        """
+        
+        return [dict(zip(score_categories, scores)) for scores in self.team_scores]
+    
+    def clone(self):
+        """
+        Return (Game) a copy of the game at the current position
+            The copy shares no lists with this game, its action history starts at the current position (see history_actions)
+        """
+        
+        game = Game.__new__(Game)
+        
+        game.teams = []
+        for t in self.teams:
+            team = Team.__new__(Team)
+            team.name = t.name
+            team.index = t.index
+            team.safety_pile = t.safety_pile[:]
+            team.speed_pile = t.speed_pile[:]
+            team.battle_pile = t.battle_pile[:]
+            team.distance_pile = t.distance_pile[:]
+            team.safety_played = t.safety_played[:]
+            team.status = t.status[:]
+            game.teams.append(team)
+        
+        history_count = len(self.history_actions)
+        game.history_actions = self.history_actions[-11:]
+        game.players = []
+        for p in self.players:
+            player = Player(p.name, game.teams[p.team.index], p.seat)
+            player.hand = p.hand[:]
+            player.history_last = max(p.history_last - history_count + len(game.history_actions), -1)
+            player.points = p.points
+            player.reward_last = p.reward_last
+            game.players.append(player)
+        
+        game.deck_order = self.deck_order
+        game.deck = Deck.__new__(Deck)
+        game.deck.cards = self.deck.cards[:]
+        game.deck.cards_discard = self.deck.cards_discard[:]
+        game.cards_public = self.cards_public[:]
+        
+        game.scheduler = TurnScheduler(self.scheduler.seat_teams, [p.hand for p in game.players])
+        game.scheduler.seat = self.scheduler.seat
+        game.player_current = game.players[self.scheduler.seat]
+        game.play_status = self.play_status
+        
+        game.coup_fourre_player = None if self.coup_fourre_player is None else game.players[self.coup_fourre_player.seat]
+        game.coup_fourre_team = None if self.coup_fourre_team is None else game.teams[self.coup_fourre_team.index]
+        game.coup_fourre_hazard = self.coup_fourre_hazard
+        
+        game.player_actions = self.player_actions[:]
+        game.player_state = self.player_state[:]
+        game.action_history = ActionHistory(game.players)
+        game.team_points = self.team_points[:]
+        game.team_scores = [scores[:] for scores in self.team_scores]
+        
+        game.extension_check = self.extension_check
+        game.extension_team = None if self.extension_team is None else game.teams[self.extension_team.index]
+        
+        return game
+    
+    def snapshot(self):
+        """
+        Return ((int)) the game position as a fixed-size tuple of integers (same size for any number of players or length of game, can be used as a dictionary key)
+        
+        Structure (by position):
+            Number of players, current player seat, play status, extension team index, coup fourre player seat, coup fourre team index, coup fourre hazard (card index) (-1 for n/a)
+            Current player state (47, see state - the state includes a pending Extension Check or Safety Bonus Turn)
+            Team points (3)
+            Action history: number of actions, the last 11 action indicies, number of actions since each player's last action (6)
+            Card lists (length + cards, see snapshot_capacity): deck, discard, player hands (6), team piles (3 x safety, speed, battle, distance, safeties played)
+            Team status (3 x 8)
+            Team scores (3 x 9, see score_categories)
+            Player points (6), player reward since the last action (6), player has taken an action (6, 0 = no action yet: reward_last None)
+        """
+        
+        capacity = self.snapshot_capacity
+        
+        data = [
+            len(self.players),
+            self.scheduler.seat,
+            self.play_status,
+            -1 if self.extension_team is None else self.extension_team.index,
+            -1 if self.coup_fourre_player is None else self.coup_fourre_player.seat,
+            -1 if self.coup_fourre_team is None else self.coup_fourre_team.index,
+            -1 if self.coup_fourre_hazard is None else self.coup_fourre_hazard
+        ]
+        data += self.player_state
+        data += self.team_points + [0] * (3 - len(self.teams))
+        
+        history = self.history_actions[-11:]
+        history_count = len(self.history_actions)
+        data.append(len(history))
+        data += history + [-1] * (11 - len(history))
+        data += [min(history_count - 1 - p.history_last, 11) for p in self.players] + [11] * (6 - len(self.players))
         
-        for act in self.action_history:
-            team_idx = self.teams.index(act[0].team)
-            team_points[team_idx] += act[3]
+        padding = [-1] * capacity['deck']
+        lists = [(self.deck.cards, capacity['deck']), (self.deck.cards_discard, capacity['discard'])]
+        lists += [(p.hand, capacity['hand']) for p in self.players] + [([], capacity['hand'])] * (6 - len(self.players))
+        for i in range(3):
+            t = self.teams[i] if i < len(self.teams) else Team(i + 1)
+            lists += [(t.safety_pile, capacity['safety_pile']), (t.speed_pile, capacity['speed_pile']), (t.battle_pile, capacity['battle_pile']),
+                      (t.distance_pile, capacity['distance_pile']), (t.safety_played, 4)]
         
-        return team_points
+        for cards, size in lists:
+            data.append(len(cards))
+            data += cards
+            data += padding[:size - len(cards)]
+        
+        for i in range(3):
+            data += self.teams[i].status if i < len(self.teams) else padding[:8]
+        
+        for i in range(3):
+            data += self.team_scores[i] if i < len(self.teams) else [0] * len(score_categories)
+        
+        empty = [0] * (6 - len(self.players))
+        data += [p.points for p in self.players] + empty
+        data += [0 if p.reward_last is None else p.reward_last for p in self.players] + empty
+        data += [0 if p.reward_last is None else 1 for p in self.players] + empty
+        
+        return tuple(data)
     
-    def state(self):
+    def restore(self, snapshot):
+        """
+        Return the game to the position of a snapshot taken from a game with the same players
+            The action history restarts at the snapshot position (see history_actions)
+        
+        snapshot ((int)) - see snapshot
+        """
+        
+        capacity = self.snapshot_capacity
+        data = snapshot
+        
+        seat, self.play_status, extension_team, coup_fourre_seat, coup_fourre_team, coup_fourre_hazard = data[1:7]
+        self.scheduler.seat = seat
+        self.player_current = self.players[seat]
+        self.extension_team = None if extension_team == -1 else self.teams[extension_team]
+        self.coup_fourre_player = None if coup_fourre_seat == -1 else self.players[coup_fourre_seat]
+        self.coup_fourre_team = None if coup_fourre_team == -1 else self.teams[coup_fourre_team]
+        self.coup_fourre_hazard = None if coup_fourre_hazard == -1 else coup_fourre_hazard
+        
+        self.player_state = list(data[7:54])
+        self.player_actions = actions_space(self.player_state, self.card_matrix, self.action_matrix)
+        self.team_points = list(data[54:54 + len(self.teams)])
+        
+        history_count = data[57]
+        self.history_actions = list(data[58:58 + history_count])
+        self.action_history = ActionHistory(self.players)
+        for p in self.players:
+            since = data[69 + p.seat]
+            p.history_last = history_count - 1 - since if since < history_count else -1
+        
+        # Card lists are updated in place (the turn scheduler holds the players' hands)
+        lists = [(self.deck.cards, capacity['deck']), (self.deck.cards_discard, capacity['discard'])]
+        lists += [(p.hand, capacity['hand']) for p in self.players] + [([], capacity['hand'])] * (6 - len(self.players))
+        for i in range(3):
+            t = self.teams[i] if i < len(self.teams) else Team(i + 1)
+            lists += [(t.safety_pile, capacity['safety_pile']), (t.speed_pile, capacity['speed_pile']), (t.battle_pile, capacity['battle_pile']),
+                      (t.distance_pile, capacity['distance_pile']), (t.safety_played, 4)]
+        
+        i = 75
+        for cards, size in lists:
+            cards[:] = data[i + 1:i + 1 + data[i]]
+            i += 1 + size
+        
+        for t in self.teams:
+            t.status[:] = data[i:i + 8]
+            i += 8
+        i += 8 * (3 - len(self.teams))
+        
+        categories = len(score_categories)
+        self.team_scores = [list(data[i + t.index * categories:i + (t.index + 1) * categories]) for t in self.teams]
+        i += 3 * categories
+        
+        for p in self.players:
+            p.points = data[i + p.seat]
+            p.reward_last = data[i + 6 + p.seat] if data[i + 12 + p.seat] else None
+        
+        # Public cards from the restored discard and team piles
+        self.cards_public = [0] * len(self.card_matrix)
+        for cards in [self.deck.cards_discard] + [pile for t in self.teams for pile in (t.safety_pile, t.speed_pile, t.battle_pile, t.distance_pile)]:
+            for c in cards:
+                self.cards_public[c] += 1
+    
+    def state(self, player=None):
         """
         Return the state for the current player
+            player (Player|None) - the state as seen by another player (e.g. an observation between that player's turns) None = current player
         
         List structure (by index) - shape(32,)
             0     Number of players (2, 3, 4, 6)
@@ -897,7 +2120,7 @@ class Game():
             The following game elements are not included in the state. I am beginning with "minimal" information at first.
             
             A key strategy is counting cards, for example, counting number of "Accident" cards already played. This can influence discarding extra Repairs remedy cards.
-                Currently, this is not explicitly in the State
+                Currently, this is not explicitly in the State (see state_extended for the state with card counts)
                 The prior actions taken since last turn is in the State, the model could potentially learn from this component of state
             
             Another important component of the game is to know the relationship among cards (e.g. Out of Gas > Gasoline > Extra Tank).
@@ -905,57 +2128,91 @@ class Game():
 
         """
         
-        state_list = [-1] * 47
+        player = self.player_current if player is None else player
+        teams = self.teams
+        hand = player.hand
         
-        # Number of players
-        state_list[0] = len(self.players)
+        # Action History since player's last turn (most recent first, up to 11 actions)
+        history_start = max(player.history_last + 1, len(self.history_actions) - 11)
+        history = self.history_actions[history_start:]
+        history.reverse()
         
-        # Game play status
-        state_list[1] = self.play_status
+        state_list = [
+            len(self.players),                                              # Number of players
+            self.play_status,                                               # Game play status
+            -1 if self.extension_team is None else self.extension_team.index,   # Extension team
+            player.team.index,                                              # Current Player's Team Index
+            len(self.deck.cards)                                            # Number of cards left in deck
+        ]
+        state_list += history
+        state_list += [-1] * (11 - len(history))
         
-        # Extension team
-        state_list[2] = -1 if self.extension_team is None else self.teams.index(self.extension_team)
+        # Teams info
+        state_list += teams[0].status
+        state_list += teams[1].status
+        state_list += teams[2].status if len(teams) > 2 else [-1] * 8
         
-        # Current Player's Team Index
-        state_list[3] = self.teams.index(self.player_current.team)
+        # Cards in current player's hand
+        state_list += hand
+        state_list += [-1] * (7 - len(hand))
         
-        # Number of cards left in deck
-        state_list[4] = len(self.deck.cards)
+        return state_list
+    
+    def state_extended(self, player=None):
+        """
+        Return the state with card counting features for the current player (or another player)
         
-        # Action History since player's last turn
-        i = 5
-        for act in reversed(self.action_history):
-            if act[0] == self.player_current:
-                break
-            else:
-                state_list[i] = act[2]
-                i += 1
+        List structure (by index) - shape(85,)
+            0-46  State (see state)
+            47-65 Number of cards of each card index publicly out of play (discard pile and team piles)
+            66-84 Number of cards of each card index unseen by the player (deck and other players' hands)
         
-        # Teams info
-        i = 16
-        for t in self.teams:
-            state_list[i] = t.speed_status
-            i += 1
-            state_list[i] = t.battle_status
-            i += 1
-            state_list[i] = t.distance_points
-            i += 1
-            state_list[i] = t.distance_200
-            i += 1
-            state_list[i] = 1 if "Extra Tank" in t.safety_played else 0
-            i += 1
-            state_list[i] = 1 if "Puncture-Proof" in t.safety_played else 0
-            i += 1
-            state_list[i] = 1 if "Driving Ace" in t.safety_played else 0
-            i += 1
-            state_list[i] = 1 if "Right-of-Way" in t.safety_played else 0
-            i += 1
+        The public counts are kept by play_action (cards_public), only the player's hand (up to 7 cards) is counted on each call
+        """
         
-        # Cards in current player's hand
-        i = 40
-        for c in self.player_current.hand:
-            state_list[i] = self.card_matrix.index([c.type, c.value])
-            i += 1
+        player = self.player_current if player is None else player
+        state_list = self.player_state[:] if player is self.player_current and self.play_status < 4 else self.state(player)
         
-        return state_list
+        deck_counts = deck_counts_build(len(self.players))
+        unseen = [deck_counts[c] - self.cards_public[c] for c in range(len(self.card_matrix))]
+        for c in player.hand:
+            unseen[c] -= 1
+        
+        return state_list + self.cards_public + unseen
+    
+    # Packs a state into int16 buffers (47 or 85 values)
+    state_into_pack = struct.Struct('47h').pack_into
+    state_extended_into_pack = struct.Struct('85h').pack_into
+    
+    def state_into(self, out, row=0, player=None, extended=False):
+        """
+        Write the state for the current player (or another player) into a NumPy array, without building an array from the state list
+        
+        out (ndarray) - int16, C-contiguous: shape (47,) (85 extended) for one state, or shape (N, 47) (N, 85 extended) for a batch
+        row (int) - row of a batch array, 0 <= row < N (ignored for a single state)
+        player (Player|None) - the state as seen by another player (None = current player)
+        extended (bool) - write the extended state (see state_extended)
+        
+        Return (ndarray) - out
+        """
+        
+        if out.dtype != np.int16 or not out.flags.c_contiguous:
+            raise ValueError("State buffer must be a C-contiguous int16 array")
+        
+        # The packers write without bounds checks - a narrower row or a row past the end would write over other data
+        width = 85 if extended else 47
+        if out.ndim not in (1, 2) or out.shape[-1] != width:
+            raise ValueError(f"State buffer must have shape ({width},) or (N, {width}), not {out.shape}")
+        if out.ndim == 2 and not 0 <= row < len(out):
+            raise ValueError(f"Row {row} is outside the state buffer ({len(out)} rows)")
+        offset = row * out.strides[0] if out.ndim == 2 else 0
+        
+        if extended:
+            self.state_extended_into_pack(out, offset, *self.state_extended(player))
+        elif (player is None or player is self.player_current) and self.play_status < 4:
+            self.state_into_pack(out, offset, *self.player_state)
+        else:
+            self.state_into_pack(out, offset, *self.state(player))
+        
+        return out
         
\ No newline at end of file
@@ -0,0 +1,576 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+#
+# Compiled rules core - the rules of environment.Game on packed integer arrays (build: python core_build.py, see core.py)
+#   environment.py remains the reference implementation, core_check.py compares both backends game by game
+
+import random
+from libc.stdlib cimport malloc, realloc, free
+import environment as env
+
+# --------------------
+# Lookup tables (card index / action index, see environment.card_lookup_build and action_lookup_build)
+
+cdef int CARD_TYPE[19]
+cdef int CARD_DISTANCE[19]
+cdef int CARD_BATTLE_STATUS[19]
+cdef int CARD_SAFETY[19]
+cdef int SAFETY_CARD[4]
+cdef int ACTION_TEAM[97]
+cdef int ACTION_KIND[97]
+cdef int ACTION_CODE[97]
+
+cdef int i
+for i in range(19):
+    CARD_TYPE[i] = env.card_lookup['type'][i]
+    CARD_DISTANCE[i] = env.card_lookup['distance'][i]
+    CARD_BATTLE_STATUS[i] = env.card_lookup['battle_status'][i]
+    CARD_SAFETY[i] = env.card_lookup['safety'][i]
+for i in range(4):
+    SAFETY_CARD[i] = env.card_lookup['safety_card'][i]
+for i in range(97):
+    ACTION_TEAM[i], ACTION_KIND[i], ACTION_CODE[i] = env.action_lookup['decode'][i]
+
+cdef inline int action_play(int team, int card):
+    return (team + 1) * 19 + card
+
+cdef inline int action_coup_fourre(int team, int code):
+    return 76 + team * 5 + code
+
+cdef inline int action_extension(int team, int code):
+    return 91 + team * 2 + code
+
+# --------------------
+# Game Core
+cdef class GameCore:
+    """
+    A game with the same rules, states, available actions and rewards as environment.Game, on fixed-size integer arrays
+        Available actions are in ascending order (environment.Game returns them in set order)
+
+    Attributes:
+        players_count (int) - number of players
+        teams_count (int) - number of teams
+        play_status (int) - see environment.Game.play_status
+        seat (int) - seat of the current player
+        deck_order ((int)) - card index of the shuffled deck before the deal (see environment.Game.deck_order)
+
+    Methods:
+        state - Return the state for the current player (see environment.Game.state)
+        actions - Return the available actions for the current player
+        play_action - play an action for the current player
+        final_team_points - Return the points by team
+        history - Return the action history columns (seats, actions, rewards)
+        history_states - Return the state of each action history entry
+    """
+
+    cdef public int players_count
+    cdef public int teams_count
+    cdef public int play_status
+    cdef public int seat
+    cdef public tuple deck_order
+
+    cdef int deck[106]
+    cdef int deck_count
+    cdef int discard_count
+    cdef int hands[6][7]
+    cdef int hand_count[6]
+    cdef int status[3][8]
+    cdef int safety_count[3]
+    cdef int speed_pile[3][32]
+    cdef int speed_count[3]
+    cdef int battle_pile[3][80]
+    cdef int battle_count[3]
+
+    cdef int extension_team
+    cdef int coup_fourre_seat
+    cdef int coup_fourre_team
+    cdef int coup_fourre_hazard
+
+    cdef int team_points[3]
+    cdef int history_last[6]
+
+    # Action history (grown as needed)
+    cdef int history_count
+    cdef int history_capacity
+    cdef int *history_seats
+    cdef int *history_actions
+    cdef int *history_rewards
+    cdef short *history_state_rows
+
+    cdef int player_state[47]
+    cdef int player_actions[97]
+    cdef int actions_count
+
+    def __cinit__ (self):
+        self.history_capacity = 256
+        self.history_count = 0
+        self.history_seats = <int *> malloc(self.history_capacity * sizeof(int))
+        self.history_actions = <int *> malloc(self.history_capacity * sizeof(int))
+        self.history_rewards = <int *> malloc(self.history_capacity * sizeof(int))
+        self.history_state_rows = <short *> malloc(self.history_capacity * 47 * sizeof(short))
+        if not self.history_seats or not self.history_actions or not self.history_rewards or not self.history_state_rows:
+            raise MemoryError()
+
+    def __dealloc__ (self):
+        free(self.history_seats)
+        free(self.history_actions)
+        free(self.history_rewards)
+        free(self.history_state_rows)
+
+    def __init__ (self, players_count, seed=None, deck_order=None):
+        """
+        players_count (int) - number of players (2, 3, 4 or 6)
+        seed (int|random.Random|numpy.random.Generator|None) - seed or random number generator for the deck shuffle (same shuffle as environment.Game)
+        deck_order ([int]|None) - deck order to play instead of a shuffle
+        """
+
+        cdef int p, t, k
+
+        rng = random.Random(seed) if isinstance(seed, int) else seed
+        deck = env.Deck(env.Game.card_matrix, players_count, rng, deck_order)
+        self.deck_order = tuple(deck.cards)
+
+        self.players_count = players_count
+        self.teams_count = players_count if players_count < 4 else players_count // 2
+        self.deck_count = len(deck.cards)
+        for k in range(self.deck_count):
+            self.deck[k] = deck.cards[k]
+        self.discard_count = 0
+
+        for t in range(3):
+            self.status[t][0] = 0
+            self.status[t][1] = 3
+            for k in range(2, 8):
+                self.status[t][k] = 0
+            self.safety_count[t] = 0
+            self.speed_count[t] = 0
+            self.battle_count[t] = 0
+            self.team_points[t] = 0
+
+        # Deal 6 cards to each player (1 card at a time to each player)
+        for p in range(6):
+            self.hand_count[p] = 0
+            self.history_last[p] = -1
+        for k in range(6):
+            for p in range(players_count):
+                self.draw(p)
+
+        self.seat = players_count - 1
+        self.play_status = 0
+        self.extension_team = -1
+        self.coup_fourre_seat = -1
+        self.coup_fourre_team = -1
+        self.coup_fourre_hazard = -1
+
+        self.start_turn()
+
+    # --------------------
+    # Cards
+
+    cdef inline void draw(self, int seat):
+        if self.deck_count > 0:
+            self.deck_count -= 1
+            self.hands[seat][self.hand_count[seat]] = self.deck[self.deck_count]
+            self.hand_count[seat] += 1
+
+    cdef int find_card(self, int seat, int card):
+        # Remove the first matching card from the hand (-1 if not found)
+        cdef int k, j
+        for k in range(self.hand_count[seat]):
+            if self.hands[seat][k] == card:
+                for j in range(k, self.hand_count[seat] - 1):
+                    self.hands[seat][j] = self.hands[seat][j + 1]
+                self.hand_count[seat] -= 1
+                return card
+        return -1
+
+    # --------------------
+    # Turn order (see environment.TurnScheduler)
+
+    cdef inline int current(self):
+        # A seat of -1 (no player with cards) is the last seat, as players[-1] in environment.Game
+        return self.seat if self.seat > -1 else self.players_count - 1
+
+    cdef int next_seat_with_cards(self, int seat):
+        cdef int k
+        for k in range(self.players_count):
+            if self.hand_count[seat] > 0:
+                return seat
+            seat = seat + 1 if seat < self.players_count - 1 else 0
+        return -1
+
+    cdef int advance(self):
+        cdef int seat = self.seat
+        cdef int next_seat = seat + 1 if seat < self.players_count - 1 else 0
+
+        if self.play_status == 0:
+            self.seat = next_seat if self.deck_count > 0 else self.next_seat_with_cards(next_seat)
+            return 1
+
+        elif self.play_status == 1:
+            seat = next_seat
+            while seat % self.teams_count != self.coup_fourre_team and seat != self.coup_fourre_seat:
+                seat = seat + 1 if seat < self.players_count - 1 else 0
+
+            if seat != self.coup_fourre_seat:
+                self.seat = seat
+                return 0
+
+            self.seat = self.next_seat_with_cards(seat + 1 if seat < self.players_count - 1 else 0)
+            return 2
+
+        elif self.play_status == 3:
+            self.seat = self.next_seat_with_cards(seat)
+            return 1
+
+        return 0
+
+    cdef void start_turn(self):
+        cdef int turn
+        while True:
+            turn = self.advance()
+
+            if turn == 2:
+                self.play_status = 0
+                self.coup_fourre_seat = -1
+                self.coup_fourre_team = -1
+                self.coup_fourre_hazard = -1
+
+            if turn > 0:
+                self.draw(self.current())
+
+            self.state_build()
+            self.actions_build()
+
+            if self.play_status == 2 or self.play_status == 3:
+                self.play_status = 0
+
+            if self.actions_count > 0:
+                break
+
+    # --------------------
+    # State and actions
+
+    cdef void state_build(self):
+        cdef int seat = self.current()
+        cdef int *state = self.player_state
+        cdef int start, k, n, t
+
+        state[0] = self.players_count
+        state[1] = self.play_status
+        state[2] = self.extension_team
+        state[3] = seat % self.teams_count
+        state[4] = self.deck_count
+
+        # Actions since the player's last action (most recent first, up to 11)
+        start = self.history_last[seat] + 1
+        if start < self.history_count - 11:
+            start = self.history_count - 11
+        n = 0
+        for k in range(self.history_count - 1, start - 1, -1):
+            state[5 + n] = self.history_actions[k]
+            n += 1
+        for k in range(n, 11):
+            state[5 + k] = -1
+
+        for t in range(3):
+            for k in range(8):
+                state[16 + t * 8 + k] = self.status[t][k] if t < self.teams_count else -1
+
+        for k in range(7):
+            state[40 + k] = self.hands[seat][k] if k < self.hand_count[seat] else -1
+
+    cdef void actions_build(self):
+        cdef int *state = self.player_state
+        cdef bint mask[97]
+        cdef int k, t, card, kind, distance, status, safety_index, team, last_action, max_points
+        cdef int seat = self.current()
+        cdef int hand_count = self.hand_count[seat]
+        cdef int *hand = self.hands[seat]
+        cdef int play_status = state[1]
+
+        team = state[3]
+        for k in range(97):
+            mask[k] = False
+
+        if play_status == 0 or play_status == 3:
+            max_points = 1000 if (state[0] == 4 or state[2] != -1) else 700
+
+            for k in range(hand_count):
+                card = hand[k]
+                kind = CARD_TYPE[card]
+
+                if kind == 2:
+                    # Safeties can be played on own team at any point
+                    mask[action_play(team, card)] = True
+                elif kind == 0:
+                    # Distance (see actions_space for the rules)
+                    distance = CARD_DISTANCE[card]
+                    if self.status[team][2] + distance <= max_points and self.status[team][1] == 4:
+                        if distance <= 50:
+                            mask[action_play(team, card)] = True
+                        elif self.status[team][0] == 0 and (distance < 200 or self.status[team][3] < 2):
+                            mask[action_play(team, card)] = True
+                elif kind == 1:
+                    # Remedies counter the speed limit (End of Limit) or the battle status
+                    status = CARD_BATTLE_STATUS[card]
+                    if status == -1:
+                        if self.status[team][0] == 1:
+                            mask[action_play(team, card)] = True
+                    elif self.status[team][1] == status:
+                        mask[action_play(team, card)] = True
+                else:
+                    # Hazards can be played on any other team without the countering safety
+                    safety_index = CARD_SAFETY[card] + 4
+                    for t in range(self.teams_count):
+                        if t != team and self.status[t][safety_index] == 0:
+                            mask[action_play(t, card)] = True
+
+                # Discard - all cards can be discarded
+                mask[action_play(-1, card)] = True
+
+        elif play_status == 1:
+            # Coup Fourre Check - the hazard is the most recent action (or the prior action if a team player declined the Coup Fourre)
+            last_action = state[5]
+            if ACTION_KIND[last_action] == 1:
+                last_action = state[6]
+            safety_index = CARD_SAFETY[ACTION_CODE[last_action]]
+
+            for k in range(hand_count):
+                card = hand[k]
+                if CARD_TYPE[card] == 2 and CARD_SAFETY[card] == safety_index:
+                    mask[action_coup_fourre(team, safety_index)] = True
+                    mask[action_coup_fourre(team, 4)] = True
+
+        elif play_status == 2:
+            mask[action_extension(team, 0)] = True
+            mask[action_extension(team, 1)] = True
+
+        self.actions_count = 0
+        for k in range(97):
+            if mask[k]:
+                self.player_actions[self.actions_count] = k
+                self.actions_count += 1
+
+    def state(self):
+        """
+        Return ([int]) the state for the current player
+        """
+
+        return [self.player_state[k] for k in range(47)]
+
+    def actions(self):
+        """
+        Return ([int]) the available actions for the current player (ascending order)
+        """
+
+        return [self.player_actions[k] for k in range(self.actions_count)]
+
+    # --------------------
+    # Play
+
+    cdef void history_add(self, int seat, int action_index, int reward, bint with_state):
+        cdef int k, j
+        if self.history_count == self.history_capacity:
+            self.history_capacity *= 2
+            self.history_seats = <int *> realloc(self.history_seats, self.history_capacity * sizeof(int))
+            self.history_actions = <int *> realloc(self.history_actions, self.history_capacity * sizeof(int))
+            self.history_rewards = <int *> realloc(self.history_rewards, self.history_capacity * sizeof(int))
+            self.history_state_rows = <short *> realloc(self.history_state_rows, self.history_capacity * 47 * sizeof(short))
+
+        k = self.history_count
+        self.history_seats[k] = seat
+        self.history_actions[k] = action_index
+        self.history_rewards[k] = reward
+        for j in range(47):
+            self.history_state_rows[k * 47 + j] = self.player_state[j] if with_state else -1
+
+        self.history_last[seat] = k
+        self.history_count = k + 1
+        self.team_points[seat % self.teams_count] += reward
+
+    cdef int trip_bonus(self, int team):
+        # Trip completed (400), Shut-out (500), Delayed action (300), Safe trip - no 200's (300)
+        cdef int reward = 400
+        cdef int t
+        cdef bint shut_out = True
+
+        for t in range(self.teams_count):
+            if t != team and self.status[t][2] > 0:
+                shut_out = False
+        if shut_out:
+            reward += 500
+        if self.deck_count == 0:
+            reward += 300
+        if self.status[team][3] == 0:
+            reward += 300
+
+        return reward
+
+    cpdef play_action(self, int action_index):
+        """
+        Play an action for the current player and start the next player's turn (see environment.Game.play_action)
+        """
+
+        cdef int seat = self.current()
+        cdef int team = seat % self.teams_count
+        cdef int action_team = ACTION_TEAM[action_index]
+        cdef int action_kind = ACTION_KIND[action_index]
+        cdef int action_code = ACTION_CODE[action_index]
+        cdef int played_card, played_type, reward, distance, remedy_status, hazard_status, safety_index, top_card, t, k
+        cdef int bonus_seats[3]
+        cdef int bonus_count = 0
+
+        if action_kind == 1:
+            played_card = -1 if action_code == 4 else self.find_card(seat, SAFETY_CARD[action_code])
+        elif action_kind == 2:
+            played_card = -1
+        else:
+            played_card = self.find_card(seat, action_code)
+
+        played_type = -1 if played_card == -1 else CARD_TYPE[played_card]
+        reward = 0
+
+        if action_team == -1:
+            # Discard
+            self.discard_count += 1
+
+        elif played_type == 0:
+            distance = CARD_DISTANCE[played_card]
+            self.status[team][2] += distance
+            if distance == 200:
+                self.status[team][3] += 1
+            reward += distance
+
+            if self.players_count != 4:
+                if self.extension_team == -1 and self.status[team][2] == 700:
+                    self.play_status = 2
+                elif self.extension_team != -1 and self.status[team][2] == 1000:
+                    reward += 200 + self.trip_bonus(team)
+
+                    # Extension reached by a team that did not call it - 200 points to the other team (first player of the team)
+                    if self.extension_team != team:
+                        for t in range(self.teams_count):
+                            if t != team and t != self.extension_team:
+                                bonus_seats[bonus_count] = t
+                                bonus_count += 1
+
+                    self.play_status = 4
+
+            elif self.status[team][2] == 1000:
+                reward += self.trip_bonus(team)
+                self.play_status = 4
+
+        elif played_type == 1:
+            remedy_status = CARD_BATTLE_STATUS[played_card]
+            if remedy_status == -1:
+                self.speed_pile[team][self.speed_count[team]] = played_card
+                self.speed_count[team] += 1
+                self.status[team][0] = 0
+            else:
+                self.battle_pile[team][self.battle_count[team]] = played_card
+                self.battle_count[team] += 1
+                self.status[team][1] = 4 if (remedy_status == 3 or self.status[team][7] == 1) else 3
+
+        elif played_type == 3:
+            hazard_status = CARD_BATTLE_STATUS[played_card]
+            if hazard_status == -1:
+                self.speed_pile[action_team][self.speed_count[action_team]] = played_card
+                self.speed_count[action_team] += 1
+                self.status[action_team][0] = 1
+            else:
+                self.battle_pile[action_team][self.battle_count[action_team]] = played_card
+                self.battle_count[action_team] += 1
+                self.status[action_team][1] = hazard_status
+
+            self.play_status = 1
+            self.coup_fourre_seat = seat
+            self.coup_fourre_team = action_team
+            self.coup_fourre_hazard = played_card
+
+        elif action_kind == 1 or played_type == 2:
+            if played_card != -1:
+                safety_index = CARD_SAFETY[played_card]
+                self.status[team][4 + safety_index] = 1
+                self.safety_count[team] += 1
+                reward += 100
+                if self.safety_count[team] == 4:
+                    reward += 300
+
+                # Right-of-Way removes the Speed Limits
+                if safety_index == 3 and self.status[team][0] == 1:
+                    while self.speed_count[team] > 0 and CARD_TYPE[self.speed_pile[team][self.speed_count[team] - 1]] == 3:
+                        self.speed_count[team] -= 1
+                        self.discard_count += 1
+                    self.status[team][0] = 0
+
+                # Battle pile: hazards countered by the team's safeties are discarded
+                while True:
+                    if self.battle_count[team] > 0:
+                        top_card = self.battle_pile[team][self.battle_count[team] - 1]
+                        if CARD_TYPE[top_card] == 1:
+                            self.status[team][1] = 4
+                            break
+                        elif self.status[team][4 + CARD_SAFETY[top_card]] == 1:
+                            self.battle_count[team] -= 1
+                            self.discard_count += 1
+                        else:
+                            self.status[team][1] = CARD_BATTLE_STATUS[top_card]
+                            break
+                    else:
+                        self.status[team][1] = 4
+                        break
+
+                if action_kind == 1:
+                    reward += 300
+                    self.draw(seat)
+                    self.coup_fourre_seat = -1
+                    self.coup_fourre_team = -1
+                    self.coup_fourre_hazard = -1
+
+                self.play_status = 3
+
+        elif action_kind == 2:
+            if action_code == 0:
+                self.extension_team = team
+            else:
+                reward += self.trip_bonus(team)
+                self.play_status = 4
+
+        # Store action history
+        self.history_add(seat, action_index, reward, True)
+        for k in range(bonus_count):
+            self.history_add(bonus_seats[k], -1, 200, False)
+
+        # Move to next player (or End Game)
+        if self.play_status < 4:
+            if self.deck_count > 0:
+                self.start_turn()
+            else:
+                for k in range(self.players_count):
+                    if self.hand_count[k] > 0:
+                        self.start_turn()
+                        return
+                self.play_status = 4
+
+    def final_team_points(self):
+        """
+        Return ([int]) points by team
+        """
+
+        return [self.team_points[t] for t in range(self.teams_count)]
+
+    def history(self):
+        """
+        Return ([int], [int], [int]) - seat, action index and reward of each action history entry (see environment.ActionHistory)
+        """
+
+        return ([self.history_seats[k] for k in range(self.history_count)],
+                [self.history_actions[k] for k in range(self.history_count)],
+                [self.history_rewards[k] for k in range(self.history_count)])
+
+    def history_states(self):
+        """
+        Return ([[int]]) - state of each action history entry (-1 for bonus entries)
+        """
+
+        return [[self.history_state_rows[k * 47 + i] for i in range(47)] for k in range(self.history_count)]
@@ -0,0 +1,345 @@
+import os                       # Index file size
+import random                   # Seeded deck shuffle
+import struct                   # Binary records
+import zlib                     # Frame compression
+import numpy as np
+import environment as env
+
+# zstd frame compression is optional (pip install zstandard), zlib is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --------------------
+# Game Log - complete games as compact binary records, appended as a stream
+#   A game is stored as its deck (seed or deck order) and its action index sequence, replaying the actions
+#   on the same deck rebuilds the game exactly (environment.Game deck_order)
+#
+#   File layout:
+#       header - magic b'MBGL', version, codec (0 = none, 1 = zlib, 2 = zstd)
+#       frames - stored length (uint32), raw length (uint32), number of games (uint32), then the records (compressed by the codec)
+#   Record layout (little endian):
+#       record length (uint16, bytes after this field), number of players (uint8), flags (uint8: 1 = seed, 2 = deck order),
+#       number of actions (uint16), seed (uint64, flag 1), deck size (uint8) and deck order (uint8 each, flag 2),
+#       final points by team (int16 each), actions (uint8 each)
+#   Index file (path + '.idx') - per game: frame offset in the file and record offset in the raw frame (int64 pairs),
+#   memory-mapped by the reader for random access to any game without scanning the log
+
+header_struct = struct.Struct('<4sBB')
+frame_struct = struct.Struct('<III')
+record_struct = struct.Struct('<HBBH')
+seed_struct = struct.Struct('<Q')
+
+log_magic = b'MBGL'
+log_version = 1
+codecs = {'none': 0, 'zlib': 1, 'zstd': 2}
+
+def players_names_build(players_count):
+    return [f"Player {i + 1}" for i in range(players_count)]
+
+def seed_deck_order(players_count, seed):
+    """
+    Return ((int)) the deck order of a game created with the seed (environment.Game seed)
+    """
+
+    return tuple(env.Deck(env.Game.card_matrix, players_count, random.Random(seed)).cards)
+
+def record_encode(game, seed=None):
+    """
+    Return (bytes) the record of a game (length prefix included)
+
+    game (Game) - a game played from its deal (not a clone or restore)
+    seed (int|None) - seed the game was created with (stored instead of the deck order when 0 <= seed < 2^64
+                      and the seed shuffles the game's deck order, otherwise the deck order is stored)
+    """
+
+    history = game.action_history
+    if len(history) != len(game.history_actions):
+        raise ValueError("Game log records need the complete action history (the game was created by clone or restore)")
+
+    actions = history.actions
+    actions = actions[actions > -1].astype(np.uint8).tobytes()
+
+    if seed is not None and 0 <= seed < 1 << 64 and seed_deck_order(len(game.players), seed) == tuple(game.deck_order):
+        flags = 1
+        deck = seed_struct.pack(seed)
+    else:
+        flags = 2
+        deck = bytes([len(game.deck_order)]) + bytes(game.deck_order)
+
+    points = struct.pack(f'<{len(game.teams)}h', *game.team_points)
+    body_length = record_struct.size - 2 + len(deck) + len(points) + len(actions)
+
+    return record_struct.pack(body_length, len(game.players), flags, len(actions)) + deck + points + actions
+
+class GameRecord():
+    """
+    A game read from a game log
+
+    Attributes:
+        players_count (int) - number of players
+        seed (int|None) - seed of the deck shuffle (None = the deck order is stored)
+        deck_order ((int)|None) - deck order (None = the seed is stored)
+        team_points ([int]) - final points by team
+        actions (bytes) - action index of each action played (in play order)
+
+    Methods:
+        replay - Return (Game) the game rebuilt by playing its actions
+            steps (int|None) - number of actions to play (None = all, the finished game)
+            players_names ([str]|None) - names of the players (None = Player 1, Player 2, ...)
+    """
+
+    def __init__ (self, data, offset=0):
+        """
+        data (bytes) - buffer holding the record
+        offset (int) - position of the record (its length prefix) in data
+        """
+
+        length, self.players_count, flags, actions_count = record_struct.unpack_from(data, offset)
+        position = offset + record_struct.size
+
+        self.seed = None
+        self.deck_order = None
+        if flags & 1:
+            self.seed = seed_struct.unpack_from(data, position)[0]
+            position += seed_struct.size
+        else:
+            deck_size = data[position]
+            self.deck_order = tuple(data[position + 1:position + 1 + deck_size])
+            position += 1 + deck_size
+
+        teams_count = self.players_count if self.players_count < 4 else self.players_count // 2
+        self.team_points = list(struct.unpack_from(f'<{teams_count}h', data, position))
+        position += 2 * teams_count
+
+        self.actions = bytes(data[position:position + actions_count])
+
+    def replay(self, steps=None, players_names=None):
+        game = env.Game(players_names_build(self.players_count) if players_names is None else players_names, seed=self.seed, deck_order=self.deck_order)
+
+        play_action = game.play_action
+        for action in self.actions[:steps]:
+            play_action(action)
+
+        return game
+
+# --------------------
+# Writer
+class GameLogWriter():
+    """
+    Appends games to a game log (and its index), records are written in frames of frame_games games
+        An existing log is continued (same codec)
+
+    Attributes:
+        path (str) - log file name (the index is path + '.idx')
+        codec (str) - frame compression: 'none', 'zlib' or 'zstd' (needs the zstandard package)
+        frame_games (int) - number of games per frame (larger frames compress better, random access decompresses a whole frame)
+        games (int) - number of games in the log
+
+    Methods:
+        append - add a game
+        flush - write the pending games as a frame
+        close - flush and close the files (pending games are lost without close or flush,
+                unless the writer is garbage collected - use it as a context manager)
+    """
+
+    def __init__ (self, path, codec='none', frame_games=256, level=None):
+        """
+        path (str) - log file name
+        codec (str) - 'none', 'zlib' or 'zstd'
+        frame_games (int) - number of games per frame
+        level (int|None) - compression level (None = codec default)
+        """
+
+        if codec not in codecs:
+            raise ValueError(f"Unknown codec: {codec} (none, zlib, zstd)")
+        if codec == 'zstd' and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package (pip install zstandard)")
+
+        self.path = path
+        self.codec = codec
+        self.frame_games = frame_games
+
+        if codec == 'zlib':
+            self.compress = lambda data: zlib.compress(data, -1 if level is None else level)
+        elif codec == 'zstd':
+            self.compress = zstandard.ZstdCompressor(level=3 if level is None else level).compress
+        else:
+            self.compress = None
+
+        # New log, or continue an existing one
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as file:
+                magic, version, codec_id = header_struct.unpack(file.read(header_struct.size))
+            if magic != log_magic or version != log_version:
+                raise ValueError(f"{path} is not a game log (version {log_version})")
+            if codec_id != codecs[codec]:
+                raise ValueError(f"{path} uses codec {list(codecs)[codec_id]}, not {codec}")
+            self.file = open(path, 'ab')
+            self.index = open(path + '.idx', 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(header_struct.pack(log_magic, log_version, codecs[codec]))
+            self.index = open(path + '.idx', 'wb')
+
+        self.games = self.index.tell() // 16
+
+        self.records = []
+
+    def append(self, game, seed=None):
+        """
+        Add a game (see record_encode)
+        """
+
+        record = record_encode(game, seed)
+        self.records.append(record)
+        if len(self.records) >= self.frame_games:
+            self.flush()
+
+    def flush(self):
+        if self.records:
+            raw = b''.join(self.records)
+            stored = raw if self.compress is None else self.compress(raw)
+
+            frame_offset = self.file.tell()
+            self.file.write(frame_struct.pack(len(stored), len(raw), len(self.records)))
+            self.file.write(stored)
+
+            # Index entries once the frame is written (an interrupted write leaves no index entry to a partial frame)
+            index = np.zeros((len(self.records), 2), dtype=np.int64)
+            index[:, 0] = frame_offset
+            index[1:, 1] = np.cumsum([len(r) for r in self.records[:-1]])
+            self.index.write(index.tobytes())
+            self.games += len(self.records)
+
+            self.records = []
+
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            self.index.close()
+
+    def __del__ (self):
+        # Writer dropped without close - write the pending games (no file when __init__ failed)
+        if getattr(self, 'file', None) is not None:
+            self.close()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
+
+# --------------------
+# Reader
+class GameLogReader():
+    """
+    Reads a game log - as a stream (iteration, no index needed) or by game number (memory-mapped index)
+
+    Attributes:
+        path (str) - log file name
+        codec (str) - frame compression
+        index (ndarray|None) - shape (games, 2) int64 memory-mapped (frame offset, record offset in the raw frame), None = no index file
+
+    Methods:
+        __len__ - Return (int) number of games in the index
+        __getitem__ - Return (GameRecord) game n
+        __iter__ - Return the games (GameRecord) in log order, frame by frame
+        replay - Return (Game) game n rebuilt after steps actions (see GameRecord.replay)
+        close - close the file
+    """
+
+    def __init__ (self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+
+        magic, version, codec_id = header_struct.unpack(self.file.read(header_struct.size))
+        if magic != log_magic or version != log_version:
+            raise ValueError(f"{path} is not a game log (version {log_version})")
+        self.codec = list(codecs)[codec_id]
+
+        if self.codec == 'zlib':
+            self.decompress = zlib.decompress
+        elif self.codec == 'zstd':
+            if zstandard is None:
+                raise ValueError("The zstd codec needs the zstandard package (pip install zstandard)")
+            self.decompress = zstandard.ZstdDecompressor().decompress
+        else:
+            self.decompress = None
+
+        index_path = path + '.idx'
+        index_size = os.path.getsize(index_path) // 16 if os.path.exists(index_path) else 0
+        self.index = np.memmap(index_path, dtype=np.int64, mode='r', shape=(index_size, 2)) if index_size > 0 else None
+
+        # Last frame read (consecutive games of a frame are read without decompressing it again)
+        self.frame_offset = None
+        self.frame = None
+
+    def __len__ (self):
+        return 0 if self.index is None else len(self.index)
+
+    def frame_read(self, offset):
+        """
+        Return (bytes, int, int) - raw records of the frame at the offset, number of games, offset of the next frame (None = end of the file)
+        """
+
+        self.file.seek(offset)
+        header = self.file.read(frame_struct.size)
+        if len(header) < frame_struct.size:
+            return None, 0, None
+
+        stored_length, raw_length, games = frame_struct.unpack(header)
+        stored = self.file.read(stored_length)
+        if len(stored) < stored_length:
+            return None, 0, None
+
+        raw = stored if self.decompress is None else self.decompress(stored)
+        return raw, games, offset + frame_struct.size + stored_length
+
+    def __getitem__ (self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(f"Game {n} is not in the log ({len(self)} games)")
+
+        frame_offset, record_offset = (int(i) for i in self.index[n])
+
+        # Uncompressed - read the record only
+        if self.decompress is None:
+            self.file.seek(frame_offset + frame_struct.size + record_offset)
+            length = struct.unpack('<H', self.file.read(2))[0]
+            self.file.seek(-2, 1)
+            return GameRecord(self.file.read(length + 2))
+
+        if frame_offset != self.frame_offset:
+            self.frame = self.frame_read(frame_offset)[0]
+            self.frame_offset = frame_offset
+        return GameRecord(self.frame, record_offset)
+
+    def __iter__ (self):
+        offset = header_struct.size
+        while offset is not None:
+            raw, games, offset = self.frame_read(offset)
+            position = 0
+            for i in range(games):
+                record = GameRecord(raw, position)
+                position += record_struct.unpack_from(raw, position)[0] + 2
+                yield record
+
+    def replay(self, n, steps=None, players_names=None):
+        return self[n].replay(steps, players_names)
+
+    def close(self):
+        self.index = None
+        self.file.close()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
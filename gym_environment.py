@@ -0,0 +1,541 @@
+import random                   # Seeds and opponent policies
+import multiprocessing          # Vector environment worker processes
+import numpy as np
+import environment as env
+import rollout                  # Opponent policies
+
+# Gymnasium and PettingZoo are optional - without them the environments keep the same interface (reset, step, observe, last)
+#   as plain classes, the observation and action spaces are None
+try:
+    import gymnasium
+    from gymnasium import spaces
+except ImportError:
+    gymnasium = None
+
+try:
+    from pettingzoo import AECEnv
+except ImportError:
+    AECEnv = object
+
+# --------------------
+# Spaces
+#   Observation - the 47 integer game state (see environment.Game.state), -1 for n/a up to 1,000 distance points
+#                 extended: 85 integers, the state with card counts (see environment.Game.state_extended)
+#   Action - the 97 action indexes (see environment.Game.action_matrix), available actions are given as info['action_mask']
+
+observation_size = 47
+observation_size_extended = 85
+actions_count = len(env.Game.action_matrix)
+
+def observation_space_build(extended=False):
+    if gymnasium is None:
+        return None
+    return spaces.Box(low=-1, high=1000, shape=(observation_size_extended if extended else observation_size,), dtype=np.int16)
+
+def observation_build(game, seat, extended=False):
+    """
+    Return (ndarray) shape (47,) int16 (85 extended) - the observation of the player at the seat (current player or not)
+    """
+
+    out = np.empty(observation_size_extended if extended else observation_size, dtype=np.int16)
+    return game.state_into(out, player=game.players[seat], extended=extended)
+
+def action_space_build():
+    if gymnasium is None:
+        return None
+    return spaces.Discrete(actions_count)
+
+def players_names_build(players_count):
+    """
+    Return ([str]) - agent names of the seats (player_0, player_1, ...)
+    """
+
+    if players_count not in (2, 3, 4, 6):
+        raise ValueError(f"Number of players must be 2, 3, 4 or 6, not {players_count}")
+    return [f"player_{i}" for i in range(players_count)]
+
+def actions_mask_int8(actions):
+    """
+    Return (ndarray) shape (97,) int8 - 1 for each available action (the mask type of gymnasium.spaces.Discrete.sample)
+    """
+
+    mask = np.zeros(actions_count, dtype=np.int8)
+    mask[actions] = 1
+    return mask
+
+def team_rewards(team_points, team_points_before, teams_count):
+    """
+    Return ([int]) - reward of each team for the points scored since team_points_before
+        Team relative (same as environment.transitions_batch): the team's points - the other teams' points
+    """
+
+    changes = [team_points[i] - team_points_before[i] for i in range(teams_count)]
+    total = sum(changes)
+    return [2 * changes[i] - total for i in range(teams_count)]
+
+# --------------------
+# Single agent environment
+class MilleBornesEnv(gymnasium.Env if gymnasium is not None else object):
+    """
+    Gymnasium environment - one agent plays a seat of a game, the other seats are played by an opponent policy
+        Each step plays the agent's action, then the opponents' actions until the agent's next decision (or the end of the game)
+        reward - the agent's action points + team player action points - opponent players action points until the agent's next decision
+                 (same as environment.transitions_batch), episodes end when the game is over (no truncation)
+        info - action_mask (ndarray shape (97,) int8, 1 = available action), seat, play_status, team_points, invalid_action
+        An action that is not available is not played: the reward is invalid_action_penalty, the game is unchanged (the agent decides again)
+        and info['invalid_action'] is True (masked policies avoid it with info['action_mask'] or action_masks)
+
+    Attributes:
+        players_count (int) - number of players (2, 3, 4, 6)
+        agent_seat (int) - seat played by the agent
+        opponent_policy (function) - policy of the other seats, called with (game, rng) (see rollout policies)
+        extended (bool) - observations include card counts (see environment.Game.state_extended)
+        invalid_action_penalty (float) - reward of an action that is not available (points, the scale of the rewards)
+        observation_size (int) - 47 (85 extended)
+        game (environment.Game|None) - the game played (None before reset)
+        observation_space (gymnasium.spaces.Box|None) - shape (47,) int16 (85 extended)
+        action_space (gymnasium.spaces.Discrete|None) - 97 actions
+
+    Methods:
+        reset - start a new game, Return (observation, info)
+            seed (int|None) - seed of the games and the opponent policy (None = continue the current random number generator)
+            options (dict|None) - deck_order: deck order to play instead of a shuffle
+        step - play the agent's action, Return (observation, reward, terminated, truncated, info)
+        action_masks - Return (ndarray) shape (97,) bool - True for each available action (the mask hook of maskable policies)
+        render - Return (str) the teams' status and the agent's hand (render_mode 'ansi')
+    """
+
+    metadata = {'render_modes': ['ansi']}
+
+    def __init__ (self, players_count=2, agent_seat=0, opponent_policy='random', render_mode=None, extended=False, invalid_action_penalty=-100.0):
+        """
+        players_count (int) - number of players (2, 3, 4, 6)
+        agent_seat (int) - seat played by the agent (0 = first to play)
+        opponent_policy (str|(str, dict)|function) - policy spec (see rollout.policy_build) or policy function called with (game, rng)
+        render_mode (str|None) - None or 'ansi'
+        extended (bool) - observations include card counts
+        invalid_action_penalty (float) - reward of an action that is not available
+        """
+
+        self.players_names = players_names_build(players_count)
+        if not 0 <= agent_seat < players_count:
+            raise ValueError(f"Agent seat must be between 0 and {players_count - 1}, not {agent_seat}")
+
+        self.players_count = players_count
+        self.agent_seat = agent_seat
+        self.opponent_policy = opponent_policy if callable(opponent_policy) else rollout.policy_build(opponent_policy, 0)
+        self.render_mode = render_mode
+        self.extended = extended
+        self.invalid_action_penalty = invalid_action_penalty
+        self.observation_size = observation_size_extended if extended else observation_size
+        self.observation_space = observation_space_build(extended)
+        self.action_space = action_space_build()
+
+        self.rng = random.Random()
+        self.game = None
+        self.team_points = None
+
+    def reset(self, seed=None, options=None):
+        if gymnasium is not None:
+            super().reset(seed=seed)
+        if seed is not None:
+            self.rng = random.Random(seed)
+
+        deck_order = None if options is None else options.get('deck_order')
+        self.game = env.Game(self.players_names, seed=self.rng.getrandbits(64), deck_order=deck_order)
+        self.opponents_play()
+        self.team_points = self.game.team_points[:]
+
+        return self.observation(), self.info()
+
+    def step(self, action):
+        game = self.game
+        if game is None or game.play_status == 4:
+            raise RuntimeError("Game is over, call reset to start a new game")
+
+        action = int(action)
+        if action not in game.player_actions:
+            # Not played - the penalty, same observation and available actions
+            return self.observation(), self.invalid_action_penalty, False, False, self.info(invalid_action=True)
+
+        game.play_action(action)
+        self.opponents_play()
+
+        # Reward of the agent's team since the agent's last decision
+        teams_count = len(game.teams)
+        reward = team_rewards(game.team_points, self.team_points, teams_count)[self.agent_seat % teams_count]
+        self.team_points = game.team_points[:]
+
+        return self.observation(), reward, game.play_status == 4, False, self.info()
+
+    def opponents_play(self):
+        """
+        Play the other seats until the agent's next decision or the end of the game
+        """
+
+        game = self.game
+        while game.play_status < 4 and game.scheduler.seat != self.agent_seat:
+            game.play_action(self.opponent_policy(game, self.rng))
+
+    def observation(self):
+        return observation_build(self.game, self.agent_seat, self.extended)
+
+    def info(self, invalid_action=False):
+        game = self.game
+        agent_turn = game.play_status < 4 and game.scheduler.seat == self.agent_seat
+        return {
+            'action_mask': actions_mask_int8(game.player_actions if agent_turn else []),
+            'seat': self.agent_seat,
+            'play_status': game.play_status,
+            'team_points': game.team_points[:],
+            'invalid_action': invalid_action
+        }
+
+    def action_masks(self):
+        mask = np.zeros(actions_count, dtype=bool)
+        if self.game is not None and self.game.play_status < 4 and self.game.scheduler.seat == self.agent_seat:
+            mask[self.game.player_actions] = True
+        return mask
+
+    def render(self):
+        if self.render_mode != 'ansi' or self.game is None:
+            return None
+
+        game = self.game
+        lines = []
+        for team in game.teams:
+            safeties = [env.Game.card_matrix[c][1] for c in team.safety_pile]
+            lines.append(f"{team.name}: {team.status[2]} km, points {game.team_points[team.index]}, safeties {safeties}")
+        hand = [env.Game.card_matrix[c][1] for c in game.players[self.agent_seat].hand]
+        lines.append(f"Hand ({self.players_names[self.agent_seat]}): {hand}")
+        return '\n'.join(lines)
+
+# --------------------
+# Multi-agent environment
+class MilleBornesAECEnv(AECEnv):
+    """
+    PettingZoo AEC (agent environment cycle) environment - every seat is an agent, one agent acts at a time
+        Agents are named player_0 ... player_n in play order (seat index = agent number, team index = seat % number of teams)
+        Tables of 3 players (3 teams), 4 or 6 players (2 or 3 teams of 2), and 2 players
+        rewards - after each action every agent gets its team's points - the other teams' points of that action,
+                  the cumulative reward of an agent (see last) is its team relative reward since its last action (same as environment.transitions_batch)
+        infos - action_mask (ndarray shape (97,) int8) of each agent, all 0 for the agents not selected
+        When the game is over every agent is terminated, each is then stepped with None and removed from agents
+
+    Attributes:
+        possible_agents ([str]) - agent names
+        agents ([str]) - agents still in the game
+        agent_selection (str) - agent to act
+        game (environment.Game|None) - the game played (None before reset)
+        rewards, terminations, truncations, infos, _cumulative_rewards ({str: ...}) - by agent (see PettingZoo AECEnv)
+
+    Methods:
+        reset - start a new game
+            seed (int|None) - seed of the games (None = continue the current random number generator)
+            options (dict|None) - deck_order: deck order to play instead of a shuffle
+        step - play the selected agent's action (None for a terminated agent)
+        observe - Return (ndarray) shape (47,) int16 (85 extended) the state of the game as seen by an agent
+        last - Return (observation, cumulative reward, termination, truncation, info) of the selected agent
+        observation_space / action_space - Return the spaces of an agent
+    """
+
+    metadata = {'name': 'mille_bornes_v0', 'render_modes': [], 'is_parallelizable': False}
+
+    def __init__ (self, players_count=4, extended=False):
+        """
+        players_count (int) - number of players (3, 4, 6 or 2)
+        extended (bool) - observations include card counts (see environment.Game.state_extended)
+        """
+
+        self.players_count = players_count
+        self.extended = extended
+        self.possible_agents = players_names_build(players_count)
+        self.agent_seats = {self.possible_agents[i]: i for i in range(players_count)}
+        self.observation_spaces = {a: observation_space_build(extended) for a in self.possible_agents}
+        self.action_spaces = {a: action_space_build() for a in self.possible_agents}
+        self.render_mode = None
+
+        self.rng = random.Random()
+        self.game = None
+        self.agents = []
+
+    def observation_space(self, agent):
+        return self.observation_spaces[agent]
+
+    def action_space(self, agent):
+        return self.action_spaces[agent]
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = random.Random(seed)
+
+        deck_order = None if options is None else options.get('deck_order')
+        self.game = env.Game(self.possible_agents, seed=self.rng.getrandbits(64), deck_order=deck_order)
+
+        self.agents = self.possible_agents[:]
+        self.rewards = {a: 0 for a in self.agents}
+        self._cumulative_rewards = {a: 0 for a in self.agents}
+        self.terminations = {a: False for a in self.agents}
+        self.truncations = {a: False for a in self.agents}
+        self.infos = {a: {} for a in self.agents}
+        self.agent_select()
+
+    def observe(self, agent):
+        return observation_build(self.game, self.agent_seats[agent], self.extended)
+
+    def last(self, observe=True):
+        agent = self.agent_selection
+        return (self.observe(agent) if observe else None, self._cumulative_rewards[agent], self.terminations[agent],
+                self.truncations[agent], self.infos[agent])
+
+    def step(self, action):
+        agent = self.agent_selection
+
+        # Game over - remove the terminated agent
+        if self.terminations[agent] or self.truncations[agent]:
+            if action is not None:
+                raise ValueError(f"Agent {agent} is terminated, the only valid action is None")
+            self.agents.remove(agent)
+            for values in [self.rewards, self._cumulative_rewards, self.terminations, self.truncations, self.infos]:
+                del values[agent]
+            for a in self.agents:
+                self.rewards[a] = 0
+            if self.agents:
+                self.agent_selection = self.agents[0]
+            return
+
+        game = self.game
+        action = int(action)
+        if action not in game.player_actions:
+            raise ValueError(f"Action {action} is not available to {agent} (available actions: {sorted(game.player_actions)})")
+
+        team_points = game.team_points[:]
+        game.play_action(action)
+
+        # The acting agent's cumulative reward restarts with this action
+        teams_count = len(game.teams)
+        rewards = team_rewards(game.team_points, team_points, teams_count)
+        self._cumulative_rewards[agent] = 0
+        for a in self.agents:
+            self.rewards[a] = rewards[self.agent_seats[a] % teams_count]
+            self._cumulative_rewards[a] += self.rewards[a]
+
+        if game.play_status == 4:
+            for a in self.agents:
+                self.terminations[a] = True
+
+        self.agent_select()
+
+    def agent_select(self):
+        """
+        Set agent_selection to the current player and the infos action masks
+        """
+
+        game = self.game
+        if game.play_status == 4:
+            self.agent_selection = self.agents[0]
+            for a in self.agents:
+                self.infos[a] = {'action_mask': actions_mask_int8([]), 'team_points': game.team_points[:]}
+            return
+
+        self.agent_selection = self.possible_agents[game.scheduler.seat]
+        for a in self.agents:
+            self.infos[a] = {'action_mask': actions_mask_int8(game.player_actions if a == self.agent_selection else [])}
+
+    def render(self):
+        return None
+
+    def close(self):
+        pass
+
+# --------------------
+# Vector environment
+#   Many single agent environments (MilleBornesEnv) stepped as one batch, in the calling process (workers = 0)
+#   or split over worker processes (each worker steps its share of the environments for one message)
+#   Finished games are reset in the same step (the returned observation is the first of the new game),
+#   the last observation of a finished game is in info['final_obs'] (rows flagged in info['_final_obs'])
+
+def envs_reset(envs, seeds, options):
+    """
+    Return (observations, masks) - reset each environment, as arrays (rows in envs order)
+    """
+
+    observations = np.zeros((len(envs), envs[0].observation_size), dtype=np.int16)
+    masks = np.zeros((len(envs), actions_count), dtype=np.int8)
+    for i in range(len(envs)):
+        observations[i], info = envs[i].reset(seed=seeds[i], options=options)
+        masks[i] = info['action_mask']
+    return observations, masks
+
+def envs_step(envs, actions):
+    """
+    Return (observations, rewards, terminations, masks, final_observations) - step each environment (finished games are reset), as arrays
+    """
+
+    count = len(envs)
+    observations = np.zeros((count, envs[0].observation_size), dtype=np.int16)
+    rewards = np.zeros(count, dtype=np.float32)
+    terminations = np.zeros(count, dtype=bool)
+    masks = np.zeros((count, actions_count), dtype=np.int8)
+    final_observations = np.zeros((count, envs[0].observation_size), dtype=np.int16)
+
+    for i in range(count):
+        observation, rewards[i], terminations[i], truncated, info = envs[i].step(actions[i])
+        if terminations[i]:
+            final_observations[i] = observation
+            observation, info = envs[i].reset()
+        observations[i] = observation
+        masks[i] = info['action_mask']
+
+    return observations, rewards, terminations, masks, final_observations
+
+def vector_worker(connection, env_settings, count):
+    """
+    Worker process - steps count environments on each command received (reset, step, close)
+    """
+
+    envs = [MilleBornesEnv(**env_settings) for i in range(count)]
+    try:
+        while True:
+            command, data = connection.recv()
+            if command == 'reset':
+                connection.send(envs_reset(envs, *data))
+            elif command == 'step':
+                connection.send(envs_step(envs, data))
+            elif command == 'close':
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        connection.close()
+
+class MilleBornesVectorEnv(gymnasium.vector.VectorEnv if gymnasium is not None else object):
+    """
+    Vector environment - many MilleBornesEnv stepped at once (synchronous, or asynchronous with worker processes)
+        Observations (N, 47) int16 (N, 85 extended), rewards (N,) float32, terminations (N,) bool, truncations (N,) bool (always False)
+        infos - action_mask (N, 97) int8; final_obs (same shape as the observations) and _final_obs (N,) bool for the games finished in the step
+        Autoreset in the same step (gymnasium AutoresetMode.SAME_STEP)
+
+    Attributes:
+        num_envs (int) - number of environments (N)
+        workers (int) - number of worker processes (0 = environments stepped in the calling process)
+        single_observation_space, single_action_space - spaces of one environment (None without gymnasium)
+        observation_space, action_space - batched spaces (None without gymnasium)
+
+    Methods:
+        reset - reset every environment, Return (observations, infos)
+            seed (int|[int]|None) - int = environment i is seeded with seed + i
+        step - play an action in every environment, Return (observations, rewards, terminations, truncations, infos)
+        step_async / step_wait - step split in send and receive (the calling process can work while the workers play)
+        close - stop the worker processes
+    """
+
+    metadata = {'autoreset_mode': gymnasium.vector.AutoresetMode.SAME_STEP} if gymnasium is not None else {}
+
+    def __init__ (self, num_envs, players_count=2, agent_seat=0, opponent_policy='random', workers=0, context=None, extended=False, invalid_action_penalty=-100.0):
+        """
+        num_envs (int) - number of environments
+        players_count, agent_seat, opponent_policy, extended, invalid_action_penalty - settings of each environment (see MilleBornesEnv)
+            opponent_policy must be picklable with workers (a policy spec or a module level function)
+        workers (int) - number of worker processes (0 = synchronous, in the calling process)
+        context (str|None) - multiprocessing start method (None = default)
+        """
+
+        env_settings = {'players_count': players_count, 'agent_seat': agent_seat, 'opponent_policy': opponent_policy, 'extended': extended,
+                        'invalid_action_penalty': invalid_action_penalty}
+
+        self.num_envs = num_envs
+        self.workers = min(workers, num_envs)
+        self.single_observation_space = observation_space_build(extended)
+        self.single_action_space = action_space_build()
+        if gymnasium is not None:
+            self.observation_space = gymnasium.vector.utils.batch_space(self.single_observation_space, num_envs)
+            self.action_space = spaces.MultiDiscrete(np.full(num_envs, actions_count))
+        else:
+            self.observation_space = None
+            self.action_space = None
+
+        self.envs = []
+        self.connections = []
+        self.processes = []
+        self.closed = False
+
+        if self.workers == 0:
+            self.envs = [MilleBornesEnv(**env_settings) for i in range(num_envs)]
+            self.bounds = [0, num_envs]
+        else:
+            # Environments split in contiguous rows per worker
+            self.bounds = [num_envs * w // self.workers for w in range(self.workers + 1)]
+            mp = multiprocessing.get_context(context)
+            for w in range(self.workers):
+                parent, child = mp.Pipe()
+                process = mp.Process(target=vector_worker, args=(child, env_settings, self.bounds[w + 1] - self.bounds[w]), daemon=True)
+                process.start()
+                child.close()
+                self.connections.append(parent)
+                self.processes.append(process)
+
+        self.step_results = None
+
+    def reset(self, seed=None, options=None):
+        if seed is None or isinstance(seed, int):
+            seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        else:
+            seeds = list(seed)
+
+        if self.workers == 0:
+            observations, masks = envs_reset(self.envs, seeds, options)
+        else:
+            for w in range(self.workers):
+                self.connections[w].send(('reset', (seeds[self.bounds[w]:self.bounds[w + 1]], options)))
+            results = [c.recv() for c in self.connections]
+            observations, masks = [np.concatenate(r) for r in zip(*results)]
+
+        return observations, {'action_mask': masks}
+
+    def step_async(self, actions):
+        actions = np.asarray(actions)
+        if self.workers == 0:
+            self.step_results = [envs_step(self.envs, actions)]
+        else:
+            for w in range(self.workers):
+                self.connections[w].send(('step', actions[self.bounds[w]:self.bounds[w + 1]]))
+
+    def step_wait(self):
+        if self.workers == 0:
+            results = self.step_results
+            self.step_results = None
+        else:
+            results = [c.recv() for c in self.connections]
+
+        observations, rewards, terminations, masks, final_observations = [np.concatenate(r) for r in zip(*results)]
+        infos = {'action_mask': masks, 'final_obs': final_observations, '_final_obs': terminations.copy()}
+
+        return observations, rewards, terminations, np.zeros(self.num_envs, dtype=bool), infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self, **kwargs):
+        if self.closed:
+            return
+        self.closed = True
+
+        for connection in self.connections:
+            try:
+                connection.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    def __del__ (self):
+        if not getattr(self, 'closed', True):
+            self.close()
+
+if gymnasium is not None and 'MilleBornes-v0' not in gymnasium.registry:
+    gymnasium.register(id='MilleBornes-v0', entry_point='gym_environment:MilleBornesEnv')
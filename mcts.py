@@ -0,0 +1,301 @@
+import math                     # UCB exploration term
+import random                   # Determinization and rollouts
+import time                     # Search time budget
+import multiprocessing          # Parallel searches
+import weakref                  # Worker pool finalizer
+import environment as env
+
+# --------------------
+# Helper functions
+
+def determinize(game, rng):
+    """
+    Return (Game) a copy of the game with the hidden information sampled from the current player's point of view
+        Cards the current player has not seen (other players' hands and the deck) are shuffled and dealt back in the same amounts
+        Seen cards: current player's hand, discard pile and all team piles
+
+    game (environment.Game) - the game to copy
+    rng (random.Random) - random number generator used for the shuffle
+    """
+
+    sample = game.clone()
+    player = sample.player_current
+
+    # Count the cards the current player has not seen
+    unseen = env.deck_counts_build(len(sample.players))
+    seen = player.hand + sample.deck.cards_discard
+    for t in sample.teams:
+        seen += t.safety_pile + t.speed_pile + t.battle_pile + t.distance_pile
+    for c in seen:
+        unseen[c] -= 1
+
+    pool = []
+    for i in range(len(unseen)):
+        pool += [i] * unseen[i]
+    rng.shuffle(pool)
+
+    # Deal the unseen cards back (hands are updated in place, the turn scheduler holds the hand lists)
+    i = 0
+    for p in sample.players:
+        if p is not player:
+            p.hand[:] = pool[i:i + len(p.hand)]
+            i += len(p.hand)
+    sample.deck.cards[:] = pool[i:]
+
+    return sample
+
+def policy_random(game, rng):
+    """
+    Default rollout policy - Return a random action from the current player's actions
+    """
+
+    return rng.choice(game.player_actions)
+
+def pool_close(pool):
+    """
+    Stop a worker pool (MCTSPlayer.close, or the finalizer of a player that was not closed)
+    """
+
+    pool.close()
+    pool.join()
+
+def search_worker(arguments):
+    """
+    Run a search in a worker process (see MCTSPlayer.search)
+
+    Return ({int: int}) - visits by root action
+    """
+
+    game, settings, iterations, time_limit, seed = arguments
+    player = MCTSPlayer(workers=1, reuse_tree=False, seed=seed, **settings)
+    root = player.search_tree(game, Node(None, -1, -1), iterations, time_limit)
+    return {a: child.visits for a, child in root.children.items()}
+
+# --------------------
+# Node
+class Node():
+    """
+    A node of the search tree (single observer information set tree - nodes are reached by action index, independent of hidden cards)
+
+    Attributes:
+        parent (Node|None) - parent node (None for the root)
+        action (int) - action index that leads to this node (-1 for the root)
+        team (int) - team index of the player who took the action (-1 for the root)
+        children ({int: Node}) - child node by action index
+        visits (int) - number of playouts through this node
+        reward (float) - total playout value for the team that took the action
+        available (int) - number of playouts in which the action was available (determinizations differ in the actions available)
+    """
+
+    def __init__ (self, parent, action, team):
+        self.parent = parent
+        self.action = action
+        self.team = team
+        self.children = {}
+        self.visits = 0
+        self.reward = 0.0
+        self.available = 0
+
+# --------------------
+# MCTS Player
+class MCTSPlayer():
+    """
+    Determinized Monte Carlo Tree Search player (Information Set MCTS)
+        Each playout samples the hidden cards (see determinize), descends the tree with UCB, expands one node and finishes with a rollout
+        Rollouts are cut after rollout_depth actions, the playout value is the team's points gained minus the best other team's points gained (per 1,000 points)
+
+    Attributes:
+        iterations (int|None) - playouts per search (None = limited by time only)
+        time_limit (float|None) - seconds per search (None = limited by iterations only)
+        exploration (float) - UCB exploration constant
+        rollout_depth (int) - maximum number of actions in a rollout
+        rollout_policy (function) - rollout_policy(game, rng) returns an action index from game.player_actions (must be picklable for workers)
+        workers (int) - number of processes searching in parallel (root parallelization, visits are summed across workers)
+        reuse_tree (bool) - keep the subtree of the actions played since the last search (single worker only)
+            The tree is kept for the game object searched last, from the length of its action history at that search
+        rng (random.Random) - random number generator for determinization and rollouts
+
+    Methods:
+        choose - Return the action to play for the game's current player
+        search - Return the root visit counts by action
+        close - stop the worker processes (also on exit of a with block, or when the player is garbage collected)
+    """
+
+    def __init__ (self, iterations=1000, time_limit=None, exploration=0.7, rollout_depth=40, rollout_policy=policy_random, workers=1, reuse_tree=True, seed=None):
+        if iterations is None and time_limit is None:
+            raise ValueError("MCTSPlayer requires an iterations or time_limit budget")
+
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rollout_depth = rollout_depth
+        self.rollout_policy = rollout_policy
+        self.workers = workers
+        self.reuse_tree = reuse_tree and workers == 1
+        self.rng = random.Random(seed)
+
+        # Tree reuse
+        self.root = None
+        self.root_game = None
+        self.root_history = 0
+
+        # Worker processes (created on first parallel search, stopped by close or the finalizer)
+        self.pool = None
+        self.pool_finalizer = None
+
+    def choose(self, game):
+        """
+        Return (int) the action with the most root visits for the game's current player (an index in game.player_actions)
+
+        game (environment.Game) - game in progress (not modified)
+        """
+
+        if len(game.player_actions) == 1:
+            return game.player_actions[0]
+
+        visits = self.search(game)
+        action = max(game.player_actions, key=lambda a: visits.get(a, 0))
+
+        if self.reuse_tree:
+            # Keep the subtree of the chosen action, the next search continues from the actions played after it
+            self.root = self.root.children.get(action)
+            self.root_history += 1
+
+        return action
+
+    def search(self, game):
+        """
+        Return ({int: int}) root visits by action index (e.g. to use as a policy target)
+
+        game (environment.Game) - game in progress (not modified)
+        """
+
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+                self.pool_finalizer = weakref.finalize(self, pool_close, self.pool)
+
+            settings = {'exploration': self.exploration, 'rollout_depth': self.rollout_depth, 'rollout_policy': self.rollout_policy,
+                        'iterations': self.iterations, 'time_limit': self.time_limit}
+            iterations = None if self.iterations is None else -(-self.iterations // self.workers)
+            arguments = [(game.clone(), settings, iterations, self.time_limit, self.rng.getrandbits(32)) for i in range(self.workers)]
+
+            visits = {}
+            for result in self.pool.map(search_worker, arguments):
+                for a, v in result.items():
+                    visits[a] = visits.get(a, 0) + v
+            return visits
+
+        self.root = self.search_tree(game, self.reuse_root(game), self.iterations, self.time_limit)
+        self.root_game = game
+        self.root_history = len(game.history_actions)
+        return {a: child.visits for a, child in self.root.children.items()}
+
+    def reuse_root(self, game):
+        """
+        Return (Node) the root for a search - the retained subtree if the actions played since the last search are in the tree, otherwise a new root
+        """
+
+        node = None
+        if self.reuse_tree and self.root is not None and self.root_game is game:
+            # Actions played since the root position (bonus entries of the history are not actions)
+            node = self.root
+            for action in game.history_actions[self.root_history:]:
+                if action < 0:
+                    continue
+                node = node.children.get(action)
+                if node is None:
+                    break
+
+        if node is None:
+            return Node(None, -1, -1)
+
+        node.parent = None
+        return node
+
+    def search_tree(self, game, root, iterations, time_limit):
+        """
+        Return (Node) the root after running playouts until the iterations or time budget is reached
+        """
+
+        rng = self.rng
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        root_points = game.final_team_points()
+        i = 0
+
+        while (iterations is None or i < iterations) and (deadline is None or time.perf_counter() < deadline):
+            i += 1
+            sample = determinize(game, rng)
+            node = root
+
+            # Selection: descend while every available action has been tried
+            while sample.play_status < 4:
+                actions = sample.player_actions
+                untried = [a for a in actions if a not in node.children]
+                if len(untried) > 0:
+                    # Expansion: add one node for an untried action
+                    action = rng.choice(untried)
+                    child = Node(node, action, sample.player_current.team.index)
+                    node.children[action] = child
+                    child.available += 1
+                    sample.play_action(action)
+                    node = child
+                    break
+
+                node = self.select(node, actions)
+                sample.play_action(node.action)
+
+            # Rollout
+            depth = 0
+            while sample.play_status < 4 and depth < self.rollout_depth:
+                sample.play_action(self.rollout_policy(sample, rng))
+                depth += 1
+
+            # Backpropagation - value for each team of the points gained since the root
+            gained = [p - q for p, q in zip(sample.final_team_points(), root_points)]
+            values = []
+            for t in range(len(gained)):
+                best_other = max(gained[k] for k in range(len(gained)) if k != t)
+                values.append((gained[t] - best_other) / 1000)
+
+            while node is not None:
+                node.visits += 1
+                if node.team > -1:
+                    node.reward += values[node.team]
+                node = node.parent
+
+        return root
+
+    def select(self, node, actions):
+        """
+        Return (Node) the child with the highest UCB value among the available actions
+        """
+
+        best = None
+        best_value = -math.inf
+
+        for a in actions:
+            child = node.children[a]
+            child.available += 1
+            value = child.reward / child.visits + self.exploration * math.sqrt(math.log(child.available) / child.visits)
+            if value > best_value:
+                best = child
+                best_value = value
+
+        return best
+
+    def close(self):
+        """
+        Stop the worker processes (if any)
+        """
+
+        if self.pool is not None:
+            self.pool_finalizer()
+            self.pool = None
+            self.pool_finalizer = None
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,239 @@
+import os                       # Memory-mapped backing files
+import numpy as np
+
+# --------------------
+# Sum Tree
+class SumTree():
+    """
+    Binary tree of priorities where each node holds the sum of its children (proportional prioritized sampling)
+        Leaf i (the priority of buffer row i) is stored at tree[leaves + i], the root (total priority) at tree[1]
+
+    Attributes:
+        leaves (int) - number of leaves (capacity rounded up to a power of 2)
+        tree (ndarray) - shape (2 * leaves,) float64 (tree[0] is unused)
+
+    Methods:
+        update - set the priorities of rows, O(log n) per row
+        find - Return the rows for values in [0, total), O(log n) per value
+    """
+
+    def __init__ (self, capacity, tree=None):
+        """
+        capacity (int) - number of rows
+        tree (ndarray|None) - existing storage of shape (2 * leaves,) (e.g. memory-mapped), None = new zeroed array
+        """
+
+        self.leaves = 1 << max(capacity - 1, 0).bit_length()
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64) if tree is None else tree
+
+    @property
+    def total(self):
+        return float(self.tree[1])
+
+    def priorities(self, rows):
+        return self.tree[self.leaves + np.asarray(rows)]
+
+    def update(self, rows, priorities):
+        """
+        Set the priorities of rows (a row may appear more than once, the last priority is kept)
+        """
+
+        nodes = self.leaves + np.asarray(rows, dtype=np.int64)
+        if len(nodes) == 0:
+            return
+        self.tree[nodes] = priorities
+
+        # Recompute the parents level by level
+        nodes = np.unique(nodes // 2)
+        while nodes[0] > 0:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """
+        Return (ndarray) the row of each value - the row whose cumulative priority range contains the value
+        """
+
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+
+        while nodes[0] < self.leaves:
+            left = 2 * nodes
+            right = values >= self.tree[left]
+            values -= self.tree[left] * right
+            nodes = left + right
+
+        return nodes - self.leaves
+
+# --------------------
+# Replay Buffer
+class ReplayBuffer():
+    """
+    Fixed-capacity ring buffer of transitions in preallocated NumPy arrays, with optional proportional prioritized sampling
+        Once full, the oldest transitions are overwritten
+        Transitions are the arrays of environment.Game.transitions / transitions_batch (states, actions, rewards, next_states, dones, next_masks)
+
+    Prioritized sampling (Schaul et al., Prioritized Experience Replay):
+        probability of row i = p_i ^ alpha / sum(p ^ alpha), p_i = |TD error| + epsilon (new transitions get the highest priority seen)
+        importance sampling weight of row i = (N * probability) ^ -beta, normalized by the highest weight in the batch
+
+    Memory-mapped buffers (path given): each array is a .npy file in the path folder, opening the same folder again continues the buffer
+        A buffer reopened with prioritization gives the transitions written without it (or before a new priorities file) the highest priority seen
+
+    Attributes:
+        capacity (int) - maximum number of transitions
+        prioritized (bool) - True = sample by priority; False = uniform sampling
+        alpha (float) - priority exponent (0 = uniform)
+        epsilon (float) - added to the absolute TD errors so no transition has a zero priority
+        path (str|None) - folder of the memory-mapped files (None = in memory)
+        states (ndarray) - shape (capacity, 47) int16
+        actions (ndarray) - shape (capacity,) int16
+        rewards (ndarray) - shape (capacity,) float32
+        next_states (ndarray) - shape (capacity, 47) int16
+        dones (ndarray) - shape (capacity,) bool
+        next_masks (ndarray) - shape (capacity, 97) bool, available actions for the next state
+        written (int) - total number of transitions written (position of the next write is written % capacity)
+
+    Methods:
+        append - add transitions
+        sample - Return a sample of transitions (with their rows and importance sampling weights)
+        update_priorities - set the priorities of sampled rows from their TD errors
+        flush - write memory-mapped arrays to disk
+    """
+
+    fields = [('states', (47,), np.int16), ('actions', (), np.int16), ('rewards', (), np.float32),
+              ('next_states', (47,), np.int16), ('dones', (), np.bool_), ('next_masks', (97,), np.bool_)]
+
+    def __init__ (self, capacity, prioritized=True, alpha=0.6, epsilon=0.01, path=None):
+        """
+        capacity (int) - maximum number of transitions
+        prioritized (bool) - True = sample by priority; False = uniform sampling
+        alpha (float) - priority exponent
+        epsilon (float) - added to the absolute TD errors
+        path (str|None) - folder for memory-mapped arrays (created if needed, an existing buffer of the same capacity is reopened)
+        """
+
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self.path = path
+
+        for field, shape, dtype in self.fields:
+            setattr(self, field, self.array_open(field, (capacity,) + shape, dtype))
+
+        # Written counter, highest priority and written counter of the priorities (kept with the arrays so a memory-mapped buffer can be reopened)
+        self.counters = self.array_open('counters', (3,), np.float64)
+        if self.counters[1] == 0:
+            self.counters[1] = 1.0
+
+        self.tree = None
+        if prioritized:
+            leaves = SumTree(capacity).leaves
+            self.tree = SumTree(capacity, self.array_open('priorities', (2 * leaves,), np.float64))
+
+            # Transitions without a priority (written by a buffer without prioritization, or all of them for a new priorities file)
+            start = self.written - len(self) if self.tree.total == 0 else max(int(self.counters[2]), self.written - len(self))
+            if start < self.written:
+                self.tree.update((start + np.arange(self.written - start)) % capacity, self.counters[1] ** self.alpha)
+            self.counters[2] = self.written
+
+    def array_open(self, name, shape, dtype):
+        """
+        Return (ndarray) a zeroed array, or the memory-mapped array of the name in the path folder (opened if it exists)
+        """
+
+        if self.path is None:
+            return np.zeros(shape, dtype=dtype)
+
+        os.makedirs(self.path, exist_ok=True)
+        file_name = os.path.join(self.path, f"{name}.npy")
+
+        if os.path.exists(file_name):
+            array = np.lib.format.open_memmap(file_name, mode='r+')
+            if array.shape != shape or array.dtype != dtype:
+                raise ValueError(f"Replay buffer file {file_name} has shape {array.shape} {array.dtype}, expected {shape} {np.dtype(dtype)}")
+            return array
+
+        return np.lib.format.open_memmap(file_name, mode='w+', dtype=dtype, shape=shape)
+
+    @property
+    def written(self):
+        return int(self.counters[0])
+
+    def __len__ (self):
+        return min(self.written, self.capacity)
+
+    def append(self, transitions):
+        """
+        Add transitions (states, actions, rewards, next_states, dones, next_masks) at the end of the ring, O(1) per transition plus the priority update
+
+        Return (ndarray) - rows written
+        """
+
+        count = len(transitions[0])
+        start = self.written
+        rows = (start + np.arange(count)) % self.capacity
+
+        for i in range(len(self.fields)):
+            getattr(self, self.fields[i][0])[rows] = transitions[i]
+        self.counters[0] = start + count
+
+        if self.tree is not None and count > 0:
+            self.tree.update(rows, self.counters[1] ** self.alpha)
+            self.counters[2] = self.counters[0]
+
+        return rows
+
+    def sample(self, batch_size, beta=0.4, rng=np.random):
+        """
+        Return (states, actions, rewards, next_states, dones, next_masks, rows, weights) a sample of the stored transitions
+            rows (ndarray) - buffer row of each transition (see update_priorities)
+            weights (ndarray) - float32 importance sampling weights (all 1 for uniform sampling)
+
+        batch_size (int) - number of transitions
+        beta (float) - importance sampling exponent (1 = full correction)
+        rng (numpy.random.RandomState|module) - random number generator
+        """
+
+        if self.tree is None:
+            rows = rng.randint(len(self), size=batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            # Stratified sampling - one value from each of batch_size equal ranges of the total priority
+            total = self.tree.total
+            values = (np.arange(batch_size) + rng.random_sample(batch_size)) * (total / batch_size)
+            rows = np.minimum(self.tree.find(values), len(self) - 1)
+
+            probabilities = self.tree.priorities(rows) / total
+            weights = (len(self) * probabilities) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+
+        return tuple(getattr(self, field)[rows] for field, shape, dtype in self.fields) + (rows, weights)
+
+    def update_priorities(self, rows, errors):
+        """
+        Set the priorities of rows (from sample) from their TD errors - no effect for a buffer without prioritization (uniform sampling)
+
+        rows (ndarray) - buffer rows
+        errors (ndarray) - TD error of each row
+        """
+
+        if self.tree is None or len(rows) == 0:
+            return
+
+        priorities = np.abs(np.asarray(errors, dtype=np.float64)) + self.epsilon
+        self.counters[1] = max(self.counters[1], priorities.max())
+        self.tree.update(rows, priorities ** self.alpha)
+
+    def flush(self):
+        """
+        Write the memory-mapped arrays to disk (no effect for in-memory buffers)
+        """
+
+        if self.path is not None:
+            for field, shape, dtype in self.fields:
+                getattr(self, field).flush()
+            self.counters.flush()
+            if self.tree is not None:
+                self.tree.tree.flush()
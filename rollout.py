@@ -0,0 +1,266 @@
+import random                               # Policies
+import multiprocessing                      # Worker processes
+from multiprocessing import shared_memory   # Experience ring buffer
+import numpy as np
+import environment as env
+import core                                 # Game backend of the play loops
+import mcts
+
+# --------------------
+# Policies
+#   A policy is called with (game, rng) and returns an action index from game.player_actions
+#   Policy specs (picklable, resolved in the worker process): 'random', 'program', ('mcts', {MCTSPlayer settings})
+
+def policy_program(game, rng):
+    """
+    Programmatic policy - illustrate game play using pure programming logic (no machine learning) with simple conditions (same as the notebooks)
+
+    Policy will select in cascading order from the below:
+        Play highest Distance card
+        Play random Remedy card
+        Play random non-discard option
+        Discard a random card
+
+    In addition, the policy will:
+        Always choose to play a Coup Fourre when presented with the opportunity
+        Never choose Extension play
+    """
+
+    actions = game.player_actions
+
+    # Coup Fourre Option - always play the coup fourre option (there will be only two options)
+    if 80 in actions or 85 in actions or 90 in actions:
+        return min(actions)
+
+    # Extension Option - always select "No"
+    if actions[0] > 90:
+        return max(actions)
+
+    # Distance cards
+    options = set(actions).intersection(list(range(19,24)) + list(range(38,43)) + list(range(57,62)))
+    if len(options) > 0:
+        return max(options)
+
+    # Remedy cards
+    options = set(actions).intersection(list(range(24,29)) + list(range(43,48)) + list(range(62,67)))
+    if len(options) > 0:
+        return rng.choice(sorted(options))
+
+    # Non-discard option
+    options = set(actions).intersection(list(range(19,76)))
+    if len(options) > 0:
+        return rng.choice(sorted(options))
+
+    # Discard random card
+    return rng.choice(actions)
+
+policies = {'random': mcts.policy_random, 'program': policy_program}
+
+def policy_build(spec, seed):
+    """
+    Return (function) the policy for a policy spec
+
+    spec (str|(str, dict)) - 'random', 'program' or ('mcts', {MCTSPlayer settings})
+    seed (int) - seed for policies with their own random number generator (MCTS)
+    """
+
+    if isinstance(spec, str):
+        return policies[spec]
+
+    name, settings = spec
+    if name == 'mcts':
+        player = mcts.MCTSPlayer(seed=seed, **dict(settings, workers=1))
+        return lambda game, rng: player.choose(game)
+
+    raise ValueError(f"Unknown policy: {name}")
+
+# --------------------
+# Experience Ring
+class ExperienceRing():
+    """
+    Fixed-capacity ring buffer of transitions in shared memory
+        Created by the parent process, attached by name in worker processes (see run)
+        Once full, the oldest transitions are overwritten
+
+    Attributes:
+        capacity (int) - maximum number of transitions
+        name (str) - shared memory block name
+        states (ndarray) - shape (capacity, 47) int16
+        actions (ndarray) - shape (capacity,) int16
+        rewards (ndarray) - shape (capacity,) int32
+        next_states (ndarray) - shape (capacity, 47) int16
+        dones (ndarray) - shape (capacity,) bool
+        next_masks (ndarray) - shape (capacity, 97) bool, available actions for the next state
+        written (int) - total number of transitions written (position of the next write is written % capacity)
+
+    Note: rows are reserved under the lock and written after, a read of the newest rows while workers are running may see a partial write
+    """
+
+    fields = [('states', (47,), np.int16), ('actions', (), np.int16), ('rewards', (), np.int32),
+              ('next_states', (47,), np.int16), ('dones', (), np.bool_), ('next_masks', (97,), np.bool_)]
+
+    def __init__ (self, capacity, name=None):
+        """
+        capacity (int) - maximum number of transitions
+        name (str|None) - None = create a new shared memory block; str = attach to an existing block
+        """
+
+        self.capacity = capacity
+
+        # Block layout: written counter (int64), then each field
+        offsets = [8]
+        for field, shape, dtype in self.fields:
+            offsets.append(offsets[-1] + capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+
+        self.shared = shared_memory.SharedMemory(name=name, create=name is None, size=offsets[-1])
+        self.name = self.shared.name
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=self.shared.buf)
+        if name is None:
+            self.counter[0] = 0
+
+        for i in range(len(self.fields)):
+            field, shape, dtype = self.fields[i]
+            setattr(self, field, np.ndarray((capacity,) + shape, dtype=dtype, buffer=self.shared.buf, offset=offsets[i]))
+
+    @property
+    def written(self):
+        return int(self.counter[0])
+
+    def __len__ (self):
+        return min(self.written, self.capacity)
+
+    def append(self, transitions, lock):
+        """
+        Write transitions (states, actions, rewards, next_states, dones, next_masks) at the end of the ring
+
+        lock (multiprocessing.Lock) - lock shared by all writers
+        """
+
+        count = len(transitions[0])
+        with lock:
+            start = int(self.counter[0])
+            self.counter[0] = start + count
+
+        rows = (start + np.arange(count)) % self.capacity
+        for i in range(len(self.fields)):
+            getattr(self, self.fields[i][0])[rows] = transitions[i]
+
+    def sample(self, batch_size, rng=np.random):
+        """
+        Return (states, actions, rewards, next_states, dones, next_masks) a uniform random sample of the stored transitions
+        """
+
+        rows = rng.randint(len(self), size=batch_size)
+        return tuple(getattr(self, field)[rows] for field, shape, dtype in self.fields)
+
+    def close(self):
+        """
+        Release this process's view of the shared memory (the parent also calls unlink to free the block)
+        """
+
+        for field, shape, dtype in self.fields:
+            setattr(self, field, None)
+        self.counter = None
+        self.shared.close()
+
+    def unlink(self):
+        self.shared.unlink()
+
+# --------------------
+# Rollout workers
+
+# Worker process globals (set by worker_attach)
+worker_ring = None
+worker_lock = None
+
+def worker_attach(name, capacity, lock):
+    """
+    Worker process initializer - attach to the experience ring
+    """
+
+    global worker_ring, worker_lock
+    worker_ring = ExperienceRing(capacity, name)
+    worker_lock = lock
+
+def policy_seed(seed, *streams):
+    """
+    Return (int) the seed of the policies for a game seed - an independent stream, the policy choices are not correlated with the deal
+
+    streams (int) - more numbers to derive separate streams for the same game (e.g. a seat rotation and a lineup position)
+    """
+
+    return int(np.random.SeedSequence([seed, 1, *streams]).generate_state(1)[0])
+
+def rollout_range(arguments):
+    """
+    Play the games for a range of seeds and write the recorded players' transitions to the experience ring
+
+    arguments (tuple) - (seeds (range), player names, policy specs by seat, seats to record)
+
+    Return ({str: int|[int]}) - summary (see run)
+    """
+
+    seeds, players_names, policy_specs, record_seats = arguments
+    summary = {'games': 0, 'transitions': 0, 'wins': [0] * (len(players_names) if len(players_names) < 4 else len(players_names) // 2), 'ties': 0}
+
+    games = []
+    for seed in seeds:
+        # The deck is shuffled from the seed, the policies use a stream derived from it
+        rng = random.Random(policy_seed(seed))
+        seat_policies = [policy_build(spec, policy_seed(seed)) for spec in policy_specs]
+
+        # Compiled backend when available (MCTS policies need the full Game)
+        game = core.game_build(players_names, seed=seed, full=any(not isinstance(spec, str) for spec in policy_specs))
+
+        while game.play_status < 4:
+            game.play_action(seat_policies[game.scheduler.seat](game, rng))
+        games.append(game)
+
+        team_points = game.final_team_points()
+        max_points = max(team_points)
+        if team_points.count(max_points) == 1:
+            summary['wins'][team_points.index(max_points)] += 1
+        else:
+            summary['ties'] += 1
+        summary['games'] += 1
+
+    # Transitions of the recorded seats of all the games in one pass (game order, then seat order)
+    transitions = env.transitions_batch([g for g in games for seat in record_seats], record_seats * len(games))
+    worker_ring.append(transitions, worker_lock)
+    summary['transitions'] += len(transitions[0])
+
+    return summary
+
+def run(players_names, policy_specs, seeds, ring, workers=None, record_seats=None, chunk_size=50):
+    """
+    Play games in a pool of worker processes, transitions are written straight to the shared experience ring
+
+    players_names ([str]) - names of the players (in game play order)
+    policy_specs ([str|(str, dict)]) - policy spec by seat (see policy_build)
+    seeds (range) - one game per seed (any step)
+    ring (ExperienceRing) - ring created by the calling process
+    workers (int|None) - number of processes (None = CPU count)
+    record_seats ([int]|None) - seats whose transitions are recorded (None = all seats)
+    chunk_size (int) - number of seeds given to a worker at a time
+
+    Return ({str: int|[int]}) - games: games played; transitions: transitions written; wins: games won by team; ties: games with a tie
+    """
+
+    record_seats = list(range(len(players_names))) if record_seats is None else record_seats
+    lock = multiprocessing.Lock()
+
+    tasks = []
+    for i in range(0, len(seeds), chunk_size):
+        tasks.append((seeds[i:i + chunk_size], players_names, policy_specs, record_seats))
+
+    summary = {'games': 0, 'transitions': 0, 'wins': [0] * (len(players_names) if len(players_names) < 4 else len(players_names) // 2), 'ties': 0}
+
+    with multiprocessing.Pool(workers, initializer=worker_attach, initargs=(ring.name, ring.capacity, lock)) as pool:
+        for result in pool.imap_unordered(rollout_range, tasks):
+            summary['games'] += result['games']
+            summary['transitions'] += result['transitions']
+            summary['ties'] += result['ties']
+            for i in range(len(result['wins'])):
+                summary['wins'][i] += result['wins'][i]
+
+    return summary
@@ -0,0 +1,441 @@
+import argparse                 # Command line options
+import itertools                # Matchup lineups
+import json                     # Results file
+import math                     # Confidence intervals, ratings
+import multiprocessing          # Worker processes
+import queue                    # Results from the worker processes
+import random                   # Policies
+import sys
+import core                     # Game backend
+import rollout                  # Policies
+
+# --------------------
+# Tournament - policies (entrants) are evaluated in matchups: a number of players and one entrant per team
+#   Every seat of a team is played by the team's entrant (4 players: seats 0 & 2 and 1 & 3, see environment.Game)
+#   Seat rotations - game k of a matchup plays deck seed + k // teams, with the entrants rotated k % teams team positions,
+#   each deck is played once from every position (removes the first player advantage and most of the deck luck)
+#   Results are counted and decided on complete rotation groups (every position of a deck), chunks of games hold whole groups
+#   The first entrant of a lineup is the candidate, its score in a game against each other entrant is 1 (more points), 0.5 (tie) or 0
+#   A matchup stops when its sequential probability ratio test (SPRT) is decided or after max_games games
+
+z_95 = 1.959963984540054
+
+def matchups_build(candidate, opponents, players_counts):
+    """
+    Return ([(int, [str])]) - matchups (players count, lineup) of a candidate against opponents
+        2 teams (2 or 4 players) - the candidate against each opponent
+        3 teams (3 or 6 players) - the candidate against each pair of opponents (an opponent can fill both teams)
+
+    candidate (str) - entrant name
+    opponents ([str]) - entrant names
+    players_counts ([int]) - numbers of players (2, 3, 4, 6)
+    """
+
+    matchups = []
+    for players_count in players_counts:
+        teams_count = players_count if players_count < 4 else players_count // 2
+        for others in itertools.combinations_with_replacement(opponents, teams_count - 1):
+            matchups.append((players_count, [candidate] + list(others)))
+    return matchups
+
+def wilson_interval(score, games, z=z_95):
+    """
+    Return (float, float) - Wilson score confidence interval of a rate (score out of games)
+    """
+
+    if games == 0:
+        return 0.0, 1.0
+
+    rate = score / games
+    center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+def elo_from_score(score):
+    """
+    Return (float) - Elo difference of an expected score (score clipped to keep the difference finite)
+    """
+
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+# --------------------
+# Matchup statistics
+class MatchupStats():
+    """
+    Results of one matchup, updated as games arrive
+
+    Attributes:
+        players_count (int) - number of players
+        lineup ([str]) - entrant by team position (lineup[0] = candidate)
+        games (int) - games counted
+        points ([int]) - total points by entrant
+        wins ([int]) - games won by entrant (most points, no tie)
+        ties (int) - games with a tie for the most points
+        pairs ([[float]]) - pairs[i][j] = score of entrant i against entrant j (1 per game with more points, 0.5 per tie)
+        score_total (float), score_squares (float) - sum and sum of squares of the candidate's game score (mean score against the other entrants)
+        llr (float) - SPRT log likelihood ratio
+        decision (str|None) - 'H1' the candidate is at least elo1 stronger, 'H0' it is not stronger than elo0, 'max_games', None = undecided
+
+    Methods:
+        add - count a game (points by entrant)
+        summary - Return (dict) win rates (by lineup position), Elo difference and SPRT state (JSON serializable)
+    """
+
+    def __init__ (self, players_count, lineup, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05, min_games=20, max_games=1000):
+        """
+        players_count (int) - number of players
+        lineup ([str]) - entrant by team position
+        elo0, elo1 (float) - SPRT hypotheses: H0 candidate Elo difference = elo0, H1 = elo1
+        alpha, beta (float) - SPRT error rates (false H1, false H0)
+        min_games (int) - games before the SPRT can stop the matchup
+        max_games (int) - games after which the matchup stops undecided (at the end of a rotation group)
+        """
+
+        self.players_count = players_count
+        self.lineup = lineup
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.min_games = min_games
+        self.max_games = max_games
+        self.llr_lower = math.log(beta / (1 - alpha))
+        self.llr_upper = math.log((1 - beta) / alpha)
+
+        entrants = len(lineup)
+        self.games = 0
+        self.points = [0] * entrants
+        self.wins = [0] * entrants
+        self.ties = 0
+        self.pairs = [[0.0] * entrants for i in range(entrants)]
+        self.score_total = 0.0
+        self.score_squares = 0.0
+        self.llr = 0.0
+        self.decision = None
+
+    @property
+    def name(self):
+        return f"{self.players_count}p {' vs '.join(self.lineup)}"
+
+    def add(self, points, decide=True):
+        """
+        Count a game - points (list) final points by entrant (lineup order)
+            decide (bool) - update the decision (False inside a rotation group, see Tournament.results_count)
+        """
+
+        entrants = len(points)
+        self.games += 1
+
+        best = max(points)
+        if points.count(best) == 1:
+            self.wins[points.index(best)] += 1
+        else:
+            self.ties += 1
+
+        for i in range(entrants):
+            self.points[i] += points[i]
+            for j in range(entrants):
+                if i != j:
+                    self.pairs[i][j] += 1.0 if points[i] > points[j] else 0.5 if points[i] == points[j] else 0.0
+
+        score = sum(1.0 if points[0] > points[j] else 0.5 if points[0] == points[j] else 0.0 for j in range(1, entrants)) / (entrants - 1)
+        self.score_total += score
+        self.score_squares += score * score
+
+        self.llr = self.sprt_llr()
+        if self.decision is None and decide:
+            if self.games >= self.min_games and self.llr >= self.llr_upper:
+                self.decision = 'H1'
+            elif self.games >= self.min_games and self.llr <= self.llr_lower:
+                self.decision = 'H0'
+            elif self.games >= self.max_games:
+                self.decision = 'max_games'
+
+    def sprt_llr(self):
+        """
+        Return (float) - log likelihood ratio of H1 against H0 (normal approximation of the game scores, as used for chess engine testing)
+            One virtual win and loss are added so the variance is never zero (e.g. a candidate winning every game)
+        """
+
+        games = self.games + 2
+        mean = (self.score_total + 1) / games
+        variance = (self.score_squares + 1) / games - mean * mean
+
+        score0 = score_from_elo(self.elo0)
+        score1 = score_from_elo(self.elo1)
+        return games * (score1 - score0) * (2 * mean - score0 - score1) / (2 * variance)
+
+    def summary(self):
+        mean = self.score_total / self.games if self.games > 0 else 0.5
+        score_low, score_high = wilson_interval(self.score_total, self.games)
+
+        # By lineup position (an entrant can fill two teams of a 3 team lineup)
+        win_rates = []
+        for i in range(len(self.lineup)):
+            low, high = wilson_interval(self.wins[i], self.games)
+            win_rates.append({'entrant': self.lineup[i], 'wins': self.wins[i], 'rate': round(self.wins[i] / self.games, 4) if self.games else None,
+                              'low': round(low, 4), 'high': round(high, 4)})
+
+        return {
+            'matchup': self.name,
+            'players_count': self.players_count,
+            'lineup': self.lineup,
+            'games': self.games,
+            'ties': self.ties,
+            'points_mean': [round(p / self.games, 1) if self.games else None for p in self.points],
+            'win_rates': win_rates,
+            'candidate_score': round(mean, 4),
+            'candidate_elo': round(elo_from_score(mean), 1),
+            'candidate_elo_low': round(elo_from_score(score_low), 1),
+            'candidate_elo_high': round(elo_from_score(score_high), 1),
+            'llr': round(self.llr, 3),
+            'llr_bounds': [round(self.llr_lower, 3), round(self.llr_upper, 3)],
+            'decision': self.decision
+        }
+
+def ratings(matchups_stats, iterations=200):
+    """
+    Return ({str: dict}) - Elo rating of every entrant from the pairwise scores of all matchups (Bradley-Terry, mean rating 0)
+        elo - rating; low/high - 95% interval (standard error from the Fisher information of the pairwise games, None = no games against other entrants)
+    """
+
+    names = sorted(set(name for stats in matchups_stats for name in stats.lineup))
+    position = {names[i]: i for i in range(len(names))}
+    count = len(names)
+
+    scores = [[0.0] * count for i in range(count)]
+    for stats in matchups_stats:
+        for i in range(len(stats.lineup)):
+            for j in range(len(stats.lineup)):
+                a, b = position[stats.lineup[i]], position[stats.lineup[j]]
+                if a != b:
+                    scores[a][b] += stats.pairs[i][j]
+
+    # Minorization-maximization updates of the strengths (a half win against every entrant keeps strengths finite)
+    strength = [1.0] * count
+    for iteration in range(iterations):
+        updated = []
+        for i in range(count):
+            won = sum(scores[i][j] for j in range(count) if j != i) + 0.5 * (count - 1)
+            played = sum((scores[i][j] + scores[j][i] + 1) / (strength[i] + strength[j]) for j in range(count) if j != i)
+            updated.append(won / played if played > 0 else strength[i])
+        mean_log = sum(math.log(s) for s in updated) / count
+        strength = [s / math.exp(mean_log) for s in updated]
+
+    results = {}
+    for i in range(count):
+        information = sum((scores[i][j] + scores[j][i]) * strength[i] * strength[j] / (strength[i] + strength[j]) ** 2
+                          for j in range(count) if j != i)
+        elo = 400 * math.log10(strength[i])
+        if information > 0:
+            margin = z_95 * 400 / math.log(10) / math.sqrt(information)
+            results[names[i]] = {'elo': round(elo, 1), 'low': round(elo - margin, 1), 'high': round(elo + margin, 1)}
+        else:
+            results[names[i]] = {'elo': round(elo, 1), 'low': None, 'high': None}
+
+    return results
+
+# --------------------
+# Games
+
+def matchup_games(arguments):
+    """
+    Play games of a matchup (worker process)
+
+    arguments (tuple) - (matchup number, players count, policy specs by lineup position, game numbers, seed)
+
+    Return (int, [(int, [int])]) - matchup number, (game number, final points by entrant) of each game
+    """
+
+    matchup, players_count, lineup_specs, game_numbers, seed = arguments
+    teams_count = len(lineup_specs)
+    names = [f"Player {i + 1}" for i in range(players_count)]
+
+    results = []
+    for k in game_numbers:
+        deck_seed = seed + k // teams_count
+        rotation = k % teams_count
+
+        # Entrant of each team position and the policy of each seat
+        #   Policy streams are derived from the deck seed, the rotation and the lineup position (not correlated with any deal)
+        team_entrant = [(t + rotation) % teams_count for t in range(teams_count)]
+        entrant_policies = [rollout.policy_build(lineup_specs[i], rollout.policy_seed(deck_seed, rotation, i)) for i in range(teams_count)]
+        seat_policies = [entrant_policies[team_entrant[seat % teams_count]] for seat in range(players_count)]
+
+        rng = random.Random(rollout.policy_seed(deck_seed, rotation))
+        game = core.game_build(names, seed=deck_seed, full=any(not isinstance(spec, str) for spec in lineup_specs))
+        while game.play_status < 4:
+            game.play_action(seat_policies[game.scheduler.seat](game, rng))
+
+        points = [0] * teams_count
+        team_points = game.final_team_points()
+        for t in range(teams_count):
+            points[team_entrant[t]] = team_points[t]
+        results.append((k, points))
+
+    return matchup, results
+
+class Tournament():
+    """
+    Matchups played in a process pool, results are counted as they arrive and each matchup stops on its SPRT decision
+
+    Attributes:
+        entrants ({str: str|(str, dict)}) - policy spec of each entrant (see rollout.policy_build)
+        stats ([MatchupStats]) - statistics of each matchup
+        seed (int) - first deck seed of every matchup
+        chunk_games (int) - games sent to a worker at a time (rounded up to complete rotation groups of each matchup)
+
+    Methods:
+        run - (generator) play the matchups, yields (MatchupStats, [(int, [int])]) for each chunk of results as it arrives
+        summary - Return (dict) matchup summaries and entrant ratings
+    """
+
+    def __init__ (self, entrants, matchups, seed=0, chunk_games=10, **sprt):
+        """
+        entrants ({str: str|(str, dict)}) - policy spec of each entrant
+        matchups ([(int, [str])]) - (players count, lineup) of each matchup (see matchups_build)
+        seed (int) - first deck seed
+        chunk_games (int) - games sent to a worker at a time (smaller chunks stop closer to the decision)
+        sprt - MatchupStats settings (elo0, elo1, alpha, beta, min_games, max_games)
+        """
+
+        for players_count, lineup in matchups:
+            teams_count = players_count if players_count < 4 else players_count // 2
+            if len(lineup) != teams_count:
+                raise ValueError(f"A {players_count} player matchup needs {teams_count} entrants, not {len(lineup)}")
+            for name in lineup:
+                if name not in entrants:
+                    raise ValueError(f"Unknown entrant: {name}")
+
+        self.entrants = entrants
+        self.stats = [MatchupStats(players_count, lineup, **sprt) for players_count, lineup in matchups]
+        self.seed = seed
+        self.chunk_games = chunk_games
+
+    def tasks(self, sent):
+        """
+        Return (tuple|None) - the next chunk of games to play: the undecided matchup with the fewest games sent (None = all sent)
+        """
+
+        open_matchups = [m for m in range(len(self.stats)) if self.stats[m].decision is None and sent[m] < self.stats[m].max_games]
+        if not open_matchups:
+            return None
+
+        m = min(open_matchups, key=lambda i: sent[i])
+        stats = self.stats[m]
+
+        # Whole rotation groups (teams_count games per deck)
+        teams_count = len(stats.lineup)
+        chunk_games = -(-self.chunk_games // teams_count) * teams_count
+        max_games = -(-stats.max_games // teams_count) * teams_count
+        games = range(sent[m], min(sent[m] + chunk_games, max_games))
+        sent[m] = games.stop
+        return m, stats.players_count, [self.entrants[name] for name in stats.lineup], list(games), self.seed
+
+    def run(self, workers=None):
+        """
+        Play the matchups (generator) - yields (MatchupStats, results) after counting each chunk of results
+            Results of a matchup that arrive after its decision are not counted
+
+        workers (int|None) - number of processes (None = CPU count, 0 = play in the calling process)
+        """
+
+        sent = [0] * len(self.stats)
+
+        if workers == 0:
+            task = self.tasks(sent)
+            while task is not None:
+                m, results = matchup_games(task)
+                yield self.results_count(m, results)
+                task = self.tasks(sent)
+            return
+
+        workers = workers or multiprocessing.cpu_count()
+        arrived = queue.Queue()
+
+        with multiprocessing.Pool(workers) as pool:
+            # Keep two chunks per worker in flight
+            in_flight = 0
+            while True:
+                while in_flight < 2 * workers:
+                    task = self.tasks(sent)
+                    if task is None:
+                        break
+                    pool.apply_async(matchup_games, (task,), callback=arrived.put, error_callback=arrived.put)
+                    in_flight += 1
+
+                if in_flight == 0:
+                    break
+
+                result = arrived.get()
+                in_flight -= 1
+                if isinstance(result, BaseException):
+                    raise result
+
+                m, results = result
+                if self.stats[m].decision is None:
+                    yield self.results_count(m, results)
+
+    def results_count(self, m, results):
+        """
+        Return (MatchupStats, results) - count the results of a chunk (complete rotation groups, in game order),
+            the decision is updated at the end of each group so a stop never splits the seat rotations of a deck
+        """
+
+        stats = self.stats[m]
+        teams_count = len(stats.lineup)
+        for k, points in results:
+            if stats.decision is None:
+                stats.add(points, decide=(k + 1) % teams_count == 0)
+        return stats, results
+
+    def summary(self):
+        return {
+            'matchups': [stats.summary() for stats in self.stats],
+            'ratings': ratings(self.stats)
+        }
+
+# --------------------
+# Command line
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Evaluate a policy against opponents with sequential early stopping")
+    parser.add_argument('--candidate', default='program', help="candidate policy (random, program, mcts)")
+    parser.add_argument('--opponents', nargs='+', default=['random'], help="opponent policies")
+    parser.add_argument('--players', type=int, nargs='+', default=[2], choices=[2, 3, 4, 6], help="player counts")
+    parser.add_argument('--mcts-iterations', type=int, default=200, help="playouts per decision of the mcts policy")
+    parser.add_argument('--elo0', type=float, default=0.0, help="SPRT H0 Elo difference")
+    parser.add_argument('--elo1', type=float, default=20.0, help="SPRT H1 Elo difference")
+    parser.add_argument('--alpha', type=float, default=0.05, help="SPRT false H1 rate")
+    parser.add_argument('--beta', type=float, default=0.05, help="SPRT false H0 rate")
+    parser.add_argument('--max-games', type=int, default=1000, help="games per matchup without a decision")
+    parser.add_argument('--seed', type=int, default=0, help="first deck seed")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (0 = no pool)")
+    parser.add_argument('--output', help="JSON results file")
+    options = parser.parse_args(arguments)
+
+    entrants = {}
+    for name in [options.candidate] + options.opponents:
+        entrants[name] = ('mcts', {'iterations': options.mcts_iterations}) if name == 'mcts' else name
+
+    tournament = Tournament(entrants, matchups_build(options.candidate, options.opponents, options.players), options.seed,
+                            elo0=options.elo0, elo1=options.elo1, alpha=options.alpha, beta=options.beta, max_games=options.max_games)
+
+    for stats, results in tournament.run(options.workers):
+        if stats.decision is not None:
+            summary = stats.summary()
+            print(f"{summary['matchup']}: {summary['decision']} after {summary['games']} games, candidate score {summary['candidate_score']}, "
+                  f"Elo {summary['candidate_elo']} [{summary['candidate_elo_low']}, {summary['candidate_elo_high']}]")
+
+    summary = tournament.summary()
+    for name, rating in summary['ratings'].items():
+        print(f"{name}: Elo {rating['elo']} [{rating['low']}, {rating['high']}]")
+
+    if options.output is not None:
+        with open(options.output, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+if __name__ == '__main__':
+    sys.exit(main())